@@ -0,0 +1,549 @@
+"""
+性能基准测试：python bench.py <项目> [参数]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import lexer_core
+from constants import ID, PREPROCESSOR
+from lexer_core import Lexer, ENGINES
+from parser_core import (EPS, Grammar, IncrementalState, LL1Parser, ParseSession, build_parse_table, c_grammar,
+                         first_sets, follow_sets, select_sets)
+
+# 合成语料的基本单元：声明、表达式、注释、字符串、各类数字常量
+UNIT = '''#include <stdio.h>
+/* generated block */
+typedef struct Node_%d {
+    int   value;
+    float weight[4];
+} Node_%d;
+
+int func_%d(int a, int b)
+{
+    // 循环体
+    int i = 0x1F, j = 017, k = 42;
+    float f = 3.14e-2f, g = .5;
+    char c = '\\n';
+    for (i = 0; i < a; i++) {
+        k += a * b - (j >> 2) %% 7;
+        if (k >= 100 && j != 0) { k = k / 2; }
+    }
+    printf("value = %%d, weight = %%.2f\\n", k, f);
+    return k;
+}
+'''
+
+
+def make_corpus(size):
+    """生成约 size 字节的合成 C 源码"""
+    parts = []
+    total = 0
+    i = 0
+    while total < size:
+        s = UNIT % (i, i, i)
+        parts.append(s)
+        total += len(s)
+        i += 1
+    return ''.join(parts)
+
+
+# 注释密集的语料单元（类似厂商头文件）
+COMMENT_UNIT = '''/*
+ * Register block %d
+ * ----------------------------------------------------------------------
+ * Copyright (c) vendor. All rights reserved.
+ * This header is generated; do not edit by hand.
+ */
+// field offsets for block %d
+#define REG_%d_CTRL   0x%04x  /* control register */
+// status bits are read-only
+// writes are ignored by hardware
+int reg_%d;   /* shadow copy */
+
+'''
+
+
+def make_comment_corpus(size):
+    """生成约 size 字节、以注释为主的合成 C 源码"""
+    parts = []
+    total = 0
+    i = 0
+    while total < size:
+        s = COMMENT_UNIT % (i, i, i, i & 0xffff, i)
+        parts.append(s)
+        total += len(s)
+        i += 1
+    return ''.join(parts)
+
+
+def skip_by_char(lx):
+    """原先逐字符跳过空白和注释的实现，作为对照"""
+    while lx.char is not None:
+        if lx.char.isspace():
+            lx.next()
+            continue
+        if lx.char == '/' and lx.get_next() == '/':
+            while lx.char is not None and lx.char != '\n':
+                lx.next()
+            continue
+        if lx.char == '/' and lx.get_next() == '*':
+            lx.next()
+            lx.next()
+            while lx.char is not None and not (lx.char == '*' and lx.get_next() == '/'):
+                lx.next()
+            if lx.char is None:
+                break
+            lx.next()
+            lx.next()
+            continue
+        break
+
+
+def timed(fn, *args, repeat=3, **kwargs):
+    """返回 (结果, 最短耗时)"""
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args, **kwargs)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return result, best
+
+
+# 正则引擎相对逐字符引擎的目标提速倍数
+LEXER_TARGET = 5.0
+
+
+def bench_lexer(size_mb=4):
+    """各扫描引擎的 tokens/sec 对比（未安装 numpy 时跳过 numpy 引擎）。
+    逐字符引擎本身已改为整段跳过空白和注释（见 bench_skip），正则引擎在 2–8 MB 语料上实测为它的 3.8–5.0 倍，
+    没有稳定达到 LEXER_TARGET；剩余耗时主要是 finditer 的逐个匹配和 token 元组的创建，两者都已在 C 层"""
+    text = make_corpus(int(size_mb * 1024 * 1024))
+    print(f"语料大小: {len(text) / 1024 / 1024:.1f} MB")
+    base = None
+    rates = {}
+    for engine in ENGINES:
+        if engine == 'numpy' and lexer_core.np is None:
+            continue
+        tokens, dt = timed(lambda: Lexer(text, engine=engine).tokenize())
+        rate = rates[engine] = len(tokens) / dt
+        base = base or rate
+        print(f"{engine:<8} {len(tokens):>10d} tokens  {dt:8.2f} s  {rate:12.0f} tokens/s  x{rate / base:.1f}")
+    speedup = rates['regex'] / rates['char']
+    print(f"regex 相对 char: x{speedup:.2f}，目标 x{LEXER_TARGET:.1f}{'' if speedup >= LEXER_TARGET else '，未达到'}")
+
+
+def peak_memory(fn, *args, **kwargs):
+    """返回 (结果, 峰值内存字节数)"""
+    tracemalloc.start()
+    try:
+        result = fn(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_stream(size_mb=16, chunk_kb=64):
+    """整体读入 + tokenize() 与 iter_tokens() 流式读取的峰值内存对比"""
+    fd, path = tempfile.mkstemp(suffix='.c')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(make_corpus(int(size_mb * 1024 * 1024)))
+
+        def whole():
+            with open(path, encoding='utf-8') as f:
+                return len(Lexer(f.read(), engine='regex').tokenize())
+
+        def stream():
+            with open(path, encoding='utf-8') as f:
+                return sum(1 for _ in Lexer().iter_tokens(f, chunk_size=int(chunk_kb * 1024)))
+
+        print(f"语料大小: {size_mb} MB, 块大小: {chunk_kb} KB")
+        for name, fn in (('tokenize', whole), ('iter_tokens', stream)):
+            count, peak = peak_memory(fn)
+            print(f"{name:<12} {count:>10d} tokens  峰值内存 {peak / 1024 / 1024:8.1f} MB")
+    finally:
+        os.remove(path)
+
+
+def bench_mmap(size_mb=16):
+    """元组 token 列表与 mmap + SpanTokens 的耗时和每个 token 的内存占用对比"""
+    fd, path = tempfile.mkstemp(suffix='.c')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(make_corpus(int(size_mb * 1024 * 1024)))
+
+        def tuples():
+            with open(path, encoding='utf-8') as f:
+                return Lexer(f.read(), engine='regex').tokenize()
+
+        def spans():
+            return Lexer.map_file(path).tokenize()
+
+        print(f"语料大小: {size_mb} MB")
+        for name, fn in (('tuple', tuples), ('mmap', spans)):
+            _, dt = timed(fn, repeat=1)
+            tokens, peak = peak_memory(fn)
+            print(f"{name:<8} {len(tokens):>10d} tokens  {dt:8.2f} s  峰值内存 {peak / 1024 / 1024:8.1f} MB"
+                  f"  {peak / len(tokens):6.1f} B/token")
+            del tokens
+    finally:
+        os.remove(path)
+
+
+def bench_compact(size_mb=16):
+    """TOKEN 元组列表与 TokenBuffer 的每个 token 内存占用对比"""
+    text = make_corpus(int(size_mb * 1024 * 1024))
+    print(f"语料大小: {len(text) / 1024 / 1024:.1f} MB")
+    for compact in (False, True):
+        tokens, peak = peak_memory(lambda: Lexer(text, engine='regex').tokenize(compact=compact))
+        name = 'TokenBuffer' if compact else 'list'
+        print(f"{name:<12} {len(tokens):>10d} tokens  峰值内存 {peak / 1024 / 1024:8.1f} MB  {peak / len(tokens):6.1f} B/token")
+        del tokens
+
+
+def bench_skip(size_mb=4):
+    """注释密集语料上逐字符跳过与 Lexer.skip 整段跳过的对比（逐字符引擎整体耗时）"""
+    text = make_comment_corpus(int(size_mb * 1024 * 1024))
+    print(f"语料大小: {len(text) / 1024 / 1024:.1f} MB")
+
+    class CharSkipLexer(Lexer):
+        skip = skip_by_char
+
+    base = None
+    for name, cls in (('逐字符', CharSkipLexer), ('整段', Lexer)):
+        tokens, dt = timed(lambda: cls(text).tokenize(), repeat=1)
+        base = base or dt
+        print(f"{name:<6} {len(tokens):>10d} tokens  {dt:8.2f} s  x{base / dt:.1f}")
+
+
+def bench_parallel(size_mb=64, workers=0):
+    """单进程 tokenize 与多进程 tokenize_parallel 的墙钟时间对比（workers=0 表示 CPU 核数）"""
+    text = make_corpus(int(size_mb * 1024 * 1024))
+    workers = int(workers) or os.cpu_count()
+    print(f"语料大小: {len(text) / 1024 / 1024:.1f} MB, 进程数: {workers}")
+    base = None
+    for name, fn in (('tokenize', lambda: Lexer(text, engine='regex').tokenize(compact=True)),
+                     ('parallel', lambda: Lexer(text, engine='regex').tokenize_parallel(workers, compact=True))):
+        tokens, dt = timed(fn, repeat=1)
+        base = base or dt
+        print(f"{name:<10} {len(tokens):>10d} tokens  {dt:8.2f} s  x{base / dt:.1f}")
+        del tokens
+
+
+def bench_symbols(size_mb=4):
+    """标识符池：驻留后 ID token 共享的名字对象数，以及“查找全部出现位置”重新扫描与查表的耗时对比"""
+    text = make_corpus(int(size_mb * 1024 * 1024))
+    print(f"语料大小: {len(text) / 1024 / 1024:.1f} MB")
+    lx = Lexer(text, engine='regex')
+    tokens = lx.tokenize()
+    table = lx.table
+    names = [t.attribute for t in tokens if t.type == ID]
+    print(f"标识符 {len(names):>10d} 次出现  {len(table):>8d} 个不同名字  名字对象 {len(set(map(id, names))):>8d} 个")
+    name = max(table.names, key=table.count)  # 出现次数最多的名字
+    rescan, dt_rescan = timed(lambda: [(i, t.line) for i, t in enumerate(Lexer(text, engine='regex').tokenize())
+                                       if t.type == ID and t.attribute == name], repeat=1)
+    uses, dt_uses = timed(table.uses, name)
+    assert uses == rescan
+    print(f"重新扫描 {dt_rescan * 1000:10.2f} ms")
+    print(f"查表     {dt_uses * 1000:10.4f} ms  ({len(uses)} 处)")
+
+
+def parse_by_dict(parser, tokens):
+    """原先按字符串元组查表、字符串栈的分析循环（不生成记录），作为对照"""
+    filtered = [t for t in tokens if t.type != PREPROCESSOR]
+    stack = ["EOF", parser.grammar.start]
+    names, capture = set(), False
+    ptr = 0
+    while stack:
+        top = stack[-1]
+        if ptr < len(filtered):
+            curr = filtered[ptr]
+            lookahead, attr = parser.symbolize(curr, names), curr.attribute
+        else:
+            lookahead, attr = "EOF", "EOF"
+        if top in parser.terminals or top == "EOF":
+            if top != lookahead:
+                return False
+            if top == "id" and capture:
+                names.add(attr)
+                capture = False
+            stack.pop()
+            ptr += 1
+            if top == "EOF":
+                break
+        else:
+            prod = parser.table.get((top, lookahead))
+            if prod is None:
+                return False
+            if top == "TypeAlias" and prod == ["id"]:
+                capture = True
+            stack.pop()
+            if prod != [EPS]:
+                stack.extend(reversed(prod))
+    return True
+
+
+def bench_parse(scale=10000, reference_scale=100):
+    """c-code.c 放大 scale 倍后 CompiledGrammar 上的语法检查耗时，
+    与原先字符串表驱动的循环对照（后者只在 reference_scale 倍上测量后按 token 数折算）"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c-code.c'), encoding='utf-8') as f:
+        src = f.read()
+    tokens = Lexer(src * int(scale), engine='regex').tokenize()
+    small = Lexer(src * int(reference_scale), engine='regex').tokenize()
+    print(f"c-code.c x{int(scale)}: {len(tokens)} tokens")
+    ok, dt = timed(LL1Parser().check, tokens, repeat=1)
+    ref, dt_ref = timed(parse_by_dict, LL1Parser(), small, repeat=1)
+    dt_ref *= len(tokens) / len(small)
+    print(f"{'dict':<10} {dt_ref:8.2f} s (折算)  {len(tokens) / dt_ref:12.0f} tokens/s")
+    print(f"{'compiled':<10} {dt:8.2f} s         {len(tokens) / dt:12.0f} tokens/s  x{dt_ref / dt:.1f}  {ok[1]}")
+
+
+def bench_pparse(scale=20000, workers=0):
+    """c-code.c 放大 scale 倍：单进程 analyze 与按顶层声明切块的多进程 analyze_parallel 的墙钟时间对比"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c-code.c'), encoding='utf-8') as f:
+        src = f.read()
+    tokens = Lexer(src * int(scale), engine='regex').tokenize(compact=True)
+    workers = int(workers) or os.cpu_count()
+    print(f"c-code.c x{int(scale)}: {len(tokens)} tokens, 进程数: {workers}")
+    parser = LL1Parser()
+    base = None
+    for name, fn in (('analyze', lambda: parser.analyze(tokens, trace="none")),
+                     ('parallel', lambda: parser.analyze_parallel(tokens, workers=workers))):
+        res, dt = timed(fn, repeat=1)
+        base = base or dt
+        print(f"{name:<10} {dt:8.2f} s  {len(tokens) / dt:12.0f} tokens/s  x{base / dt:.1f}  {res[2]}")
+
+
+def bench_reparse(scale=1000):
+    """c-code.c 放大 scale 倍（约 19 行一份）：改动中间一份里的一个常量后，整体 analyze 与 reanalyze 的耗时对比（full 记录）"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c-code.c'), encoding='utf-8') as f:
+        src = f.read()
+    scale = int(scale)
+    text = src * scale
+    middle = len(src) * (scale // 2) + src.index('13')
+    tokens = Lexer(text, engine='regex').tokenize()
+    new_tokens, _ = Lexer().relex(tokens, text, middle, middle + 2, '14')  # 同 GUI：只重新扫描改动处
+    parser = LL1Parser()
+    state = IncrementalState()
+    _, dt_first = timed(parser.reanalyze, tokens, state, repeat=1)
+    print(f"c-code.c x{scale}: {text.count(chr(10)) + 1} 行, {len(tokens)} tokens")
+    res, dt = timed(parser.analyze, new_tokens, repeat=1)
+    inc, dt_inc = timed(parser.reanalyze, new_tokens, state, repeat=1)
+    assert inc[1:] == res[1:] and len(inc[0]) == len(res[0])
+    a, b = state.reparsed
+    print(f"{'analyze':<10} {dt * 1000:10.1f} ms  {len(res[0])} 条记录  (首次 reanalyze {dt_first * 1000:.1f} ms)")
+    print(f"{'reanalyze':<10} {dt_inc * 1000:10.1f} ms  x{dt / dt_inc:.0f}  重新分析 token [{a}, {b})")
+
+
+def bench_symbolize(scale=2000):
+    """c-code.c 放大 scale 倍：逐个 token 调用 symbolize 再按名字查终结符编号，与按类型码查 token_terms 的耗时对比"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c-code.c'), encoding='utf-8') as f:
+        src = f.read()
+    tokens = [t for t in Lexer(src * int(scale), engine='regex').tokenize() if t.type != PREPROCESSOR]
+    print(f"c-code.c x{int(scale)}: {len(tokens)} tokens")
+    parser = LL1Parser()
+    index, terms, names = parser.compiled.index, parser.token_terms, {"Book"}
+    type_id = index["type_id"]
+    by_name, dt_name = timed(lambda: [index.get(parser.symbolize(t, names), -1) for t in tokens])
+    by_type, dt_type = timed(lambda: [type_id if t.type == ID and t.attribute in names else terms.get(t.type, -1)
+                                      for t in tokens])
+    assert by_name == by_type
+    print(f"symbolize {dt_name * 1000:8.1f} ms  {dt_name / len(tokens) * 1e9:6.0f} ns/token")
+    print(f"查表      {dt_type * 1000:8.1f} ms  {dt_type / len(tokens) * 1e9:6.0f} ns/token  x{dt_name / dt_type:.1f}")
+
+
+def make_grammar(n, seed=0):
+    """n 个非终结符、约 3n 个产生式的随机文法：右部引用附近的非终结符和 200 个终结符，部分可空"""
+    rng = random.Random(seed)
+    nts = [f"N{i}" for i in range(n)]
+    terms = [f"t{i}" for i in range(200)]
+    prods = {}
+    for i, A in enumerate(nts):
+        alts = [[rng.choice(nts[i:i + 50] + terms) for _ in range(rng.randint(1, 4))] for _ in range(3)]
+        if rng.random() < 0.3:
+            alts.append([EPS])
+        prods[A] = alts
+    return Grammar("N0", prods)
+
+
+def bench_grammar(n=3000):
+    """FIRST/FOLLOW/SELECT 和分析表的计算耗时：c_grammar() 与 n 个非终结符的合成文法"""
+    for name, g in (("c_grammar", c_grammar()), (f"合成 x{int(n)}", make_grammar(int(n)))):
+        def build():
+            first = first_sets(g)
+            follow = follow_sets(g, first)
+            return build_parse_table(select_sets(g, first, follow))
+        (table, conflicts), dt = timed(build)
+        count = sum(map(len, g.prods.values()))
+        print(f"{name:<12} {count:>7d} 个产生式  {dt * 1000:10.1f} ms  表项 {len(table)}  冲突 {len(conflicts)}")
+
+
+def bench_pipeline(scale=2000):
+    """c-code.c 放大 scale 倍写入临时文件：先 tokenize() 再 analyze() 与 iter_tokens() 直接流入 analyze() 的峰值内存对比"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c-code.c'), encoding='utf-8') as f:
+        src = f.read()
+    fd, path = tempfile.mkstemp(suffix='.c')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for _ in range(int(scale)):
+                f.write(src)
+
+        def whole():
+            with open(path, encoding='utf-8') as f:
+                return LL1Parser().analyze(Lexer(f.read(), engine='regex').tokenize(), trace="none")[2]
+
+        def stream():
+            with open(path, encoding='utf-8') as f:
+                return LL1Parser().analyze(Lexer().iter_tokens(f), trace="none")[2]
+
+        print(f"c-code.c x{int(scale)}: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+        for name, fn in (('tokenize', whole), ('stream', stream)):
+            _, dt = timed(fn, repeat=1)
+            msg, peak = peak_memory(fn)
+            print(f"{name:<10} {dt:8.2f} s  峰值内存 {peak / 1024 / 1024:8.1f} MB  {msg}")
+    finally:
+        os.remove(path)
+
+
+EXPR_UNIT = '''int calc_%d(int a, int b, int c)
+{
+    int x = a + b * c - (a - b) / 2;
+    x = x * 3 + a %% 7 - b << 1;
+    if (x > a && b != c || a <= 0) x = f(a, b * c, x[1]) + g(x) * 2;
+    while (a < b + c && x >= 0) { a = a + 1; x = x - p.v * q.w; }
+    x = (a + b) * (c - a) / (b + 1) & mask | flags ^ bits;
+    return x * a + b * c - arr[a + 1] / (c + 2) == 0;
+}
+'''
+
+
+def bench_expr(scale=20000):
+    """表达式密集的合成代码：Expr 逐步展开与交给 Pratt 子分析器的语法检查步数和耗时对比"""
+    tokens = Lexer(''.join(EXPR_UNIT % i for i in range(int(scale))), engine='regex').tokenize()
+    print(f"EXPR_UNIT x{int(scale)}: {len(tokens)} tokens")
+    base = None
+    for name, pratt in (('LL(1)', False), ('Pratt', True)):
+        session = ParseSession()
+        ok, dt = timed(LL1Parser(pratt=pratt).check, tokens, session)
+        base = base or (session.steps, dt)
+        print(f"{name:<6} {session.steps:10d} 步 {session.steps / len(tokens):5.2f} 步/token  {dt:8.2f} s"
+              f"  {len(tokens) / dt:10.0f} tokens/s  x{base[1] / dt:.2f}  {ok[1]}")
+
+
+def bench_macros(scale=5000):
+    """c-code.c 放大 scale 倍：逐个产生式展开、宏产生式、宏产生式加 Pratt 的语法检查步数和耗时对比"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c-code.c'), encoding='utf-8') as f:
+        src = f.read()
+    tokens = Lexer(src * int(scale), engine='regex').tokenize()
+    print(f"c-code.c x{int(scale)}: {len(tokens)} tokens")
+    base = None
+    for name, kw in (('逐步', dict(macros=False, pratt=False)), ('宏', dict(pratt=False)), ('宏+Pratt', {})):
+        session = ParseSession()
+        ok, dt = timed(LL1Parser(**kw).check, tokens, session)
+        base = base or dt
+        print(f"{name:<8} {session.steps:10d} 步 {session.steps / len(tokens):5.2f} 步/token  {dt:8.2f} s"
+              f"  {len(tokens) / dt:10.0f} tokens/s  x{base / dt:.2f}  {ok[1]}")
+
+
+def bench_gen(scale=5000):
+    """c-code.c 放大 scale 倍：parser_gen 生成的递归下降模块与 LL1Parser 解释分析表的语法检查耗时对比"""
+    import importlib.util
+    import parser_gen
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c-code.c'), encoding='utf-8') as f:
+        src = f.read()
+    tokens = Lexer(src * int(scale), engine='regex').tokenize()
+    print(f"c-code.c x{int(scale)}: {len(tokens)} tokens")
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'c_parser_gen.py')
+        t0 = time.perf_counter()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(parser_gen.generate(LL1Parser()))
+        spec = importlib.util.spec_from_file_location('c_parser_gen', path)
+        gen = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(gen)
+        print(f"生成并导入 {(time.perf_counter() - t0) * 1000:.1f} ms")
+    base = None
+    runs = (('逐步', LL1Parser(macros=False, pratt=False).check), ('宏+Pratt', LL1Parser().check),
+            ('生成模块', gen.parse))
+    for name, fn in runs:
+        ok, dt = timed(fn, tokens)
+        base = base or dt
+        print(f"{name:<8} {dt:8.2f} s  {len(tokens) / dt:10.0f} tokens/s  x{base / dt:.2f}  {ok[1]}")
+
+
+class ObjectNode:
+    """每个结点一个对象的语法树（作为内存对照）"""
+    __slots__ = ('symbol', 'children', 'token')
+
+    def __init__(self, symbol, token):
+        self.symbol, self.children, self.token = symbol, [], token
+
+
+def object_tree(tree, node=0):
+    """把 ParseTree 转成 ObjectNode 树"""
+    root = ObjectNode(tree.symbol(node), tree.tokens[node])
+    stack = [(node, root)]
+    while stack:
+        v, obj = stack.pop()
+        for child in tree.children(v):
+            kid = ObjectNode(tree.symbol(child), tree.tokens[child])
+            obj.children.append(kid)
+            stack.append((child, kid))
+    return root
+
+
+def bench_tree(scale=2000):
+    """c-code.c 放大 scale 倍：建树与不建树的分析耗时，以及结点池与每结点一个对象的内存对比"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c-code.c'), encoding='utf-8') as f:
+        src = f.read()
+    tokens = Lexer(src * int(scale), engine='regex').tokenize()
+    parser = LL1Parser(pratt=False)  # 建树时 Expr 逐步展开，对照也不交给 Pratt
+    print(f"c-code.c x{int(scale)}: {len(tokens)} tokens")
+    _, dt = timed(parser.analyze, tokens, trace="none", repeat=5)
+    session = ParseSession()
+    _, dt_tree = timed(parser.analyze, tokens, trace="none", build_tree=True, session=session, repeat=5)
+    tree = session.tree
+    arena = sum(a.itemsize * len(a) for a in (tree.syms, tree.first_child, tree.next_sibling, tree.tokens))
+    _, objects = peak_memory(object_tree, tree)
+    print(f"不建树 {dt:8.2f} s")
+    print(f"建树   {dt_tree:8.2f} s  +{(dt_tree / dt - 1) * 100:.0f}%  {len(tree)} 个结点")
+    print(f"结点池 {arena / 1024 / 1024:8.1f} MB  {arena / len(tree):6.1f} B/结点")
+    print(f"对象树 {objects / 1024 / 1024:8.1f} MB  {objects / len(tree):6.1f} B/结点")
+
+
+BENCHES = {
+    'lexer': bench_lexer,
+    'stream': bench_stream,
+    'mmap': bench_mmap,
+    'compact': bench_compact,
+    'skip': bench_skip,
+    'parallel': bench_parallel,
+    'symbols': bench_symbols,
+    'parse': bench_parse,
+    'pparse': bench_pparse,
+    'reparse': bench_reparse,
+    'symbolize': bench_symbolize,
+    'grammar': bench_grammar,
+    'pipeline': bench_pipeline,
+    'tree': bench_tree,
+    'expr': bench_expr,
+    'macros': bench_macros,
+    'gen': bench_gen,
+}
+
+
+def main():
+    name = sys.argv[1] if len(sys.argv) > 1 else 'lexer'
+    if name not in BENCHES:
+        print("可用项目:", ", ".join(BENCHES))
+        return
+    BENCHES[name](*(float(a) for a in sys.argv[2:]))
+
+
+if __name__ == '__main__':
+    main()
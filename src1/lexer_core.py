@@ -1,49 +1,686 @@
+import codecs
+import gc
+import io
+import mmap
+import os
+import re
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left, bisect_right
 from collections import namedtuple
+from itertools import chain, compress, islice, repeat
+from operator import attrgetter, getitem, is_, not_
+try:
+    import numpy as np
+except ImportError:
+    np = None
 from constants import (KEYWORDS, OP, DL, ID, CONST_DECIMAL, CONST_OCTAL, CONST_HEX, CONST_FLOAT, CONST_CHAR, STRING_, PREPROCESSOR,  EOF, HEX_CHAR, OCTAL_CHAR, ERRORS, TYPES)
 
-TOKEN = namedtuple('Token', ['type', 'attribute', 'line', 'error'])
+class TOKEN(namedtuple('Token', ['type', 'attribute', 'offset', 'error', 'lines'], defaults=(False, None))):
+    """token 只记源码偏移 offset，行号和列号在读取时经共享的行索引 lines（LineIndex）换算。
+    比较和哈希只看前四项，行索引不同（如增量分析前后）的同一 token 仍然相等"""
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return tuple.__eq__(self[:4], other[:4]) if isinstance(other, TOKEN) else tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self[:4])
+
+    @property
+    def line(self):
+        return self.lines.locate(self.offset)[0] if self.lines is not None else 0
+
+    @property
+    def col(self):
+        return self.lines.locate(self.offset)[1] if self.lines is not None else 0
+
+    def __repr__(self):
+        line, col = self.lines.locate(self.offset) if self.lines is not None else (0, 0)
+        return (f'Token(type={self.type!r}, attribute={self.attribute!r}, offset={self.offset}, error={self.error!r}, '
+                f'line={line}, col={col})')
+
+
+def make_token(type_, attr, offset, err=False, lines=None):
+    return TOKEN(type_, attr, offset, err, lines)
+
+# 合并操作符和界符，按长度降序排列（优先匹配长符号）
+SYMBOLS = sorted({**OP, **DL}.items(), key=lambda x: len(x[0]), reverse=True)
+
+
+def _sym_rule(syms, dot_guard):
+    """把符号集合编译成前缀树形式的正则，避免逐个尝试所有符号"""
+    heads = {}
+    for s in syms:
+        heads.setdefault(s[0], []).append(s[1:])
+    alts = []
+    for c, tails in sorted(heads.items()):
+        # '/' 后跟 '*' 是未闭合注释，'.' 后跟数字是浮点数，交给逐字符引擎处理
+        guard = {'/': r'(?!\*)', '.': dot_guard}.get(c, '')
+        rest = [t for t in tails if t]
+        if not rest:
+            alts.append(re.escape(c) + guard)
+        elif '' not in tails:
+            alts.append(f'{re.escape(c)}(?:{_sym_rule(rest, dot_guard)})')
+        elif guard:
+            alts.append(f'{re.escape(c)}(?:{_sym_rule(rest, dot_guard)}|{guard})')
+        else:
+            alts.append(f'{re.escape(c)}(?:{_sym_rule(rest, dot_guard)})?')
+    return '|'.join(alts)
+
+
+def _token_rules(binary):
+    """正则引擎的 token 规则 (名称, 模式, token 类型)；关键字、操作符和界符按匹配文本查表。
+    binary=True 时用于 mmap 字节源：非 ASCII 字节一律视为可能的标识符字符，交给回退路径"""
+    if binary:
+        w, id_tail, dot = r'\w\x80-\xff', r'(?![\x80-\xff])', r'(?![0-9\x80-\xff])'
+    else:
+        w, id_tail, dot = r'\w', '', r'(?![^\W_A-Za-z])'
+    return [
+        ('id', rf'[A-Za-z_]\w*+{id_tail}', ID),
+        ('sym', _sym_rule([s for s, _ in SYMBOLS], dot), None),
+        ('float', rf'(?:\.[0-9]++|0\.[0-9]*+|[1-9][0-9]*+\.[0-9]*+)(?:[eE][+-]?[0-9]++)?[fFlL]?(?![{w}])'
+                  rf'|[1-9][0-9]*+[eE][+-]?[0-9]++[fFlL]?(?![{w}])', CONST_FLOAT),
+        ('hex', rf'0[xX][0-9a-fA-F]++(?![{w}])', CONST_HEX),
+        ('oct', rf'0[0-7]++(?![{w}])|0(?![{w}.])', CONST_OCTAL),
+        ('dec', rf'[1-9][0-9]*+(?![{w}.])', CONST_DECIMAL),
+        # 以下分组的属性需要二次加工
+        ('str', r'"(?:[^"\\\n]|\\[^\n])*+"', STRING_),
+        ('chr', r"'(?:[^'\\\n]|\\[^\n])'", CONST_CHAR),
+        ('pp', r'\#(?:\\\n|[^\n])*+', PREPROCESSOR),
+        ('end', r'\Z', EOF),
+        ('bad', r'.', None),
+    ]
+
+
+# 一段空白（与 str.isspace 的判定一致），供 skip 整段跳过
+_SPACE_RUN = re.compile(r'\s*')
+
+# 正则引擎的主模式：先整段吸收空白和已闭合的注释（行号改为按偏移事后换算，不再单独分组），其后只覆盖不会产生错误的常见情形；
+# 其余情况（错误、续行字符串、非 ASCII 标识符等）由 bad 分组标记，回退到逐字符引擎，保证输出完全一致
+_SKIP_RULE = r'\s*+(?:(?://[^\n]*+|/\*.*?\*/)\s*+)*+'
+
+
+def _compile_scanner(binary):
+    rules = _token_rules(binary)
+    p = '%s(?:%s)' % (_SKIP_RULE, '|'.join(f'(?P<{k}>{p})' for k, p, _ in rules))
+    return re.compile(p.encode('ascii') if binary else p, re.DOTALL)
+
+
+_TOKEN_RULES = _token_rules(False)
+FAST_PATTERN = _compile_scanner(False)
+FAST_BYTES_PATTERN = _compile_scanner(True)
+_KIND = FAST_PATTERN.groupindex
+_KIND_TYPES = [None] + [t for _, _, t in _TOKEN_RULES]
+_TEXT_TYPES = {**KEYWORDS, **OP, **DL}
+_BYTES_TYPES = {k.encode('ascii'): v for k, v in _TEXT_TYPES.items()}
+_K_STR, _K_PP, _K_END, _K_BAD = (_KIND[k] for k in ('str', 'pp', 'end', 'bad'))
+
+_lastindex = attrgetter('lastindex')
+_group = re.Match.group
+_start = re.Match.start
+_end = re.Match.end
+
+ENGINES = ('char', 'regex', 'numpy')
+_BINARY = (bytes, bytearray, memoryview, mmap.mmap)
+
+
+# 切分并行词法分析的安全点：逐个跳过可能跨行的结构（块注释、字符串、字符常量、预处理行），
+# 其边界与逐字符引擎完全一致；单独匹配到的换行符之后即可从头开始词法分析
+_SPLIT_ITEM = (r'''[^\n/"'#]++|/\*.*?(?:\*/|\Z)|//[^\n]*+|/'''
+               r'''|"(?:[^"\n\\]++|\\.?)*+"?'''
+               r'''|'(?:'|(?:\\.?|.)[^'\n]*+'?)?'''
+               r'''|\#(?:[^\\\n]++|\\\n?)*+''')
+# 在 endpos 截断处停下，分组 1 记录最后一项的起点（只有最后一项可能被截断）
+_SPLIT_BULK = re.compile(r'(?:(\n|%s))*+' % _SPLIT_ITEM, re.DOTALL)
+# 从项边界起跳过若干非换行项，直到第一个换行符
+_SPLIT_TO_NL = re.compile(r'(?:%s)*+\n' % _SPLIT_ITEM, re.DOTALL)
+
+
+def split_points(text, parts):
+    """把源码切成约 parts 段，返回各段起点（首项为 0）。切分点都紧跟在块注释、字符串、
+    字符常量和预处理续行之外的换行符之后，各段可以独立词法分析"""
+    n = len(text)
+    points = [0]
+    pos = 0
+    for k in range(1, parts):
+        target = n * k // parts
+        if target <= pos:
+            continue
+        m = _SPLIT_BULK.match(text, pos, target)
+        start = m.start(1) if m.lastindex else pos
+        m = _SPLIT_TO_NL.match(text, start)
+        if m is None:
+            break
+        pos = m.end()
+        if pos >= n:
+            break
+        points.append(pos)
+    return points
+
+
+def _lex_range(text, first_line, engine):
+    """并行词法分析的工作函数：对一段源码生成 TokenBuffer、错误列表和符号表"""
+    lx = Lexer(text, engine=engine)
+    lx.line = first_line
+    tokens = lx.tokenize(compact=True)
+    # 偏移从本段开头计；行索引在主进程按整个源码建立，不必传回
+    tokens.lines = lx.table.lines = None
+    return tokens, lx.errors, lx.table
+
+
+def edit_range(old, new):
+    """两段文本的差异范围 (start, old_end, new_end)：old[start:old_end] 被替换成了 new[start:new_end]。
+    公共前缀和后缀用切片比较二分查找"""
+    n = min(len(old), len(new))
+    lo, hi = 0, n
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[:mid] == new[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    start = lo
+    lo, hi = 0, n - start
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[len(old) - mid:] == new[len(new) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return start, len(old) - lo, len(new) - lo
+
+
+_NEWLINE = re.compile('\n')
+_NEWLINE_BYTES = re.compile(b'\n')
+
+
+def line_starts(text, base=0):
+    """text 中各换行符之后的偏移（加上 base），由 finditer 一次找出"""
+    nl = _NEWLINE if isinstance(text, str) else _NEWLINE_BYTES
+    return array('q', map(base.__add__, map(_end, nl.finditer(text))))
+
+
+class LineIndex:
+    """行首偏移索引：偏移 -> (行, 列) 在有序的行首数组上二分。一份源码的 token 共享同一个索引，
+    行首数组第一次换算时才建立；流式读取时没有完整的源码，随读入的文本用 feed 追加。
+    line0 为偏移 0 所在的行号（并行分段时为该段的起始行）"""
+    __slots__ = ('src', 'line0', '_starts')
+
+    def __init__(self, src=None, line0=1):
+        self.src, self.line0 = src, line0
+        self._starts = array('q', [0]) if src is None else None
+
+    @property
+    def starts(self):
+        if self._starts is None:
+            self._starts = array('q', [0]) + line_starts(self.src)
+        return self._starts
+
+    def feed(self, chunk, base):
+        """流式读取：登记从 base 起读入的一段文本中的行首"""
+        self._starts.extend(line_starts(chunk, base))
+
+    def locate(self, offset):
+        """偏移 -> (行, 列)，行列都从 1 开始；字节源的列号按 UTF-8 解码后的字符数计"""
+        starts = self.starts
+        k = bisect_right(starts, offset) - 1
+        if isinstance(self.src, _BINARY):
+            return self.line0 + k, len(self.src[starts[k]:offset].decode('utf-8', 'surrogateescape')) + 1
+        return self.line0 + k, offset - starts[k] + 1
+
+    def line(self, offset):
+        return self.line0 + bisect_right(self.starts, offset) - 1
+
+    def edited(self, text, start, end, new_text):
+        """src[start:end] 换成 new_text 后整段文本 text 的索引：编辑点前后的行首沿用，只查找新文本里的换行"""
+        starts = self.starts
+        out = LineIndex(text, self.line0)
+        i, j = bisect_right(starts, start), bisect_right(starts, end)
+        delta = len(new_text) - (end - start)
+        out._starts = starts[:i] + line_starts(new_text, start) + array('q', map(delta.__add__, starts[j:]))
+        return out
+
+    def window(self, lo, hi):
+        """只含 [lo, hi] 范围内各行的索引，行号不变（跨进程传递一段 token 时使用）"""
+        starts = self.starts
+        i, j = bisect_right(starts, lo) - 1, bisect_right(starts, hi)
+        out = LineIndex(None, self.line0 + i)
+        out._starts = starts[i:j]
+        return out
+
+    def __getstate__(self):
+        # 跨进程时带上已建立的行首数组，不必再传源码
+        return self.starts, self.line0
+
+    def __setstate__(self, state):
+        self._starts, self.line0 = state
+        self.src = None
+
+
+# numpy 预扫描的字符类别：非 ASCII 字符一律归为 C_OTHER（可能是 Unicode 字母、数字或空白，需逐字符判定）
+C_OTHER, C_IDENT, C_DIGIT, C_SPACE, C_NEWLINE, C_QUOTE, C_DOT, C_PUNCT, C_END = range(9)
+_CLASS_TABLE = bytearray([C_PUNCT] * 128 + [C_OTHER] * 128)
+for _c in range(128):
+    _ch = chr(_c)
+    if _ch.isalpha() or _ch == '_':
+        _CLASS_TABLE[_c] = C_IDENT
+    elif _ch.isdigit():
+        _CLASS_TABLE[_c] = C_DIGIT
+    elif _ch == '\n':
+        _CLASS_TABLE[_c] = C_NEWLINE
+    elif _ch.isspace():
+        _CLASS_TABLE[_c] = C_SPACE
+    elif _ch in '\'"':
+        _CLASS_TABLE[_c] = C_QUOTE
+    elif _ch == '.':
+        _CLASS_TABLE[_c] = C_DOT
+del _c, _ch
+
+
+class CharClasses:
+    """numpy 向量化预扫描的结果：每个字符的类别，以及标识符、数字、空白各自连续段的 [起点, 终点)。
+    分段边界由类别掩码做 diff 再 nonzero 得到，查询时在有序的起点数组上二分"""
+
+    def __init__(self, text):
+        if np is None:
+            raise ImportError("numpy 预扫描需要安装 numpy")
+        if text.isascii():
+            codes = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        else:
+            # 按码位取值，超出 ASCII 的一律截到 255，查表后都是 C_OTHER
+            codes = np.minimum(np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32), 255).astype(np.uint8)
+        classes = np.frombuffer(bytes(_CLASS_TABLE), dtype=np.uint8)[codes]
+        # 末尾追加 C_END 哨兵，越过文本末尾查类别时不必判断边界
+        self.classes = classes.tobytes() + bytes([C_END])
+        self.words = self._runs((classes == C_IDENT) | (classes == C_DIGIT))
+        self.digits = self._runs(classes == C_DIGIT)
+        self.spaces = self._runs((classes == C_SPACE) | (classes == C_NEWLINE))
+
+    @staticmethod
+    def _runs(mask):
+        edges = np.diff(mask.astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+        starts = np.flatnonzero(edges == 1).astype(np.int64)
+        ends = np.flatnonzero(edges == -1).astype(np.int64)
+        return memoryview(starts).cast('B').cast('q'), memoryview(ends).cast('B').cast('q')
+
+    @staticmethod
+    def run_end(runs, pos):
+        """pos 所在连续段的终点，pos 不在任何段内时返回 pos"""
+        starts, ends = runs
+        i = bisect_right(starts, pos) - 1
+        if i >= 0 and pos < ends[i]:
+            return ends[i]
+        return pos
+
+
+# SpanTokens 长度列的上限（一个字节），达到它的长度另行记录
+_LONG_SPAN = 255
+
+
+class SpanToken:
+    """偏移形式的 token：只记录 (type, start, end)，属性文本、行号和列号在读取时才从源码字节换算"""
+    __slots__ = ('type', 'start', 'end', 'error', '_owner', '_attr')
+
+    def __init__(self, type_, start, end, err, owner, attr=None):
+        self.type, self.start, self.end, self.error = type_, start, end, err
+        self._owner, self._attr = owner, attr
+
+    @property
+    def attribute(self):
+        if self._attr is not None:
+            return self._attr
+        text = self._owner.src[self.start:self.end].decode('utf-8', 'surrogateescape')
+        if self.type == PREPROCESSOR:
+            return text.replace('\\\n', ' ').strip()
+        if self.type in (STRING_, CONST_CHAR):
+            return text[1:-1]
+        return text
+
+    @property
+    def offset(self):
+        return self.start
+
+    @property
+    def lines(self):
+        return self._owner.lines
+
+    @property
+    def line(self):
+        return self._owner.lines.line(self.start)
+
+    @property
+    def col(self):
+        return self._owner.lines.locate(self.start)[1]
+
+    def __repr__(self):
+        return f'SpanToken(type={self.type}, start={self.start}, end={self.end}, error={self.error})'
+
+
+class SpanTokens:
+    """mmap 模式的 token 序列：按列保存类型、起点和长度，下标访问时才生成 SpanToken，不为每个 token 保留对象。
+    起点列在 4 GB 以内的源码上只占 4 个字节；长度列只占 1 个字节，达到 _LONG_SPAN 的长度另记在 long 中。
+    出错的 token 很少，只把下标记在 bad 中；回退路径产生的 token（属性可能经过加工）把属性文本单独记在 attrs 中。
+    行号和列号由字节源的行索引按起点换算"""
+
+    def __init__(self, src, lines=None):
+        self.src = src
+        self.lines = lines or LineIndex(src)
+        self.types = array('b')
+        self.starts = array('I' if len(src) < 1 << 32 else 'q')
+        self.sizes = array('B')
+        self.long = {}
+        self.bad = set()
+        self.attrs = {}
+
+    def append(self, type_, start, end, err=False, attr=None):
+        i = len(self.types)
+        if attr is not None:
+            self.attrs[i] = attr
+        if err:
+            self.bad.add(i)
+        size = end - start
+        if size >= _LONG_SPAN:
+            self.long[i], size = size, _LONG_SPAN
+        self.types.append(type_)
+        self.starts.append(start)
+        self.sizes.append(size)
+
+    def extend(self, types, starts, sizes):
+        """批量追加一组没有错误、属性即原文的 token"""
+        if max(sizes, default=0) >= _LONG_SPAN:
+            base = len(self.types)
+            for i in compress(range(len(sizes)), map(_LONG_SPAN.__le__, sizes)):
+                self.long[base + i] = sizes[i]
+            sizes = list(map(min, sizes, repeat(_LONG_SPAN)))
+        self.types.extend(types)
+        self.starts.extend(starts)
+        self.sizes.extend(sizes)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        start, size = self.starts[i], self.sizes[i]
+        if size == _LONG_SPAN:
+            size = self.long[i]
+        return SpanToken(self.types[i], start, start + size, i in self.bad, self, self.attrs.get(i))
+
+    def __iter__(self):
+        attrs, long, bad = self.attrs, self.long, self.bad
+        for i, (type_, start, size) in enumerate(zip(self.types, self.starts, self.sizes)):
+            if size == _LONG_SPAN:
+                size = long[i]
+            yield SpanToken(type_, start, start + size, i in bad, self, attrs.get(i))
+
+
+class TokenBuffer:
+    """紧凑的 token 序列（按列存储）：类型、偏移、错误标记各占一列，整个序列共用一个行索引 lines。
+    标识符的属性列记符号表 table 中的 id，名字经名字池取出；其余属性文本驻留在共享的字符串表中、列中只记下标。
+    下标、切片和迭代都给出普通的 TOKEN 元组，现有的消费方无需改动"""
+
+    def __init__(self, _pool=None, lines=None, table=None):
+        self.types = array('b')
+        self.offsets = array('q')
+        self.flags = array('b')
+        self.attrs = array('i')
+        self.lines = lines
+        self.table = table if table is not None else SymbolTable()
+        # (属性 -> 下标, 下标 -> 属性)，切片与原序列共享
+        self._index, self._strings = _pool or ({}, [])
+
+    @property
+    def strings(self):
+        strings = self._strings
+        if len(strings) < len(self._index):
+            strings.extend(islice(self._index, len(strings), None))
+        return strings
+
+    def _like(self):
+        """共享字符串表、符号表和行索引的空序列"""
+        return TokenBuffer((self._index, self._strings), self.lines, self.table)
+
+    def _texts(self, types, attrs):
+        """按类型在名字池或字符串表中取出属性文本"""
+        return map(getitem, map((self.strings, self.table.names).__getitem__, map(ID.__eq__, types)), attrs)
+
+    def extend(self, tokens):
+        if not tokens:
+            return
+        index, add = self._index, self.table.add
+        types, attrs, offsets, errs, lines = zip(*tokens)
+        if self.lines is None:
+            self.lines = lines[0]
+        self.types.extend(types)
+        self.offsets.extend(offsets)
+        self.flags.extend(errs)
+        # len(index) 在插入前求值，正好是新属性的下标；标识符由符号表给出 id（词法分析时已登记）
+        self.attrs.extend([add(a) if t == ID else index.setdefault(a, len(index)) for t, a in zip(types, attrs)])
+
+    def append(self, tok):
+        self.extend((tok,))
+
+    def extend_buffer(self, other, shift=0):
+        """追加另一个 TokenBuffer（字符串表和符号表可以不同），属性下标和标识符 id 按本序列重新编号，偏移加上 shift"""
+        index = self._index
+        remap = [index.setdefault(a, len(index)) for a in other.strings]
+        ids = range(len(other.table)) if other.table is self.table else list(map(self.table.add, other.table.names))
+        self.types.extend(other.types)
+        self.offsets.extend(map(shift.__add__, other.offsets) if shift else other.offsets)
+        self.flags.extend(other.flags)
+        self.attrs.extend(map(getitem, map((remap, ids).__getitem__, map(ID.__eq__, other.types)), other.attrs))
+
+    def __getstate__(self):
+        # 跨进程传递时只带字符串列表，字典在接收端重建
+        return self.types, self.offsets, self.flags, self.attrs, self.strings, self.lines, self.table
+
+    def __setstate__(self, state):
+        self.types, self.offsets, self.flags, self.attrs, strings, self.lines, self.table = state
+        self._index, self._strings = dict(zip(strings, range(len(strings)))), strings
+
+    def detach(self):
+        """只带本序列用到的属性文本、名字和行首的副本。切片与原序列共享整个字符串表、符号表和行索引，跨进程传递前先分离"""
+        strings, names = self.strings, self.table.names
+        is_id = list(map(ID.__eq__, self.types))
+        used = list(dict.fromkeys(compress(self.attrs, map(not_, is_id))))
+        out = TokenBuffer()
+        # 新符号表只登记名字，不带出现位置
+        remap = (dict(zip(used, range(len(used)))),
+                 {i: out.table.add(names[i]) for i in dict.fromkeys(compress(self.attrs, is_id))})
+        out.types, out.offsets, out.flags = array('b', self.types), array('q', self.offsets), array('b', self.flags)
+        out.attrs = array('i', map(getitem, map(remap.__getitem__, is_id), self.attrs))
+        out._strings = [strings[a] for a in used]
+        out._index = dict(zip(out._strings, range(len(used))))
+        if self.lines is not None and self.offsets:
+            # 拼接或改动过的序列偏移不一定递增，按最小、最大偏移取窗口
+            out.lines = self.lines.window(min(self.offsets), max(self.offsets))
+        return out
+
+    def exclude(self, type_):
+        """去掉某一类型的 token，返回共享字符串表和符号表的新 TokenBuffer"""
+        keep = list(map(type_.__ne__, self.types))
+        out = self._like()
+        out.types.extend(compress(self.types, keep))
+        out.offsets.extend(compress(self.offsets, keep))
+        out.flags.extend(compress(self.flags, keep))
+        out.attrs.extend(compress(self.attrs, keep))
+        return out
+
+    def __len__(self):
+        return len(self.types)
+
+    def attribute(self, i):
+        """第 i 个 token 的属性文本"""
+        return (self.table.names if self.types[i] == ID else self.strings)[self.attrs[i]]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            out = self._like()
+            out.types, out.offsets, out.flags, out.attrs = self.types[i], self.offsets[i], self.flags[i], self.attrs[i]
+            return out
+        return tuple.__new__(TOKEN, (self.types[i], self.attribute(i), self.offsets[i], bool(self.flags[i]),
+                                     self.lines))
+
+    def __iter__(self):
+        return map(tuple.__new__, repeat(TOKEN), zip(
+            self.types, self._texts(self.types, self.attrs), self.offsets, map(bool, self.flags),
+            repeat(self.lines)))
 
-def make_token(type_, attr, line, err=False):
-    return TOKEN(type_, attr, line, err)
 
 class SymbolTable:
-    def __init__(self):
-        self.symbols = {}
+    """标识符池：每个不同的名字经 sys.intern 驻留后分配一个连续的整数 id，
+    每次出现按 (id, token 下标, 源码偏移) 追加到三列数组中。按 id 或名字查找都是 O(1)，
+    查找某个名字的全部出现位置只读分组索引，不必重新扫描源码；行号查询时才经行索引 lines 换算"""
+
+    def __init__(self, lines=None):
+        self.names = []   # id -> 名字
+        self.ids = {}     # 名字 -> id
+        self.occ_ids = array('i')
+        self.occ_tokens = array('q')
+        self.occ_offsets = array('q')
+        self.lines = lines
+        self._groups = None  # 各 id 的出现下标，首次查询时建立
+
+    @property
+    def symbols(self):
+        """名字 -> id，按首次出现的顺序迭代"""
+        return self.ids
 
     def add(self, name):
-        if name not in self.symbols:
-            self.symbols[name] = {'name': name}
-        return self.symbols[name]
+        """登记名字（不记出现位置），返回它的 id"""
+        i = self.ids.get(name)
+        if i is None:
+            name = sys.intern(name)
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
 
-    def __str__(self):
-        if not self.symbols:
-            return "符号表为空"
+    def use(self, name, token, offset):
+        """记录一次出现，返回驻留后的名字（token 引用池中的同一个字符串）"""
+        i = self.add(name)
+        self.occ_ids.append(i)
+        self.occ_tokens.append(token)
+        self.occ_offsets.append(offset)
+        self._groups = None
+        return self.names[i]
+
+    def extend(self, names, tokens, offsets):
+        """批量记录一组出现，返回驻留后的名字列表"""
+        names = list(names)
+        ids = list(map(self.ids.get, names))
+        if None in ids:
+            for i in compress(range(len(ids)), map(is_, ids, repeat(None))):
+                ids[i] = self.add(names[i])
+        self.occ_ids.extend(ids)
+        self.occ_tokens.extend(tokens)
+        self.occ_offsets.extend(offsets)
+        self._groups = None
+        return list(map(self.names.__getitem__, ids))
+
+    def merge(self, other, token=0, shift=0):
+        """并入另一张表（如另一段源码的结果），其 token 下标整体加上 token，源码偏移加上 shift"""
+        remap = list(map(self.add, other.names))
+        self.occ_ids.extend(map(remap.__getitem__, other.occ_ids))
+        self.occ_tokens.extend(map(token.__add__, other.occ_tokens))
+        self.occ_offsets.extend(map(shift.__add__, other.occ_offsets))
+        self._groups = None
+
+    def truncate(self, token):
+        """丢弃 token 下标不小于 token 的出现，以及只在这些位置出现过的名字"""
+        j = bisect_left(self.occ_tokens, token)
+        # id 按首次出现的顺序分配，保留的出现恰好用到 id 0..k-1
+        k = max(self.occ_ids[:j], default=-1) + 1
+        for name in self.names[k:]:
+            del self.ids[name]
+        del self.names[k:], self.occ_ids[j:], self.occ_tokens[j:], self.occ_offsets[j:]
+        self._groups = None
+
+    def __len__(self):
+        return len(self.names)
 
-        result = ["\n" + "=" * 50, "标识符表", "=" * 50, f"{'序号':<8} {'标识符':<20}", "-" * 50]
+    def __contains__(self, name):
+        return name in self.ids
 
-        for idx, (name, info) in enumerate(self.symbols.items(), 1):
-            result.append(f"{idx:<8} {name:<20}")
+    def id(self, name):
+        """名字 -> id，未出现过时为 None"""
+        return self.ids.get(name)
 
+    def name(self, i):
+        """id -> 名字"""
+        return self.names[i]
+
+    def _index(self):
+        if self._groups is None:
+            groups = [array('i') for _ in self.names]
+            for j, i in enumerate(self.occ_ids):
+                groups[i].append(j)
+            self._groups = groups
+        return self._groups
+
+    def uses(self, name):
+        """名字（或 id）的全部出现位置 [(token 下标, 行号), ...]，按出现顺序"""
+        i = name if isinstance(name, int) else self.ids.get(name)
+        if i is None:
+            return []
+        tokens, offsets, line = self.occ_tokens, self.occ_offsets, self.lines.line
+        return [(tokens[j], line(offsets[j])) for j in self._index()[i]]
+
+    def count(self, name):
+        """名字（或 id）的出现次数"""
+        i = name if isinstance(name, int) else self.ids.get(name)
+        return 0 if i is None else len(self._index()[i])
+
+    def __str__(self):
+        if not self.names:
+            return "符号表为空"
+
+        groups = self._index()
+        result = ["\n" + "=" * 50, "标识符表", "=" * 50, f"{'序号':<8} {'标识符':<20} {'出现次数':<8}", "-" * 50]
+        result.extend(f"{idx:<8} {name:<20} {len(uses):<8}"
+                      for idx, (name, uses) in enumerate(zip(self.names, groups), 1))
         result.append("=" * 50)
         return "\n".join(result)
 
 
 class Lexer:
-    def __init__(self, text):
+    def __init__(self, text='', engine='char'):
+        if engine not in ENGINES:
+            raise ValueError(f"未知的扫描引擎: {engine}")
+        if engine == 'numpy' and np is None:
+            raise ImportError("numpy 引擎需要安装 numpy")
+        self.engine = engine
+        self.binary = isinstance(text, _BINARY)
         self.text = text
         self.pos = 0
-        self.line = 1
-        self.col = 1
-        self.table = SymbolTable()
-        self.char = self.text[self.pos] if self.text else None
+        self._base = 0  # self.text[0] 在整个源码中的偏移（流式读取时缓冲区只是源码的一段）
+        self.lines = LineIndex(text)
+        self.table = SymbolTable(self.lines)
+        self._count = 0  # 下一个 token 的下标，符号表据此记录出现位置
+        self.char = self.text[self.pos] if self.text and not self.binary else None
         self.errors = []
+        self.symbols = SYMBOLS
+        self._scanner = None
+        self._classes = None
 
-        # 合并操作符和界符，按长度降序排列（优先匹配长符号）
-        t_ = {**OP, **DL}
-        self.symbols = sorted(t_.items(), key=lambda x: len(x[0]), reverse=True)
+    @classmethod
+    def map_file(cls, path):
+        """以只读 mmap 打开源文件，返回按字节偏移工作的 Lexer，tokenize() 得到 SpanTokens"""
+        with open(path, 'rb') as f:
+            if not f.seek(0, io.SEEK_END):
+                return cls(b'')
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
 
-    def error(self, error, content='', line=None, *args):
-        num = line if line is not None else self.line
+    def error(self, error, content='', line=None, *args, at=None):
+        """记录一条错误；行号只在这里由出错位置 at（默认当前位置）换算"""
+        num = line if line is not None else self.lines.line(self._base + (self.pos if at is None else at))
         m = ERRORS.get(error, "未知错误").format(*args)
         if content:
             _ = f'错误: {m}, 内容: "{content}" at line {num}'
@@ -52,13 +689,30 @@ class Lexer:
         self.errors.append(_)
         return _
 
+    def _token(self, type_, attr, start, err=False):
+        return TOKEN(type_, attr, self._base + start, err, self.lines)
+
+    def position(self, offset=None):
+        """把 self.text 中的偏移（默认当前位置）换算成 (行, 列)，行列都从 1 开始"""
+        return self.lines.locate(self._base + (self.pos if offset is None else offset))
+
+    # 行号和列号都由当前偏移经行索引换算，逐字符前进时不再维护
+    @property
+    def line(self):
+        return self.lines.line(self._base + self.pos)
+
+    @line.setter
+    def line(self, value):
+        # 指定当前位置的行号（如并行分段从某一行开始），其余行号随之平移
+        self.lines.line0 += value - self.line
+
+    @property
+    def col(self):
+        return self.position()[1]
+
     def next(self):
         """移动到下一个字符"""
-        if self.char == '\n':
-            self.line += 1
-            self.col = 0
         self.pos += 1
-        self.col += 1
         self.char = self.text[self.pos] if self.pos < len(self.text) else None
 
     def get_next(self):
@@ -76,40 +730,39 @@ class Lexer:
             tmp += self.char; self.next()
         return tmp, False
 
-    def skip(self): # 跳过注释
-        while self.char is not None:
-            if self.char.isspace():
-                self.next()
-                continue
-
-            # 处理 // 单行注释
-            if self.char == '/' and self.get_next() == '/':
-                while self.char is not None and self.char != '\n':
-                    self.next()
+    def skip(self): # 跳过空白和注释
+        """整段跳过：空白用正则一次匹配，注释用 find 直接跳到结束符，行号之后由偏移换算"""
+        text = self.text
+        n = len(text)
+        pos = self.pos
+        while True:
+            pos = _SPACE_RUN.match(text, pos).end()
+            if not text.startswith('/', pos):
+                break
+            # 处理 // 单行注释（换行符留给空白匹配）
+            if text.startswith('//', pos):
+                pos = text.find('\n', pos)
+                if pos < 0:
+                    pos = n
                 continue
-
             # 处理 /* */ 多行注释
-            if self.char == '/' and self.get_next() == '*':
-                l = self.line
-                self.next()  # skip /
-                self.next()  # skip *
-
-                while self.char is not None and not (self.char == '*' and self.get_next() == '/'): # */
-                    self.next()
-
-                if self.char is None: 
-                    self.error('UNTERMINATED_COMMENT', '', line=l) # 未闭合
+            if text.startswith('/*', pos):
+                end = text.find('*/', pos + 2)
+                if end < 0:
+                    self.pos = pos
+                    self.error('UNTERMINATED_COMMENT', '') # 未闭合
+                    pos = n
                     break
-                else:
-                    self.next()  # skip *
-                    self.next()  # skip /
+                pos = end + 2
                 continue
             break
+        self.pos = pos
+        self.char = text[pos] if pos < n else None
 
     def _id(self): # 识别关键词、标识符或36进制数
-        l = self.line
+        s = self.pos
         if not (self.char and (self.char.isalpha() or self.char == '_')): # 不以字母或下划线开头
-            self.error('INVALID_IDENTIFIER', '', line=l)
+            self.error('INVALID_IDENTIFIER', '', at=s)
         _ = ''
         while self.char is not None and (self.char.isalnum() or self.char == '_'):
             _ += self.char; self.next()
@@ -117,11 +770,11 @@ class Lexer:
         # 是否是关键字
         type_ = KEYWORDS.get(_, None)
         if type_ is not None:
-            return make_token(type_, _, line=l)
+            return self._token(type_, _, s)
 
         # 否则是标识符
-        self.table.add(_)
-        return make_token(ID, _, line=l)
+        _ = self.table.use(_, self._count, self._base + s)
+        return self._token(ID, _, s)
 
     def _float(self, tmp): # 处理浮点数的小数部分和指数部分
         flag = False
@@ -144,7 +797,7 @@ class Lexer:
     def _num(self): # 数字常量
         tmp = ''
         err = False
-        l = self.line
+        s = self.pos
 
         # 处理以 . 开头的浮点数
         if self.char == '.':
@@ -154,14 +807,14 @@ class Lexer:
             if self.char is not None and self.char in 'eE': # 遇到 eE -> 指数
                 tmp, err = self.read_exp(tmp)
                 if err:
-                    self.error('INVALID_FLOAT_EXPONENT', tmp, line=l)
+                    self.error('INVALID_FLOAT_EXPONENT', tmp, at=s)
             if self.char is not None and self.char in 'fFlL':
                 tmp += self.char; self.next()
             if self.char is not None and (self.char.isalnum() or self.char == '_'):
                 while self.char is not None and (self.char.isalnum() or self.char == '_'):
                     tmp += self.char; self.next()
-                self.error('INVALID_IDENTIFIER', tmp, line=l); err = True
-            return make_token(CONST_FLOAT, tmp, line=l, err=err)
+                self.error('INVALID_IDENTIFIER', tmp, at=s); err = True
+            return self._token(CONST_FLOAT, tmp, s, err)
 
 
         # 处理以 0 开头的数字（八进制/十六进制/0）
@@ -176,8 +829,8 @@ class Lexer:
                 if self.char is not None and (self.char.isalnum() or self.char == '_'):
                     while self.char is not None and (self.char.isalnum() or self.char == '_'):
                         tmp += self.char; self.next()
-                    self.error('INVALID_IDENTIFIER', tmp, line=l); err = True
-                return make_token(CONST_FLOAT, tmp, line=l, err=err)
+                    self.error('INVALID_IDENTIFIER', tmp, at=s); err = True
+                return self._token(CONST_FLOAT, tmp, s, err)
             # 十六进制
             if self.char is not None and self.char in 'xX':
                 tmp += self.char; self.next()
@@ -188,11 +841,11 @@ class Lexer:
                 if self.char is not None and (self.char.isalnum() or self.char == '_'):
                     while self.char is not None and (self.char.isalnum() or self.char == '_'):
                         tmp += self.char; self.next()
-                    self.error('INVALID_HEX', tmp, line=l); err = True
+                    self.error('INVALID_HEX', tmp, at=s); err = True
                 elif _ == self.pos:
                     # 0x 后面没有任何十六进制数字
-                    self.error('INVALID_HEX', tmp, line=l); err = True
-                return make_token(CONST_HEX, tmp, line=l, err=err)
+                    self.error('INVALID_HEX', tmp, at=s); err = True
+                return self._token(CONST_HEX, tmp, s, err)
             # 八进制
             _ = False
             while self.char is not None and self.char.isdigit():
@@ -202,10 +855,10 @@ class Lexer:
             if self.char is not None and (self.char.isalnum() or self.char == '_'):
                 while self.char is not None and (self.char.isalnum() or self.char == '_'):
                     tmp += self.char; self.next()
-                self.error('INVALID_OCTAL_DIGIT', tmp, line=l); err = True
+                self.error('INVALID_OCTAL_DIGIT', tmp, at=s); err = True
             elif _:
-                self.error('INVALID_OCTAL_DIGIT', tmp, line=l); err = True
-            return make_token(CONST_OCTAL, tmp, line=l, err=err)
+                self.error('INVALID_OCTAL_DIGIT', tmp, at=s); err = True
+            return self._token(CONST_OCTAL, tmp, s, err)
 
         # 十进制
         while self.char is not None and self.char.isdigit():
@@ -220,29 +873,29 @@ class Lexer:
             if self.char is not None and (self.char.isalnum() or self.char == '_'):
                 while self.char is not None and (self.char.isalnum() or self.char == '_'):
                     tmp += self.char; self.next()
-                self.error('INVALID_IDENTIFIER', tmp, line=l); err = True
-            return make_token(CONST_FLOAT, tmp, line=l, err=err)
+                self.error('INVALID_IDENTIFIER', tmp, at=s); err = True
+            return self._token(CONST_FLOAT, tmp, s, err)
 
         # 检查十进制数后是否跟着字母或下划线
         if self.char is not None and (self.char.isalpha() or self.char == '_'):
             while self.char is not None and (self.char.isalnum() or self.char == '_'):
                 tmp += self.char; self.next()
-            self.error('INVALID_IDENTIFIER', tmp, line=l); err = True
+            self.error('INVALID_IDENTIFIER', tmp, at=s); err = True
 
-        return make_token(CONST_DECIMAL, tmp, line=l, err=err)
+        return self._token(CONST_DECIMAL, tmp, s, err)
 
     def _str(self):
         """识别字符串常量"""
         tmp = ''
         err = False
-        l = self.line
+        s = self.pos
         self.next()  # skip opening "
         
         while self.char is not None and self.char != '"' and self.char != '\n':
             if self.char == '\\':
                 tmp += self.char; self.next()
                 if self.char is None:
-                    self.error('UNTERMINATED_STRING', tmp, line=l); err = True
+                    self.error('UNTERMINATED_STRING', tmp, at=s); err = True
                     break
                 if self.char == '\n':
                     self.next()
@@ -253,36 +906,36 @@ class Lexer:
                 
         if self.char == '\n':
             # 遇到换行符意味着字符串未闭合
-            self.error('UNTERMINATED_STRING', tmp, line=l); err = True
+            self.error('UNTERMINATED_STRING', tmp, at=s); err = True
         elif self.char == '"':
             self.next()
         else:
-            self.error('UNTERMINATED_STRING', tmp, line=l); err = True
-        return make_token(STRING_, tmp, line=l, err=err)
+            self.error('UNTERMINATED_STRING', tmp, at=s); err = True
+        return self._token(STRING_, tmp, s, err)
 
     def _char(self):
         """识别字符常量"""
         tmp = ''
         err = False
-        l = self.line
+        s = self.pos
         self.next()  # skip opening '
 
         # 空字符常量
         if self.char == "'":
-            self.error('EMPTY_CHAR', '', line=l)
+            self.error('EMPTY_CHAR', '', at=s)
             self.next()
-            return make_token(CONST_CHAR, tmp, line=l, err=True)
+            return self._token(CONST_CHAR, tmp, s, True)
 
         if self.char is None:
-            self.error('UNTERMINATED_CHAR', tmp, line=l)
-            return make_token(CONST_CHAR, tmp, line=l, err=True)
+            self.error('UNTERMINATED_CHAR', tmp, at=s)
+            return self._token(CONST_CHAR, tmp, s, True)
 
         # 处理转义字符
         if self.char == '\\':
             tmp += self.char; self.next()
             if self.char is None:
-                self.error('UNTERMINATED_CHAR', tmp, line=l)
-                return make_token(CONST_CHAR, tmp, line=l, err=True)
+                self.error('UNTERMINATED_CHAR', tmp, at=s)
+                return self._token(CONST_CHAR, tmp, s, True)
             tmp += self.char; self.next()
         else:
             tmp += self.char; self.next()
@@ -293,18 +946,18 @@ class Lexer:
             while self.char is not None and self.char != "'" and self.char != '\n':
                 extra_chars += self.char
                 self.next()
-            self.error('MULTI_CHAR', tmp + extra_chars, line=l); err = True
+            self.error('MULTI_CHAR', tmp + extra_chars, at=s); err = True
             tmp = tmp + extra_chars
 
         if self.char != "'":
-            self.error('UNTERMINATED_CHAR', tmp, line=l); err = True
+            self.error('UNTERMINATED_CHAR', tmp, at=s); err = True
         else:
             self.next()
 
-        return make_token(CONST_CHAR, tmp, line=l, err=err)
+        return self._token(CONST_CHAR, tmp, s, err)
 
     def _preprocessor(self): 
-        l = self.line
+        s = self.pos
         tmp = ''
         while self.char is not None:
             if self.char == '\\' and self.get_next() == '\n':
@@ -317,9 +970,267 @@ class Lexer:
                 break
 
             tmp += self.char; self.next()
-        return make_token(PREPROCESSOR, tmp.strip(), line=l)
+        return self._token(PREPROCESSOR, tmp.strip(), s)
 
     def next_token(self):
+        if self.binary:
+            if self._scanner is None:
+                self._scanner = chain(tokens := self.tokenize(), repeat(tokens[len(tokens) - 1]))
+            return next(self._scanner)
+        if self.engine == 'regex':
+            if self._scanner is None:
+                self._scanner = chain.from_iterable(self._scan_regex())
+            return next(self._scanner)
+        tok = self._next_token_prescan() if self.engine == 'numpy' else self._next_token_char()
+        if tok.type != EOF:
+            self._count += 1
+        return tok
+
+    def _scan_regex(self, final=True):
+        """正则引擎：按块收集整段切片匹配，在 C 层批量生成 token 列表；
+        遇到 bad 分组时由逐字符引擎识别一个 token 后继续。最后一批以 EOF 结尾。
+        token 只记起点偏移，扫描时不计算行号和列号。
+        final=False 表示 self.text 只是源码的一段前缀：可能被后续数据延长的 token 不会产生，
+        扫描停在该处并把 self.pos 留给下一次续读"""
+        text = self.text
+        n = len(text)
+        base, lines = self._base, self.lines
+        block = 64
+        it = FAST_PATTERN.finditer(text, self.pos)
+        while True:
+            ms = list(islice(it, block))
+            kinds = list(map(_lastindex, ms))
+            stop = len(ms)
+            for k in (_K_END, _K_BAD):
+                if k in kinds:
+                    stop = min(stop, kinds.index(k))
+            if stop < len(ms):
+                del ms[stop + 1:], kinds[stop + 1:]
+                m = ms.pop()
+                kinds.pop()
+            else:
+                m = None
+                block = min(block * 2, 8192)
+            if not final and ms and ms[-1].end() == n:
+                # 匹配到缓冲区末尾的 token 可能被后续数据延长
+                m = ms.pop()
+                kinds.pop()
+
+            if ms:
+                texts = list(map(_group, ms, kinds))
+                types = list(map(_TEXT_TYPES.get, texts, map(_KIND_TYPES.__getitem__, kinds)))
+                offsets = list(map(_start, ms, kinds))
+                if base:
+                    offsets = list(map(base.__add__, offsets))
+                for i in compress(range(len(kinds)), map(_K_STR.__le__, kinds)):
+                    t = texts[i]
+                    texts[i] = t.replace('\\\n', ' ').strip() if kinds[i] == _K_PP else t[1:-1]
+                at = list(compress(range(len(types)), map(ID.__eq__, types)))
+                if at:
+                    names = self.table.extend(map(texts.__getitem__, at), map(self._count.__add__, at),
+                                              map(offsets.__getitem__, at))
+                    for i, name in zip(at, names):
+                        texts[i] = name
+                self._count += len(texts)
+                yield list(map(tuple.__new__, repeat(TOKEN), zip(types, texts, offsets, repeat(False), repeat(lines))))
+
+            if m is None:
+                continue
+            pos = m.start()
+            if m.lastindex == _K_BAD:
+                # 回退：由逐字符引擎识别一个 token
+                tok = self._fallback(pos, final)
+            elif final:
+                break
+            else:
+                tok = None
+            if tok is None:
+                self.pos = pos
+                return
+            if tok.type == EOF:
+                break
+            self._count += 1
+            yield [tok]
+            it = FAST_PATTERN.finditer(text, self.pos)
+            block = 64
+
+        self.pos, self.char = n, None
+        eof = [self._token(EOF, 'EOF', n)]
+        while True:
+            yield eof
+
+    def _fallback(self, pos, final=True):
+        """由逐字符引擎从 pos 处识别一个 token。
+        final=False 时若识别一直读到缓冲区末尾（结果可能随后续数据改变），撤销其副作用并返回 None"""
+        self.pos, self.char = pos, self.text[pos]
+        if final:
+            return self._next_token_char()
+        table, nerr = self.table, len(self.errors)
+        self.table = SymbolTable(self.lines)
+        try:
+            tok = self._next_token_char()
+        finally:
+            self.table = table
+        if self.pos >= len(self.text):
+            del self.errors[nerr:]
+            return None
+        if tok.type == ID:
+            tok = tok._replace(attribute=table.use(tok.attribute, self._count, tok.offset))
+        return tok
+
+    def _scan_bytes(self):
+        """mmap 模式：在源码字节上运行同一套正则，只把类型、起点和长度写入 SpanTokens 的各列"""
+        src = self.text
+        n = len(src)
+        out = SpanTokens(src, self.lines)
+        block = 64
+        it = FAST_BYTES_PATTERN.finditer(src)
+        while True:
+            ms = list(islice(it, block))
+            kinds = list(map(_lastindex, ms))
+            stop = len(ms)
+            for k in (_K_END, _K_BAD):
+                if k in kinds:
+                    stop = min(stop, kinds.index(k))
+            if stop < len(ms):
+                del ms[stop + 1:], kinds[stop + 1:]
+                m = ms.pop()
+                kinds.pop()
+            else:
+                m = None
+                block = min(block * 2, 8192)
+
+            if ms:
+                texts = list(map(_group, ms, kinds))
+                types = list(map(_BYTES_TYPES.get, texts, map(_KIND_TYPES.__getitem__, kinds)))
+                starts = list(map(_start, ms, kinds))
+                at = list(compress(range(len(types)), map(ID.__eq__, types)))
+                if at:
+                    self.table.extend(map(str, map(texts.__getitem__, at), repeat('ascii')), map(len(out).__add__, at),
+                                      map(starts.__getitem__, at))
+                out.extend(types, starts, list(map(int.__sub__, map(_end, ms, kinds), starts)))
+
+            if m is None:
+                continue
+            if m.lastindex == _K_END:
+                break
+            tok, start, end = self._fallback_bytes(m.start(), len(out))
+            if tok.type == EOF:
+                break
+            out.append(tok.type, start, end, tok.error, tok.attribute)
+            it = FAST_BYTES_PATTERN.finditer(src, end)
+            block = 64
+
+        self.pos = n
+        out.append(EOF, n, n, attr='EOF')
+        return out
+
+    def _fallback_bytes(self, pos, index):
+        """mmap 模式的回退：把 pos 起的一段字节解码后交给逐字符引擎识别一个 token，
+        窗口不足以容纳该 token 时加倍重试。返回 (token, 起始字节, 结束字节)"""
+        src = self.text
+        size = 4096
+        line = self.lines.line(pos)  # 错误信息中的行号相对窗口起点换算
+        while True:
+            final = pos + size >= len(src)
+            # 增量解码器会保留窗口末尾不完整的多字节字符
+            window = codecs.getincrementaldecoder('utf-8')('surrogateescape').decode(src[pos:pos + size], final)
+            sub = Lexer(window)
+            sub.line = line
+            tok = sub._next_token_char()
+            if final or sub.pos < len(window):
+                break
+            size *= 2
+        self.errors.extend(sub.errors)
+        if tok.type == EOF:
+            return tok, len(src), len(src)
+        start = pos + len(window[:sub.start].encode('utf-8', 'surrogateescape'))
+        end = start + len(window[sub.start:sub.pos].encode('utf-8', 'surrogateescape'))
+        if tok.type == ID:
+            self.table.use(tok.attribute, index, start)
+        return tok, start, end
+
+    def iter_tokens(self, fileobj, chunk_size=1 << 16):
+        """从文件对象按块读取源码并惰性产生 token，结果与整体 tokenize() 一致。
+        跨块的注释、字符串、续行和多字符操作符会等到下一块读入后再识别，
+        峰值内存约为 chunk_size 加上最长的单个 token（另有每行 8 字节的行首数组）"""
+        if isinstance(fileobj.read(0), bytes):
+            fileobj = io.TextIOWrapper(fileobj, encoding='utf-8')
+        self.text, self.pos, self._base, self._count = '', 0, 0, 0
+        self.lines = self.table.lines = LineIndex()
+        while True:
+            # 上一块没有任何进展（单个 token 大于缓冲区）时加倍读取，避免反复重扫
+            size = chunk_size if self.pos else max(chunk_size, 2 * len(self.text))
+            chunk = fileobj.read(size)
+            self.lines.feed(chunk, self._base + len(self.text))
+            self._base += self.pos
+            self.text = self.text[self.pos:] + chunk
+            self.pos = 0
+            for batch in self._scan_regex(final=not chunk):
+                yield from batch
+                if batch[-1].type == EOF:
+                    return
+
+    def relex(self, old_tokens, old_text, edit_start, edit_end, new_text):
+        """增量重新分析：old_text[edit_start:edit_end] 被替换为 new_text 后，从编辑点之前最近的稳定 token 起扫描，
+        直到新 token 与旧 token 在同一位置（按编辑的长度差换算）重新对齐，之后的旧 token 只平移偏移。
+        行索引由旧索引在编辑处拼接而成，不重新查找整个文本的换行。
+        返回 (token 列表, (起点, 旧终点, 新终点))：新列表的 [起点:新终点] 取代了 old_tokens[起点:旧终点]。
+        self.errors 和 self.table 只含重新扫描的范围内的错误和标识符"""
+        text = old_text[:edit_start] + new_text + old_text[edit_end:]
+        delta = len(new_text) - (edit_end - edit_start)
+        old_lines = old_tokens[-1].lines if old_tokens else None
+        lines = (old_lines or LineIndex(old_text)).edited(text, edit_start, edit_end, new_text)
+        key = attrgetter('offset')
+
+        # 从编辑点之前的倒数第二个 token 起扫描：它之前的 token 连同向后窥视的字符都在编辑点之前
+        first = bisect_left(old_tokens, edit_start, key=key) - 2
+        if first <= 0:
+            first, pos = 0, 0
+        else:
+            pos = old_tokens[first].offset
+        # 旧 token 中起点不早于编辑终点的部分，用于判断重新对齐
+        k = bisect_left(old_tokens, edit_end, key=key)
+        n_old = len(old_tokens)
+
+        self.errors, self.table, self._count = [], SymbolTable(lines), first
+        self.text, self.pos, self._base, self.lines = text, pos, 0, lines
+        fresh = []
+        for tok in chain.from_iterable(self._scan_regex()):
+            off = tok.offset
+            while k < n_old and old_tokens[k].offset + delta < off:
+                k += 1
+            if k < n_old and old_tokens[k].offset + delta == off \
+                    and old_tokens[k][:2] == tok[:2] and old_tokens[k].error == tok.error:
+                break
+            fresh.append(tok)
+            if tok.type == EOF:
+                k = n_old
+                break
+        # 同一批里越过对齐点的 token 也登记过出现位置
+        self.table.truncate(first + len(fresh))
+
+        # 对齐点之后的旧 token 平移偏移并改用新的行索引；之前的 token 沿用原对象（编辑点之前两个索引一致）
+        rest = old_tokens[k:]
+        if rest:
+            # 批量新建元组时暂停分代 GC（同 tokenize）
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                types, attrs, offsets, errs, _ = zip(*rest)
+                rest = list(map(tuple.__new__, repeat(TOKEN),
+                                zip(types, attrs, map(delta.__add__, offsets), errs, repeat(lines))))
+            finally:
+                if enabled:
+                    gc.enable()
+        tokens = list(old_tokens[:first])
+        tokens += fresh
+        tokens += rest
+
+        self.text, self.pos, self.char = text, len(text), None
+        return tokens, (first, k, first + len(fresh))
+
+    def _next_token_char(self):
         while self.char is not None:
             self.skip()
 
@@ -327,7 +1238,7 @@ class Lexer:
             if _ is None:
                 continue
 
-            l = self.line
+            self.start = self.pos
 
             if _ == '#':
                 return self._preprocessor()
@@ -345,21 +1256,125 @@ class Lexer:
             # 匹配操作符和界符
             for s, t in self.symbols:
                 if self.text.startswith(s, self.pos):
+                    start = self.pos
                     for _ in range(len(s)):
                         self.next()
-                    return make_token(t, s, line=l)
+                    return self._token(t, s, start)
 
             _ = self.char
-            self.error('UNKNOWN_CHAR', _, line=l)
+            self.error('UNKNOWN_CHAR', _)
             self.next()
 
-        return make_token(EOF, 'EOF', line=self.line)
+        return self._token(EOF, 'EOF', self.pos)
+
+    def _batches(self, size=4096):
+        """按批产生 token 列表，最后一批以 EOF 结尾"""
+        if self.engine == 'regex':
+            yield from self._scan_regex()
+            return
+        step = self._next_token_prescan if self.engine == 'numpy' else self._next_token_char
+        while True:
+            batch = []
+            for _ in range(size):
+                tok = step()
+                batch.append(tok)
+                if tok.type == EOF:
+                    break
+                self._count += 1
+            yield batch
+
+    def _next_token_prescan(self):
+        """numpy 引擎：按预扫描得到的分段边界直接切出标识符、关键字和十进制整数，
+        段后紧跟非 ASCII 字符、数字带前导 0/小数点/后缀等情形仍交给逐字符的 _id/_num 等处理"""
+        if self._classes is None:
+            self._classes = CharClasses(self.text)
+        pre = self._classes
+        classes, text = pre.classes, self.text
+        pos = self.pos
+        k = classes[pos]
+        if k == C_SPACE or k == C_NEWLINE:
+            pos = pre.run_end(pre.spaces, pos)
+            k = classes[pos]
+        if k == C_OTHER or text.startswith('/', pos):
+            # 可能是注释或 Unicode 空白
+            self._goto(pos)
+            self.skip()
+            pos = self.pos
+            k = classes[pos]
+        if k == C_IDENT:
+            end = pre.run_end(pre.words, pos)
+            if classes[end] != C_OTHER:
+                self.start = pos
+                name = text[pos:end]
+                self._goto(end)
+                type_ = KEYWORDS.get(name)
+                if type_ is not None:
+                    return self._token(type_, name, pos)
+                name = self.table.use(name, self._count, self._base + pos)
+                return self._token(ID, name, pos)
+        elif k == C_DIGIT:
+            end = pre.run_end(pre.digits, pos)
+            if text[pos] != '0' and classes[end] not in (C_IDENT, C_DOT, C_OTHER):
+                self.start = pos
+                self._goto(end)
+                return self._token(CONST_DECIMAL, text[pos:end], pos)
+        elif k == C_PUNCT or (k == C_DOT and classes[pos + 1] not in (C_DIGIT, C_OTHER)):
+            # 操作符和界符：由长到短查表，与逐字符引擎按长度降序尝试的结果相同
+            for size in (3, 2, 1):
+                sym = text[pos:pos + size]
+                type_ = _TEXT_TYPES.get(sym)
+                if type_ is not None and len(sym) == size:
+                    self.start = pos
+                    self._goto(pos + size)
+                    return self._token(type_, sym, pos)
+        self._goto(pos)
+        return self._next_token_char()
+
+    def _goto(self, pos):
+        self.pos = pos
+        self.char = self.text[pos] if pos < len(self.text) else None
+
+    def tokenize_parallel(self, workers=None, compact=False, min_chunk=1 << 20):
+        """把源码在安全换行处切成多段，用进程池并行词法分析后按顺序拼接：
+        各段从自己的起始行号开始计数，错误按段顺序合并，符号表按首次出现的顺序合并。
+        结果与 tokenize() 相同；mmap 模式或源码不足两段时直接调用 tokenize()"""
+        text = self.text
+        workers = workers or os.cpu_count() or 1
+        parts = min(workers, len(text) // min_chunk) if not self.binary else 1
+        points = split_points(text, parts) if parts > 1 else [0]
+        if len(points) < 2:
+            return self.tokenize(compact)
+        bounds = list(zip(points, points[1:] + [len(text)]))
+        first_lines = [self.lines.line(a) for a, _ in bounds]
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+            results = pool.map(_lex_range, (text[a:b] for a, b in bounds), first_lines, repeat(self.engine))
+            tokens = self._stitch(results, points)
+        self.pos, self.char = len(text), None
+        return tokens if compact else list(tokens)
+
+    def _stitch(self, results, points):
+        """按段顺序拼接 _lex_range 的结果，偏移加上各段起点 points，去掉除最后一段外的 EOF"""
+        tokens = TokenBuffer(lines=self.lines, table=self.table)
+        results = list(results)
+        for i, ((part, errors, table), start) in enumerate(zip(results, points)):
+            self.table.merge(table, len(tokens), start)
+            tokens.extend_buffer(part if i == len(results) - 1 else part[:-1], start)
+            self.errors.extend(errors)
+        return tokens
 
-    def tokenize(self):
-        ans = []
-        _ = self.next_token()
-        while _.type != EOF:
-            ans.append(_)
-            _ = self.next_token()
-        ans.append(_)
-        return ans
+    def tokenize(self, compact=False):
+        """compact=True 时返回按列存储的 TokenBuffer（mmap 模式总是返回 SpanTokens）"""
+        # 批量生成大量 token 时暂停分代 GC，避免反复扫描新建的元组
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            if self.binary:
+                return self._scan_bytes()
+            ans = TokenBuffer(lines=self.lines, table=self.table) if compact else []
+            for batch in self._batches():
+                ans.extend(batch)
+                if batch and batch[-1].type == EOF:
+                    return ans
+        finally:
+            if enabled:
+                gc.enable()
@@ -4,9 +4,9 @@ C 语言编译器实验 - 语法分析 (修复行号同步版)
 import os
 import tkinter as tk
 from tkinter import filedialog, scrolledtext, messagebox, ttk, font
-from lexer_core import Lexer, TYPES, STRING_, CONST_CHAR, EOF
+from lexer_core import Lexer, TYPES, STRING_, CONST_CHAR, EOF, edit_range
 try:
-    from parser_core import LL1Parser
+    from parser_core import LL1Parser, IncrementalState, shared_parser
 except ImportError:
     LL1Parser = None
 
@@ -27,6 +27,10 @@ class LexerApp(tk.Tk):
         # 保存分析结果供导出使用
         self._parser = None
         self._sets_data = None
+        # 上一次词法分析的 (源码, token 列表)，供增量重新分析
+        self._last_lex = None
+        # 上一次语法分析的状态（各顶层声明分界处的检查点），编辑后只重新分析改动的声明
+        self._parse_state = None
 
         self.create_widgets()
 
@@ -188,10 +192,28 @@ class LexerApp(tk.Tk):
             self.input_text.insert("1.0", content)
             self.update_line_numbers() # 加载后刷新行号
 
+    def tokenize(self, code):
+        """词法分析：与上一次分析的源码比较，只重新扫描改动的部分"""
+        if self._last_lex is None:
+            tokens = Lexer(code).tokenize()
+        else:
+            old_code, old_tokens = self._last_lex
+            if code == old_code:
+                return old_tokens
+            start, old_end, new_end = edit_range(old_code, code)
+            tokens, _ = Lexer().relex(old_tokens, old_code, start, old_end, code[start:new_end])
+        self._last_lex = (code, tokens)
+        return tokens
+
+    def reparse(self, tokens):
+        """语法分析：沿用上一次分析的状态，只重新分析改动的顶层声明"""
+        if self._parse_state is None:
+            self._parse_state = IncrementalState()
+        return shared_parser().reanalyze(tokens, self._parse_state)
+
     def run_analysis(self):
         code = self.input_text.get("1.0", tk.END)
-        lexer = Lexer(code)
-        tokens = lexer.tokenize()
+        tokens = self.tokenize(code)
         self.notebook.select(0)
         self.lexer_tab.config(state='normal')
         self.lexer_tab.delete("1.0", tk.END)
@@ -202,16 +224,15 @@ class LexerApp(tk.Tk):
     def run_parser(self):
         if LL1Parser is None: return
         code = self.input_text.get("1.0", tk.END)
-        lexer = Lexer(code)
-        tokens = lexer.tokenize()
-        parser = LL1Parser()
+        tokens = self.tokenize(code)
+        parser = shared_parser()
 
         # 保存 parser 和 sets_data 供导出使用
         self._parser = parser
         self._sets_data = parser.calc_sets()
         self.display_sets(parser, self._sets_data)
 
-        records, success, message = parser.analyze(tokens)
+        records, success, message = self.reparse(tokens)
 
         self.notebook.select(1)
         for item in self.tree.get_children(): self.tree.delete(item)
@@ -233,6 +254,8 @@ class LexerApp(tk.Tk):
         # Reset saved analysis results
         self._parser = None
         self._sets_data = None
+        self._last_lex = None
+        self._parse_state = None
 
     @staticmethod
     def _fmt_set(s):
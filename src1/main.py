@@ -154,7 +154,7 @@ class EnhancedApp(LexerApp):
         if not code: return
         
         lexer = Lexer(code)
-        tokens = lexer.tokenize()
+        tokens = lexer.tokenize(compact=True)
         
         # 按照截图样式导出词法结果
         with open(file_path, 'w', encoding='utf-8') as f:
@@ -175,14 +175,12 @@ class EnhancedApp(LexerApp):
         )
         if not file_path: return
 
-        code = self.input_text.get("1.0", tk.END).strip()
-        if not code: return
+        code = self.input_text.get("1.0", tk.END)
+        if not code.strip(): return
         
-        # 重新执行一次分析以获取最新的 records
-        lexer = Lexer(code)
-        tokens = lexer.tokenize()
-        parser = LL1Parser()
-        records, _, _ = parser.analyze(tokens)
+        # 取最新的 records：与界面用同一份源码和分析状态，未改动时直接沿用上一次的结果
+        tokens = self.tokenize(code)
+        records, _, _ = self.reparse(tokens)
         
         # 调用之前写好的鲁棒版导出函数
         self.export_to_excel(tokens, records, filename=file_path)
@@ -245,14 +243,13 @@ class EnhancedApp(LexerApp):
         
         # 额外增加：自动将结果同步到 result.txt
         if LL1Parser is not None:
-            code = self.input_text.get("1.0", tk.END).strip()
-            if not code:
+            # 与父类分析同一份未裁剪的源码：词法结果和增量分析的状态都直接沿用，不再整体重新分析
+            code = self.input_text.get("1.0", tk.END)
+            if not code.strip():
                 return
                 
-            lexer = Lexer(code)
-            tokens = lexer.tokenize()
-            parser = LL1Parser()
-            records, success, message = parser.analyze(tokens)
+            tokens = self.tokenize(code)
+            records, success, message = self.reparse(tokens)
             
             if records:
                 print("\n[调试信息] 数据第一行内容为:", records[0])
@@ -1,7 +1,9 @@
 import sys
 import os
+import tempfile
+import time
 from lexer_core import Lexer, TYPES
-from parser_core import LL1Parser
+from parser_core import LL1Parser, shared_parser
 
 
 def show_sets(p):
@@ -24,7 +26,7 @@ def show_tokens(tokens):
     for i, t in enumerate(tokens, 1):
         tn = TYPES.get(t.type, 'UNK')
         mark = " ERR" if t.error else ""
-        print(f"{i:4d} {tn:<15} {t.attribute:<20} L{t.line}{mark}")
+        print(f"{i:4d} {tn:<15} {t.attribute:<20} L{t.line}:{t.col}{mark}")
 
 
 def show_records(records):
@@ -33,27 +35,60 @@ def show_records(records):
         print(f"{step:4d} | {stack:<40} | {inp:<30} | {prod:<20} | {act}")
 
 
+def show_timing():
+    """冷启动（计算 FIRST/FOLLOW/SELECT 和分析表并写缓存）与热启动（读缓存）构造 LL1Parser 的耗时"""
+    with tempfile.TemporaryDirectory() as d:
+        t0 = time.perf_counter()
+        LL1Parser(cache_dir=d)
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        p = LL1Parser(cache_dir=d)
+        warm = time.perf_counter() - t0
+    print(f"\nLL1Parser 构造: 冷启动 {cold * 1000:.1f} ms, 热启动 {warm * 1000:.1f} ms"
+          f" ({'读取缓存' if p.from_cache else '缓存未生效'})")
+
+
 def main():
-    path = sys.argv[1] if len(sys.argv) > 1 else 'src/c-code.c'
+    args = sys.argv[1:]
+    # --mmap: 以只读映射打开源文件，token 只记录字节偏移
+    use_mmap = '--mmap' in args
+    # --timing: 报告分析表冷启动与读缓存热启动的构造耗时
+    timing = '--timing' in args
+    args = [a for a in args if a not in ('--mmap', '--timing')]
+    # --trace=none|errors|summary|full: 分析记录的详细程度（默认 full）
+    trace = 'full'
+    for a in [a for a in args if a.startswith('--trace=')]:
+        trace = a.split('=', 1)[1]
+        args.remove(a)
+    # --max-errors=N: 出错后恢复并继续分析，最多报告 N 个错误（0 表示不设上限，默认 1 即遇错即停）
+    max_errors = 1
+    for a in [a for a in args if a.startswith('--max-errors=')]:
+        max_errors = int(a.split('=', 1)[1]) or None
+        args.remove(a)
+    path = args[0] if args else 'src/c-code.c'
     if not os.path.exists(path):
         print("file not found:", path)
         return
 
-    with open(path, 'r', encoding='utf-8') as f:
-        code = f.read()
-
-    lexer = Lexer(code)
-    tokens = lexer.tokenize()
+    if use_mmap:
+        lexer = Lexer.map_file(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            code = f.read()
+        lexer = Lexer(code)
+    tokens = lexer.tokenize(compact=True)
     show_tokens(tokens)
 
-    parser = LL1Parser()
+    if timing:
+        show_timing()
+    parser = shared_parser()
     if parser.conflicts:
         print("\nLL(1) 冲突:")
         for A, a, old, new in parser.conflicts:
             print(f"  M[{parser.display(A)}, {a}] : {parser.display(A)} -> {' '.join(old)}  AND  {parser.display(A)} -> {' '.join(new)}")
         return
 
-    records, ok, msg = parser.analyze(tokens)
+    records, ok, msg = parser.analyze(tokens, trace=trace, max_errors=max_errors)
     show_records(records)
     print("\nRESULT:", msg)
 
@@ -1,11 +1,60 @@
 from __future__ import annotations
 
+import hashlib
+import os
+import pickle
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from itertools import accumulate, compress, count, islice, repeat
+from operator import attrgetter, itemgetter, ne
 from typing import Dict, List, Tuple, Set, Optional
 
-from constants import TYPES, EOF
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from constants import TYPES, KEYWORDS, OP, DL, ID, EOF, PREPROCESSOR
+from lexer_core import TOKEN, TokenBuffer
 
 EPS = "epsilon"
+TRACES = ("none", "errors", "summary", "full")
+ERROR_CONTEXT = 8  # 出错记录里出错处前后各列出的 token 数
+SYNC_ANCHORS = (";", "{", "}")  # 错误恢复时语句级的同步符号
+RECOVER_MATCHES = 3  # 报错后要连续匹配这么多 token 才报告下一个错误，避免同一处错误连带报告
+# 语义动作：(产生式左部, 右部符号) → 匹配该位置的 token 时以其属性调用的 SymbolEnv 方法
+ENV_ACTIONS = {
+    ("TypeAlias", "id"): "declare", ("TypeAlias", "type_id"): "declare",  # typedef 声明的名字
+    ("DeclName", "id"): "shadow", ("DeclName", "type_id"): "shadow",  # 块内的变量或函数名遮住同名的 typedef 名
+    ("ParamName", "id"): "param", ("ParamName", "type_id"): "param",  # 形参在函数体里遮住同名的 typedef 名
+    ("FuncSuf", ";"): "end_params",  # 只是函数声明时形参不进入任何作用域
+}
+# 分析结果缓存文件的格式版本：缓存内容（含 CompiledGrammar 的字段）变化时加一
+CACHE_VERSION = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__")
+# Pratt 表达式分析用的 C 二元运算符优先级（数大的先结合），按 token 原文查；
+# 文法把 ~ ! 也当作二元运算符，C 里没有对应，放在最低一级
+BINARY_PRECEDENCE = {
+    "->": 15,
+    "*": 13, "/": 13, "%": 13,
+    "+": 12, "-": 12,
+    "<<": 11, ">>": 11,
+    "<": 10, ">": 10, "<=": 10, ">=": 10,
+    "==": 9, "!=": 9,
+    "&": 8, "^": 7, "|": 6, "&&": 5, "||": 4,
+    "?": 3, "~": 3, "!": 3,
+    "+=": 2, "-=": 2, "*=": 2, "/=": 2, "%=": 2, "&=": 2, "|=": 2, "^=": 2, "<<=": 2, ">>=": 2,
+}
+RIGHT_ASSOC = {"?", "+=", "-=", "*=", "/=", "%=", "&=", "|=", "^=", "<<=", ">>="}
+# _ExprEngine 按 c_grammar 里这些非终结符的产生式手写，文法里它们与 c_grammar 一致时才启用
+EXPR_NTS = ("Expr", "ExprTail", "LogOp", "RelExpr", "RelTail", "RelOp", "ArithExpr", "ArithTail",
+            "Primary", "PrimaryTail", "Args", "NextArg")
+
 # 用于输出的中文别名
 ALIAS = {
     "S": "程序",
@@ -18,12 +67,14 @@ ALIAS = {
     "TypeAlias": "类型别名",
     "StructDecl": "结构体声明",
     "StructHead": "结构体头",
+    "StructTag": "结构体标签",
     "StructAfterTag": "结构体标签后缀",
     "AfterStructBody": "结构体体后缀",
     "Type": "类型",
     "BaseType": "基础类型",
     "Ptr": "指针",
     "DeclSuf": "声明后缀",
+    "DeclName": "声明的名字",
     "VarTail": "变量尾部",
     "VarSuf": "变量后缀",
     "InitOpt": "可选初始化",
@@ -34,6 +85,7 @@ ALIAS = {
     "MemberList": "成员列表",
     "Member": "成员",
     "MemberType": "成员类型",
+    "MemberName": "成员名",
     "Block": "语句块",
     "StmtList": "语句序列",
     "Stmt": "语句",
@@ -55,6 +107,7 @@ ALIAS = {
     "Unary": "一元运算",
     "TermSuf": "项后缀",
     "Params": "形参列表",
+    "ParamName": "形参名",
     "Args": "实参列表",
     "NextArg": "后续实参",
 }
@@ -92,17 +145,18 @@ def c_grammar() -> Grammar:
         ],
         
         "Declarator": [
-            ["Pointer", "id"] # 支持 *tree_setup 或直接 tree_setup
+            ["Pointer", "DeclName"] # 支持 *tree_setup 或直接 tree_setup
         ],
+        "DeclName": [["id"], ["type_id"]],  # 块内与 typedef 名同名的变量在块内遮住它
 
         "Decl": [["TypedefDecl"], ["StructDecl"], ["NonStructDecl"]],
         "NonStructDecl": [["Type", "id", "DeclSuf"]],
 
-        "TypedefDecl": [["typedef", "TypedefRhs", "id", ";"]],
+        "TypedefDecl": [["typedef", "TypedefRhs", "TypeAlias", ";"]],
         "TypedefRhs": [["Type"], ["TypedefStruct"]],
         "TypedefStruct": [["struct", "TypedefStructBody"]],
         "TypedefStructBody": [
-            ["id", "TypedefStructAfterId"], # 情况：struct id { ... } 或 struct id
+            ["StructTag", "TypedefStructAfterId"], # 情况：struct id { ... } 或 struct id
             ["{", "MemberList", "}", "Ptr"] # 情况：struct { ... }
         ],
         "TypedefStructAfterId": [
@@ -115,12 +169,13 @@ def c_grammar() -> Grammar:
         ],
         "TypedefStructHead": [["{", "MemberList", "}", "Ptr"], ["id", "TypedefStructTail"]],
         "TypedefStructTail": [["{", "MemberList", "}", "Ptr"], ["Ptr"]],
-        "TypeAlias": [["id"]],
+        "TypeAlias": [["id"], ["type_id"]],  # 已是类型名时为重复的 typedef
 
         "StructDecl": [["struct", "StructHead"]],
-        "StructHead": [["id", "StructAfterTag"], ["{", "MemberList", "}", "AfterStructBody"]],
-        "StructAfterTag": [["{", "MemberList", "}", "AfterStructBody"], ["Ptr", "id", "DeclSuf"]],
-        "AfterStructBody": [[";"], ["Pointer", "id", "VarSuf", "NextDecl"]],
+        "StructHead": [["StructTag", "StructAfterTag"], ["{", "MemberList", "}", "AfterStructBody"]],
+        "StructTag": [["id"], ["type_id"]],  # 标签与 typedef 名各自一个名字空间
+        "StructAfterTag": [["{", "MemberList", "}", "AfterStructBody"], ["Ptr", "DeclName", "DeclSuf"]],
+        "AfterStructBody": [[";"], ["Pointer", "DeclName", "VarSuf", "NextDecl"]],
 
         "Type": [
             ["BaseType"], 
@@ -180,18 +235,21 @@ def c_grammar() -> Grammar:
         "NextInit": [[",", "Init" ,"NextInit"], [EPS]],
 
         "MemberList": [["Member", "MemberList"], [EPS]],
-        "Member": [["MemberType", "id", "VarSuf", ";"]],
-        "MemberType": [["Type"], ["struct", "id", "Ptr"]],
+        "Member": [["MemberType", "MemberName", "VarSuf", ";"]],
+        "MemberName": [["id"], ["type_id"]],  # 成员名自成一个名字空间，可以与 typedef 名相同
+        "MemberType": [["Type"], ["struct", "StructTag", "Ptr"]],
 
         "Block": [["{", "InnerContent", "}"]],
         "InnerContent": [
             ["BaseType", "Declarator", "VarSuf", "InitPart", "NextDecl", "InnerContent"], # 处理 int a;
+            ["type_id", "IdStartAfter", "InnerContent"],  # 处理 Book b; 或给与类型名同名的变量赋值
+            ["TypedefDecl", "InnerContent"],        # 块内的 typedef，到 } 为止有效
             ["id", "IdStartAfter", "InnerContent"], # 处理 bt = ... 或 Node *p;
             ["Stmt", "InnerContent"],               # 处理 if, while, return 等关键字语句
             [EPS]
         ],
         "IdStartAfter": [
-            ["Pointer", "id", "VarSuf", "InitPart", "NextDecl"], # 路径 A: 变量定义 (如 Node *p;)
+            ["Pointer", "DeclName", "VarSuf", "InitPart", "NextDecl"], # 路径 A: 变量定义 (如 Node *p;)
             ["StmtIdTail"]                       # 路径 B: 赋值或调用 (如 bt = ... 或 bt++;)
         ],
         "LocalDecl": [
@@ -310,7 +368,7 @@ def c_grammar() -> Grammar:
         "TermSuf": [["[", "Expr", "]", "TermSuf"], [".", "id", "TermSuf"], ["(", "Args", ")", "TermSuf"], [EPS]],
 
         "Params": [
-            ["Type", "id", "NextParam"], # 这里的 Type 已经能处理 Node*
+            ["Type", "ParamName", "NextParam"], # 这里的 Type 已经能处理 Node*
             ["void", "NextParam"], 
             [EPS]
         ],
@@ -322,97 +380,213 @@ def c_grammar() -> Grammar:
         ],
         
         # 3. 确保 Param 始终使用最通用的 Type
-        "Param": [["Type", "Declarator"]],
+        "Param": [["Type", "Pointer", "ParamName"]],
+        "ParamName": [["id"], ["type_id"]],  # 与 typedef 名同名的形参在函数体里遮住它
         "Args": [["Expr", "NextArg"], [EPS]],
         "NextArg": [[",", "Expr", "NextArg"], [EPS]],
     }
     return Grammar("S", g)
 
 
+def _strongly_connected(n: int, succ: List[List[int]]) -> List[List[int]]:
+    """Tarjan 算法（迭代实现）求强连通分量。分量按逆拓扑序给出：
+    每个分量都排在它经边可达（即它所依赖）的分量之后"""
+    index = [-1] * n
+    low = [0] * n
+    on_stack = bytearray(n)
+    stack: List[int] = []
+    out: List[List[int]] = []
+    counter = 0
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = 1
+            for j in range(i, len(succ[v])):
+                w = succ[v][j]
+                if index[w] < 0:
+                    work.append((v, j + 1))
+                    work.append((w, 0))
+                    break
+                if on_stack[w]:
+                    low[v] = min(low[v], index[w])
+            else:
+                if low[v] == index[v]:
+                    comp = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        comp.append(w)
+                        if w == v:
+                            break
+                    out.append(comp)
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+    return out
+
+
+def _propagate(n: int, const: List[int], deps: List[List[int]]) -> List[int]:
+    """求解 X[v] = const[v] | OR(X[u] for u in deps[v]) 的最小解。
+    按强连通分量的逆拓扑序处理，依赖的分量总是先算完；同一分量内的集合必然相等，一次合并即可"""
+    value = [0] * n
+    for comp in _strongly_connected(n, deps):
+        acc = 0
+        for v in comp:
+            acc |= const[v]
+            for u in deps[v]:
+                acc |= value[u]
+        for v in comp:
+            value[v] = acc
+    return value
+
+
+class _BitSets:
+    """FIRST/FOLLOW 的位集引擎：终结符集合编码为 int 位掩码，可空性只求一次，
+    集合之间的包含关系建成依赖图后按强连通分量顺序传播"""
+
+    def __init__(self, g: Grammar, first: Optional[Dict[str, Set[str]]] = None):
+        self.g = g
+        self.nts = list(g.prods)
+        self.nt_index = {A: i for i, A in enumerate(self.nts)}
+        self.terms = sorted(g.terminals)
+        self.term_index = {t: i for i, t in enumerate(self.terms)}
+        self.bit = {t: 1 << i for i, t in enumerate(self.terms)}
+        # 产生式右部编码：非终结符为其下标，终结符为 ~位序号（负数），epsilon 省略
+        self.prods = [(self.nt_index[A], [self._code(x) for x in rhs if x != EPS])
+                      for A, alts in g.prods.items() for rhs in alts]
+        if first is None:
+            self.nullable = self._nullable()
+            self.first = self._first()
+        else:
+            self.nullable = [EPS in first[A] for A in self.nts]
+            self.first = [self.mask(first[A]) for A in self.nts]
+
+    def _code(self, x: str) -> int:
+        i = self.nt_index.get(x)
+        return i if i is not None else ~self.term_index[x]
+
+    def mask(self, names) -> int:
+        m = 0
+        for t in names:
+            if t != EPS:
+                m |= self.bit[t]
+        return m
+
+    def names(self, m: int) -> Set[str]:
+        out: Set[str] = set()
+        while m:
+            low = m & -m
+            out.add(self.terms[low.bit_length() - 1])
+            m ^= low
+        return out
+
+    def _nullable(self) -> List[bool]:
+        """可空的非终结符：每个产生式记下右部尚未确认可空的非终结符个数，减到 0 时左部可空"""
+        nullable = [False] * len(self.nts)
+        pending = []
+        uses: List[List[int]] = [[] for _ in self.nts]
+        work = []
+        for p, (A, rhs) in enumerate(self.prods):
+            if any(x < 0 for x in rhs):
+                pending.append(-1)  # 含终结符，不可能为空
+                continue
+            pending.append(len(rhs))
+            for x in rhs:
+                uses[x].append(p)
+            if not rhs and not nullable[A]:
+                nullable[A] = True
+                work.append(A)
+        while work:
+            B = work.pop()
+            for p in uses[B]:
+                pending[p] -= 1
+                A = self.prods[p][0]
+                if pending[p] == 0 and not nullable[A]:
+                    nullable[A] = True
+                    work.append(A)
+        return nullable
+
+    def _first(self) -> List[int]:
+        n = len(self.nts)
+        const = [0] * n
+        deps: List[Set[int]] = [set() for _ in range(n)]
+        for A, rhs in self.prods:
+            for x in rhs:
+                if x < 0:
+                    const[A] |= 1 << ~x
+                    break
+                if x != A:
+                    deps[A].add(x)
+                if not self.nullable[x]:
+                    break
+        return _propagate(n, const, [sorted(d) for d in deps])
+
+    def seq(self, rhs: List[int]) -> Tuple[int, bool]:
+        """编码后符号串的 (FIRST 位掩码, 是否可空)"""
+        m = 0
+        for x in rhs:
+            if x < 0:
+                return m | 1 << ~x, False
+            m |= self.first[x]
+            if not self.nullable[x]:
+                return m, False
+        return m, True
+
+    def follow(self) -> List[int]:
+        n = len(self.nts)
+        const = [0] * n
+        const[self.nt_index[self.g.start]] |= self.bit["EOF"]
+        deps: List[Set[int]] = [set() for _ in range(n)]
+        for A, rhs in self.prods:
+            # 从右往左扫描，随时维护后缀 beta 的 FIRST 和可空性
+            m, nullable = 0, True
+            for x in reversed(rhs):
+                if x < 0:
+                    m, nullable = 1 << ~x, False
+                    continue
+                const[x] |= m
+                if nullable and x != A:
+                    deps[x].add(A)
+                m = self.first[x] | (m if self.nullable[x] else 0)
+                nullable = nullable and self.nullable[x]
+        return _propagate(n, const, [sorted(d) for d in deps])
+
+
 def first_sets(g: Grammar) -> Dict[str, Set[str]]:
-    nts = g.nonterminals
-    ts = g.terminals
-    first: Dict[str, Set[str]] = {A: set() for A in nts}
-
-    def f_sym(x: str) -> Set[str]:
-        if x == EPS:
-            return {EPS}
-        if x in ts and x not in nts:
-            return {x}
-        if x not in nts:
-            return {x}
-        return first[x]
-
-    changed = True
-    while changed:
-        changed = False
-        for A, alts in g.prods.items():
-            for rhs in alts:
-                acc: Set[str] = set()
-                nullable = True
-                for s in rhs:
-                    fs = f_sym(s)
-                    acc |= {t for t in fs if t != EPS}
-                    if EPS not in fs:
-                        nullable = False
-                        break
-                if nullable:
-                    acc.add(EPS)
-                if not acc.issubset(first[A]):
-                    first[A] |= acc
-                    changed = True
+    bs = _BitSets(g)
+    first: Dict[str, Set[str]] = {}
+    for A, m, nullable in zip(bs.nts, bs.first, bs.nullable):
+        first[A] = bs.names(m)
+        if nullable:
+            first[A].add(EPS)
     return first
 
 
 def first_seq(seq: List[str], g: Grammar, first: Dict[str, Set[str]]) -> Set[str]:
-    ts = g.terminals
-    nts = g.nonterminals
-
-    def f_sym(x: str) -> Set[str]:
-        if x == EPS:
-            return {EPS}
-        if x in ts and x not in nts:
-            return {x}
-        if x not in nts:
-            return {x}
-        return first[x]
-
+    # first 的键就是全部非终结符，其余符号都是终结符
     if not seq:
         return {EPS}
     out: Set[str] = set()
     for s in seq:
-        fs = f_sym(s)
-        out |= {t for t in fs if t != EPS}
+        fs = {EPS} if s == EPS else first[s] if s in first else {s}
+        out |= fs
         if EPS not in fs:
+            out.discard(EPS)
             return out
     out.add(EPS)
     return out
 
 
 def follow_sets(g: Grammar, first: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
-    nts = g.nonterminals
-    follow: Dict[str, Set[str]] = {A: set() for A in nts}
-    follow[g.start].add("EOF")
-
-    changed = True
-    while changed:
-        changed = False
-        for A, alts in g.prods.items():
-            for rhs in alts:
-                for i, B in enumerate(rhs):
-                    if B not in nts:
-                        continue
-                    beta = rhs[i + 1:]
-                    fb = first_seq(beta, g, first)
-                    add1 = {t for t in fb if t != EPS}
-                    if not add1.issubset(follow[B]):
-                        follow[B] |= add1
-                        changed = True
-                    if EPS in fb:
-                        if not follow[A].issubset(follow[B]):
-                            follow[B] |= follow[A]
-                            changed = True
-    return follow
+    bs = _BitSets(g, first)
+    return {A: bs.names(m) for A, m in zip(bs.nts, bs.follow())}
 
 
 def select_sets(g: Grammar, first: Dict[str, Set[str]], follow: Dict[str, Set[str]]):
@@ -441,24 +615,861 @@ def build_parse_table(select: Dict[Tuple[str, Tuple[str, ...]], Set[str]]):
     return table, conflicts
 
 
+class CompiledGrammar:
+    """整数编码的文法和预测分析表：终结符编号 0..n_terms-1，非终结符接着编号。
+    分析表是按 nt * n_terms + t 下标的扁平整数数组（nt 为非终结符的序号，-1 表示无表项），
+    产生式存为逆序的整数元组，可直接压栈；is_term 标记每个符号是否为终结符"""
+
+    def __init__(self, grammar: Grammar, table: Dict[Tuple[str, str], List[str]]):
+        terms = sorted(grammar.terminals)
+        self.symbols: List[str] = terms + list(grammar.prods)
+        self.index: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self.n_terms = len(terms)
+        self.is_term = bytearray(i < self.n_terms for i in range(len(self.symbols)))
+        self.start = self.index[grammar.start]
+        self.eof = self.index["EOF"]
+
+        # 产生式按文法中的顺序编号
+        self.prods: List[Tuple[str, List[str]]] = []
+        self.rhs_rev: List[Tuple[int, ...]] = []
+        pid: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+        for A, alts in grammar.prods.items():
+            for rhs in alts:
+                pid.setdefault((A, tuple(rhs)), len(self.prods))
+                self.prods.append((A, rhs))
+                self.rhs_rev.append(tuple(self.index[x] for x in reversed(rhs) if x != EPS))
+
+        self.table = array('i', [-1]) * ((len(self.symbols) - self.n_terms) * self.n_terms)
+        for (A, a), rhs in table.items():
+            self.table[(self.index[A] - self.n_terms) * self.n_terms + self.index[a]] = pid[(A, tuple(rhs))]
+
+    def expansions(self, collapse: bool = True, stop=frozenset()):
+        """按分析表下标给出每个表项一步压栈的内容，返回 (压栈序列, 产生式链) 两个列表，无表项处为 None。
+        collapse 为 False 时就是该表项产生式的逆序右部；为 True 时是宏产生式：向前看符号不变，
+        栈顶的非终结符按表继续展开（可空的直接消去），直到栈顶为终结符、stop 里的非终结符、
+        没有表项的非终结符或序列为空，产生式链为依次用到的产生式编号。逐步展开的每一步都由同一张表决定，
+        因此接受的语言、出错的位置和出错时的栈都与逐步展开相同"""
+        n_terms, table, rhs_rev, is_term = self.n_terms, self.table, self.rhs_rev, self.is_term
+        seqs: List[Optional[Tuple[int, ...]]] = [None] * len(table)
+        chains: List[Optional[Tuple[int, ...]]] = [None] * len(table)
+        busy = set()  # 正在展开的表项，冲突时保留的表项可能构成左递归，遇到时停止展开
+
+        def expand(k: int, a: int):
+            if seqs[k] is None:
+                busy.add(k)
+                prod = table[k]
+                seq, chain = list(rhs_rev[prod]), [prod]
+                while collapse and seq and not is_term[seq[-1]] and seq[-1] not in stop:
+                    kb = (seq[-1] - n_terms) * n_terms + a
+                    if table[kb] < 0 or kb in busy:
+                        break
+                    seq.pop()
+                    sub, sub_chain = expand(kb, a)
+                    seq.extend(sub)
+                    chain.extend(sub_chain)
+                busy.discard(k)
+                seqs[k], chains[k] = tuple(seq), tuple(chain)
+            return seqs[k], chains[k]
+
+        for k, prod in enumerate(table):
+            if prod >= 0:
+                expand(k, k % n_terms)
+        return seqs, chains
+
+
+def grammar_hash(g: Grammar) -> str:
+    """文法产生式（含顺序，顺序决定冲突时保留的表项）的 SHA-256，作为缓存的键"""
+    return hashlib.sha256(repr((g.start, list(g.prods.items()))).encode("utf-8")).hexdigest()
+
+
+def _load_cache(path: str, key: str):
+    """读取缓存文件；不存在、损坏、版本或文法不符时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError, TypeError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION or data.get("hash") != key:
+        return None
+    return data
+
+
+def _save_cache(path: str, data) -> None:
+    """先写临时文件再改名，避免并发启动读到写了一半的缓存；目录不可写时放弃"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+class _Pushback:
+    """可以退回 token 的迭代器：错误恢复时出错记录预读的 token 要交还给分析"""
+
+    __slots__ = ("it", "pending")
+
+    def __init__(self, it):
+        self.it = it
+        self.pending = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.pending:
+            return self.pending.popleft()
+        return next(self.it)
+
+    def unread(self, toks) -> None:
+        self.pending.extendleft(reversed(toks))
+
+
+def _shifted(values: array, start: int, off: int, lo: int = 0, root: int = 0) -> array:
+    """values[start:] 的新数组：不小于 lo 的值加上 off，小于 lo 的非零值换成 root（lo 为 0 时全部平移）。
+    安装了 numpy 时整体向量化"""
+    if np is not None:
+        a = np.frombuffer(values, dtype=np.intc)[start:]
+        a = np.where(a >= lo, a + off, np.where(a == 0, 0, root)) if lo else a + off
+        return array('i', a.astype(np.intc).tobytes())
+    if not lo:
+        return array('i', map(off.__add__, islice(values, start, None)))
+    return array('i', [v + off if v >= lo else root if v else 0 for v in islice(values, start, None)])
+
+
+def _lines_differ(a, b) -> Optional[int]:
+    """两个行索引的行首开始不同的偏移；一致（或同一个索引）时为 None"""
+    if a is b or a is None or b is None:
+        return None
+    if a.line0 != b.line0:
+        return 0
+    a, b = a.starts, b.starts
+    i = next(compress(count(), map(ne, a, b)), min(len(a), len(b)))
+    rest = [s[i] for s in (a, b) if i < len(s)]
+    return min(rest) if rest else None
+
+
+def _token_edit(old, new, block: int = 512) -> Tuple[int, int, int]:
+    """两次输入的差异范围 (start, old_end, new_end)：old[start:old_end] 换成了 new[start:new_end]。
+    公共前缀按整个 token（类型、原文、偏移和出错标记）比较，再截到两边行首开始不同之前，
+    其中的出错信息连同行列号都可以沿用；公共后缀只比较类型和原文，偏移变了不影响分析，
+    沿用的后半段记录不含出错信息。按 block 个一块整体比较（relex 沿用的 token 是同一对象），不同的块里再逐个比较"""
+    n = min(len(old), len(new))
+    start = 0
+    while start < n:
+        end = min(n, start + block)
+        a, b = old[start:end], new[start:end]
+        if a != b:
+            start += next(compress(count(), map(ne, a, b)), end - start)
+            break
+        start = end
+    if start:
+        cut = _lines_differ(old[start - 1].lines, new[start - 1].lines)
+        if cut is not None:
+            start = bisect_left(new, cut, 0, start, key=attrgetter('offset'))
+    key = itemgetter(0, 1)
+    same, limit = 0, n - start
+    while same < limit:
+        k = min(limit, same + block)
+        a, b = old[len(old) - k:len(old) - same], new[len(new) - k:len(new) - same]
+        if a != b:
+            a, b = list(map(key, a)), list(map(key, b))
+            if a != b:
+                same += next(compress(count(), map(ne, reversed(a), reversed(b))))
+                break
+        same = k
+    return start, len(old) - same, len(new) - same
+
+
+def _rest_input_str(filtered, i: int) -> str:
+    if i >= len(filtered):
+        return "#"
+    attrs = [t.attribute for t in filtered[i:]]
+    return " ".join(attrs) + " #"
+
+
+class ParseTrace:
+    """分析过程的紧凑记录：每步只存步骤号、产生式编号（匹配终结符 t 时为 -1 - t）、
+    栈深度和输入位置，分析栈以父指针结点共享存储。错误恢复时（max_errors 不为 1）报告的错误也各占一行，信息存在 errors 里。
+    作为序列读取时才渲染成 (步骤, 分析栈, 剩余输入, 产生式, 动作) 五列文字"""
+
+    def __init__(self, parser: "LL1Parser", filtered, summary: bool = False):
+        self.parser = parser
+        self.filtered = filtered
+        self.summary = summary  # 只记录产生式推导的步骤
+        self.steps = array('i')
+        self.prods = array('i')
+        self.depths = array('i')
+        self.positions = array('i')
+        self.tops = array('i')
+        self.node_syms = array('i')
+        self.node_parents = array('i')
+        self.errors: Dict[int, str] = {}
+
+    def node(self, sym: int, parent: int) -> int:
+        self.node_syms.append(sym)
+        self.node_parents.append(parent)
+        return len(self.node_syms) - 1
+
+    def add(self, step: int, prod: int, depth: int, pos: int, top: int):
+        self.steps.append(step)
+        self.prods.append(prod)
+        self.depths.append(depth)
+        self.positions.append(pos)
+        self.tops.append(top)
+
+    def error(self, step: int, depth: int, pos: int, top: int, msg: str):
+        self.errors[len(self.steps)] = msg
+        self.add(step, -1 - len(self.parser.compiled.symbols), depth, pos, top)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def state(self):
+        """各列数组和错误信息，可跨进程传给 splice"""
+        return (self.steps, self.prods, self.depths, self.positions, self.tops, self.node_syms, self.node_parents,
+                self.errors)
+
+    def splice(self, state, step0: int, pos0: int, root: int, last: bool) -> int:
+        """把从开始符号单独分析一段 token 的记录（state）接到末尾：步骤号、输入位置加上偏移，
+        该段的 EOF 结点和开始符号结点换成本记录的 0 号结点和 root（上一段留下的开始符号）。
+        不是最后一段时去掉结尾开始符号的空推导（summary 时）及匹配 EOF（full 时），
+        下一段从这个开始符号接着展开，返回它在本记录中的结点号"""
+        steps, prods, depths, positions, tops, syms, parents, errors = state
+        base = len(self.node_syms) - 2
+
+        def remap(v: int) -> int:
+            return v + base if v > 1 else root if v == 1 else v
+
+        self.node_syms.extend(syms[2:])
+        self.node_parents.extend(map(remap, parents[2:]))
+        n = len(steps) - (0 if last else 1 if self.summary else 2)
+        first = len(self.steps)
+        self.steps.extend(x + step0 for x in steps[:n])
+        self.prods.extend(prods[:n])
+        self.depths.extend(depths[:n])
+        self.positions.extend(x + pos0 for x in positions[:n])
+        self.tops.extend(map(remap, tops[:n]))
+        self.errors.update((first + i, msg) for i, msg in errors.items())
+        return root if last else remap(tops[n])
+
+    def prefix(self, filtered, n_records: int, n_nodes: int) -> "ParseTrace":
+        """前 n_records 条记录和前 n_nodes 个结点（数组切片复制）组成的新记录，剩余输入一列按 filtered 渲染"""
+        out = ParseTrace(self.parser, filtered, self.summary)
+        out.steps, out.prods, out.depths = self.steps[:n_records], self.prods[:n_records], self.depths[:n_records]
+        out.positions, out.tops = self.positions[:n_records], self.tops[:n_records]
+        out.node_syms, out.node_parents = self.node_syms[:n_nodes], self.node_parents[:n_nodes]
+        out.errors = {i: msg for i, msg in self.errors.items() if i < n_records}
+        return out
+
+    def extend_from(self, other: "ParseTrace", record: int, node: int, root: int, step_off: int, pos_off: int):
+        """接上 other 从第 record 条起的记录和从第 node 个起的结点。other 在第 record 条时分析栈只剩 EOF 和开始符号，
+        此后的记录只引用此后新建的结点、0 号 EOF 结点和这个开始符号结点：前者平移到本记录末尾，开始符号结点换成 root。
+        步骤号、输入位置分别加上 step_off、pos_off"""
+        off = len(self.node_syms) - node
+        self.steps.extend(_shifted(other.steps, record, step_off))
+        self.prods.extend(other.prods[record:])
+        self.depths.extend(other.depths[record:])
+        self.positions.extend(_shifted(other.positions, record, pos_off))
+        self.tops.extend(_shifted(other.tops, record, off, node, root))
+        self.node_syms.extend(other.node_syms[node:])
+        self.node_parents.extend(_shifted(other.node_parents, node, off, node, root))
+        first = len(self.steps) - (len(other.steps) - record)
+        self.errors.update((first + i - record, msg) for i, msg in other.errors.items() if i >= record)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.render(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.render(i)
+
+    def __iter__(self):
+        return map(self.render, range(len(self)))
+
+    def stack(self, i: int) -> List[int]:
+        """第 i 条记录时的分析栈（栈底在前）"""
+        syms, parents = self.node_syms, self.node_parents
+        out = [0] * self.depths[i]
+        node = self.tops[i]
+        for k in range(len(out) - 1, -1, -1):
+            out[k] = syms[node]
+            node = parents[node]
+        return out
+
+    def render(self, i: int):
+        parser = self.parser
+        pos = self.positions[i]
+        prod = self.prods[i]
+        head = (self.steps[i], parser._stack_str(self.stack(i)), _rest_input_str(self.filtered, pos))
+        if prod >= 0:
+            return head + parser._prod_text(prod)
+        if i in self.errors:
+            return head + ("", self.errors[i])
+        attr = self.filtered[pos].attribute if pos < len(self.filtered) else "EOF"
+        return head + (f"匹配 {parser.display(parser.compiled.symbols[-1 - prod])}", f"“{attr}” 从栈顶弹出")
+
+
+class ParseTree:
+    """具体语法树，存放在平行数组构成的结点池里，不为每个结点创建对象：
+    syms 为文法符号编号，first_child/next_sibling 为结点下标（-1 表示没有），
+    tokens 为终结符结点匹配的 token 在过滤掉预处理指令后的输入中的下标（非终结符为 -1）。
+    结点按先序编号，即分析栈的弹出顺序，结点 0 是开始符号。
+    错误恢复时未展开就弹出的非终结符和缺失的终结符是没有子结点、tokens 为 -1 的结点，跳过的 token 不进树"""
+
+    SKIP = -1
+
+    def __init__(self, compiled: CompiledGrammar):
+        self.symbols = compiled.symbols
+        self.n_terms = compiled.n_terms
+        # 分析时每步只记一个编号：展开为产生式编号，匹配终结符 t 为 len(prods) + t，
+        # 错误恢复时弹出的符号 s 为 len(prods) + len(symbols) + s，跳过一个 token 为 SKIP
+        n_prods, n_syms = len(compiled.prods), len(self.symbols)
+        self.match_base = n_prods
+        self.missing_base = n_prods + n_syms
+        self._code_sym = [compiled.index[A] for A, _ in compiled.prods] + list(range(n_syms)) * 2
+        self._code_kids = [len(rhs) for rhs in compiled.rhs_rev] + [0] * (2 * n_syms)
+        self._code_leaf = [0] * n_prods + [1] * n_syms + [0] * n_syms
+        self._eof_code = n_prods + compiled.eof
+        self.syms = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.tokens = array('i')
+
+    def finish(self, log: List[int], recovered: bool = False) -> None:
+        """由分析过程逐步记下的编号建立各列。设结点 i 弹出前的栈深为 d[i]：
+        它的子树之后第一个栈深为 d[i] - 1 的结点就是下一个兄弟；最后一个子结点与父结点栈深相同，
+        即父结点之后第一个同栈深的结点，它没有下一个兄弟。安装了 numpy 时整体向量化计算。
+        recovered 表示 log 里有错误恢复跳过的 token，要先去掉再修正各叶结点的 token 下标"""
+        if log and log[-1] == self._eof_code:
+            log = log[:-1]
+        positions = None
+        if recovered:
+            positions = []
+            consumed = 0
+            codes = []
+            for c in log:
+                if c == self.SKIP:
+                    consumed += 1
+                    continue
+                if self._code_leaf[c]:
+                    positions.append(consumed)
+                    consumed += 1
+                codes.append(c)
+            log = codes
+        if not log:
+            return  # 第一步就出错
+        if np is not None:
+            self._finish_numpy(log)
+        else:
+            self._finish_python(log)
+        if positions:
+            for i, j in zip(compress(range(len(log)), map(self._code_leaf.__getitem__, log)), positions):
+                self.tokens[i] = j
+
+    def _finish_python(self, log: List[int]) -> None:
+        n = len(log)
+        kids = list(map(self._code_kids.__getitem__, log))
+        depth = list(accumulate(map((-1).__add__, kids), initial=1))
+        self.syms = array('i', map(self._code_sym.__getitem__, log))
+        first_child = array('i', range(1, n + 1))
+        next_sibling = array('i', repeat(-1, n))
+        last = [-1] * (max(depth) + 2)  # 右侧最近的各栈深结点
+        for i in range(n - 1, -1, -1):
+            d = depth[i]
+            if kids[i]:
+                if last[d] >= 0:
+                    next_sibling[last[d]] = -1
+            else:
+                first_child[i] = -1
+            next_sibling[i] = last[d - 1]
+            last[d] = i
+        if first_child[-1] >= n:
+            first_child[-1] = -1  # 出错时最后展开的结点还没有弹出子结点
+        tokens = array('i', repeat(-1, n))
+        for j, i in enumerate(compress(range(n), map(self._code_leaf.__getitem__, log))):
+            tokens[i] = j
+        self.first_child, self.next_sibling, self.tokens = first_child, next_sibling, tokens
+
+    def _finish_numpy(self, log: List[int]) -> None:
+        codes = np.array(log, dtype=np.intp)
+        n = len(codes)
+        kids = np.array(self._code_kids, dtype=np.intp)[codes]
+        leaf = np.array(self._code_leaf, dtype=bool)[codes]
+        idx = np.arange(n)
+        depth = np.ones(n, dtype=np.intp)
+        np.cumsum(kids[:-1] - 1, out=depth[1:])
+        depth[1:] += 1
+        # 按 (栈深, 下标) 排序：同栈深的下一个结点紧随其后，“i 之后第一个栈深为 d - 1 的结点”
+        # 的查询也按同样顺序排列，可以顺序二分查找
+        # 栈深通常很小，转成 16 位整数时 numpy 的稳定排序走基数排序
+        order = np.argsort(depth.astype(np.int16) if depth.max() < 1 << 15 else depth, kind='stable')
+        sd = depth[order]
+        keys = sd * (n + 1) + order
+        pos = np.searchsorted(keys, keys - (n + 1), side='right')
+        j = order[np.minimum(pos, n - 1)]
+        next_sibling = np.empty(n, dtype=np.intp)
+        next_sibling[order] = np.where((pos < n) & (depth[j] == sd - 1), j, -1)
+        same = np.full(n, -1, dtype=np.intp)
+        same[:-1] = np.where(sd[1:] == sd[:-1], order[1:], -1)
+        last_child = same[kids[order] > 0]
+        next_sibling[last_child[last_child >= 0]] = -1
+        first_child = np.where(kids > 0, idx + 1, -1)
+        if first_child[-1] >= n:
+            first_child[-1] = -1
+        tokens = np.where(leaf, np.cumsum(leaf) - 1, -1)
+        syms = np.array(self._code_sym, dtype=np.intp)[codes]
+        self.syms, self.first_child, self.next_sibling, self.tokens = (
+            array('i', a.astype(np.intc).tobytes()) for a in (syms, first_child, next_sibling, tokens))
+
+    def __len__(self):
+        return len(self.syms)
+
+    def symbol(self, node: int) -> str:
+        return self.symbols[self.syms[node]]
+
+    def children(self, node: int):
+        child = self.first_child[node]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def preorder(self, node: int = 0):
+        """先序遍历 node 为根的子树，产生结点下标"""
+        first_child, next_sibling = self.first_child, self.next_sibling
+        stack = [node]
+        while stack:
+            v = stack.pop()
+            yield v
+            child = first_child[v]
+            if child >= 0:
+                kids = []
+                while child >= 0:
+                    kids.append(child)
+                    child = next_sibling[child]
+                stack.extend(reversed(kids))
+
+    def leaves(self, node: int = 0):
+        """子树中匹配了 token 的终结符结点，按输入顺序"""
+        tokens = self.tokens
+        return (v for v in self.preorder(node) if tokens[v] >= 0)
+
+    def cursor(self, node: int = 0) -> "TreeCursor":
+        return TreeCursor(self, node)
+
+
+class TreeCursor:
+    """在 ParseTree 上移动的游标：只记当前结点和从起点到它的路径，移动不分配结点对象"""
+
+    def __init__(self, tree: ParseTree, node: int = 0):
+        self.tree = tree
+        self.node = node
+        self._path: List[int] = []
+
+    @property
+    def symbol(self) -> str:
+        return self.tree.symbol(self.node)
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.tree.syms[self.node] < self.tree.n_terms
+
+    @property
+    def token(self) -> int:
+        """匹配的 token 下标，非终结符或未匹配时为 -1"""
+        return self.tree.tokens[self.node]
+
+    @property
+    def depth(self) -> int:
+        return len(self._path)
+
+    def goto_first_child(self) -> bool:
+        child = self.tree.first_child[self.node]
+        if child < 0:
+            return False
+        self._path.append(self.node)
+        self.node = child
+        return True
+
+    def goto_next_sibling(self) -> bool:
+        sib = self.tree.next_sibling[self.node]
+        if sib < 0 or not self._path:
+            return False
+        self.node = sib
+        return True
+
+    def goto_parent(self) -> bool:
+        if not self._path:
+            return False
+        self.node = self._path.pop()
+        return True
+
+
+_TOP, _PAREN, _INDEX, _CALL = range(4)  # _ExprEngine 的帧种类
+
+
+class _ExprError(Exception):
+    def __init__(self, msg: str, tok):
+        super().__init__(msg)
+        self.tok = tok
+
+
+class _ExprEngine:
+    """Expr 的优先级爬升（Pratt）分析：LL(1) 驱动展开 Expr 时把整个表达式交给 run 直接消耗，
+    省去 Expr → RelExpr → ArithExpr → Primary → 各 Tail → ε 这一串查表和压栈。
+    接受的语言与文法完全相同（Primary 之间用任意二元运算符连接），出错信息也与逐步展开时一致；
+    二元运算符按 BINARY_PRECEDENCE 的 C 优先级结合，out 不为 None 时按结合结果输出后缀式。
+    分析中的状态（tok、la 等）都在实例上，每次分析新建一个，names 为这次分析的 typedef 名集合"""
+
+    def __init__(self, parser: "LL1Parser", names=frozenset()):
+        cg = parser.compiled
+        t = cg.index.__getitem__
+        self.parser = parser
+        self.term_of = parser.token_terms.get
+        self.eof = cg.eof
+        self.id = t("id")
+        self.type_id = cg.index.get("type_id", -1)
+        self.lparen, self.rparen, self.lbrack, self.rbrack = t("("), t(")"), t("["), t("]")
+        self.dot, self.comma, self.star, self.amp = t("."), t(","), t("*"), t("&")
+        self.postfix = {t("++"), t("--")}
+        self.tail_first = self.postfix | {self.lparen, self.lbrack, self.dot}
+        self.literals = {t(x) for x in ("int_lit", "float_lit", "string_lit", "char_lit")}
+        # 二元运算符 → 它右边操作数所在的非终结符（出错信息用）
+        g = parser.grammar.prods
+        self.binary = {t(rhs[0]): "RelExpr" for rhs in g["LogOp"]}
+        self.binary.update({t(rhs[0]): "ArithExpr" for rhs in g["RelOp"]})
+        self.binary.update({t(rhs[0]): "Primary" for rhs in g["ArithTail"] if rhs != [EPS]})
+        self.first = {t(x) for x in parser.first["Expr"] if x != EPS}
+        self.follow = {t(x) for x in parser.follow["Expr"]}
+        self.names = names
+        self.tok = None
+        self.la = -1
+
+    def run(self, tok, la: int, it, history, out=None, follow=None) -> int:
+        """从 tok（向前看符号 la）开始分析一个 Expr，返回消耗的 token 数。消耗的 token 追加到 history，
+        表达式之后的 token 及其向前看符号留在 self.tok / self.la；出错时抛出 _ExprError。
+        follow 为表达式之后允许出现的终结符，默认 FOLLOW(Expr)"""
+        self.tok, self.la, self.it, self.history, self.out = tok, la, it, history, out
+        self.end = self.follow if follow is None else follow
+        self.n = 0
+        self.expr()
+        return self.n
+
+    def advance(self) -> None:
+        self.history.append(self.tok)
+        self.n += 1
+        tok = self.tok = next(self.it, None)
+        if tok is None:
+            self.la = self.eof
+        elif tok.type == ID and tok.attribute in self.names:
+            self.la = self.type_id
+        else:
+            self.la = self.term_of(tok.type, -1)
+
+    def error(self, msg: str):
+        tok = self.tok
+        attr, line, col = (tok.attribute, tok.line, tok.col) if tok is not None else ("EOF", -1, -1)
+        return _ExprError(f"{msg} {attr} (行 {line}, 列 {col})", tok)
+
+    def expect(self, term: int) -> None:
+        if self.la != term:
+            raise self.error(f"匹配失败：期望 {self.parser.display(self.parser.compiled.symbols[term])} 但看到")
+        self.advance()
+
+    def expr(self) -> None:
+        """用显式的帧栈代替递归，嵌套深度不受解释器递归上限限制。每个完整的 Expr（最外层、括号、
+        下标、每个实参）一帧：[种类, 运算符栈（右操作数的最低优先级, 运算符）, 待作用的一元运算符, 实参数]。
+        二元运算符按优先级进出运算符栈（即优先级爬升），依次分析操作数，nt 为下一个操作数所在的非终结符"""
+        out = self.out
+        frames = [[_TOP, [], [], 0]]
+        nt = "Expr"
+        while True:
+            la = self.la
+            if la == self.id:
+                if out is not None:
+                    out.append(self.tok.attribute)
+                self.advance()
+                nt = self.after(frames, self.la in self.tail_first, True)
+            elif la in self.literals:
+                if out is not None:
+                    out.append(self.tok.attribute)
+                self.advance()
+                nt = self.after(frames, False, False)
+            elif la == self.lparen:
+                self.advance()
+                frames.append([_PAREN, [], [], 0])
+                nt = "Expr"
+            elif la == self.star or la == self.amp:
+                frames[-1][2].append(self.tok.attribute)
+                self.advance()
+                nt = "Primary"
+            else:
+                raise self.error(f"文法错误：无法用 {self.parser.display(nt)} 匹配")
+            if nt is None:
+                return
+
+    def after(self, frames, tail: bool, open_tail: bool) -> Optional[str]:
+        """一个 Primary 的开头分析完之后：后缀（调用、下标、成员、++/--）、一元运算符、二元运算符，
+        以及各帧的 Expr 结束。需要下一个操作数时返回它所在的非终结符，整个表达式结束时返回 None。
+        open_tail 表示最后一个操作数之后是否还留着未弹出的 PrimaryTail（以 id 起头且没有以 ++/-- 结束），
+        Expr 结束后的 token 不在 FOLLOW(Expr) 里时，按逐步展开时最内层的 PrimaryTail / ArithTail 报错"""
+        out = self.out
+        while True:
+            while tail:
+                la = self.la
+                if la == self.lparen:
+                    self.advance()
+                    if self.la != self.rparen:
+                        if self.la not in self.first:
+                            raise self.error(f"文法错误：无法用 {self.parser.display('Args')} 匹配")
+                        frames.append([_CALL, [], [], 1])
+                        return "Expr"
+                    self.advance()
+                    if out is not None:
+                        out.append("call/0")
+                elif la == self.lbrack:
+                    self.advance()
+                    frames.append([_INDEX, [], [], 0])
+                    return "Expr"
+                elif la == self.dot:
+                    self.advance()
+                    if out is not None and self.la == self.id:
+                        out.append(self.tok.attribute)
+                    self.expect(self.id)
+                    if out is not None:
+                        out.append(".")
+                elif la in self.postfix:
+                    if out is not None:
+                        out.append("post" + self.tok.attribute)
+                    self.advance()
+                    tail = open_tail = False
+                else:
+                    tail = False
+
+            kind, ops, prefix, argc = frame = frames[-1]
+            while prefix:
+                op = prefix.pop()
+                if out is not None:
+                    out.append("u" + op)
+
+            right = self.binary.get(self.la)
+            if right is not None:
+                op = self.tok.attribute
+                bp = BINARY_PRECEDENCE.get(op, 3)
+                # 栈中运算符的右操作数至少要有它记下的优先级，不够时先结合
+                while ops and ops[-1][0] > bp:
+                    if out is not None:
+                        out.append(ops[-1][1])
+                    ops.pop()
+                ops.append((bp if op in RIGHT_ASSOC else bp + 1, op))
+                self.advance()
+                return right
+
+            if out is not None:
+                out.extend(op for _, op in reversed(ops))
+            ops.clear()
+            if self.la not in (self.end if kind == _TOP else self.follow):
+                raise self.error(f"文法错误：无法用 {self.parser.display('PrimaryTail' if open_tail else 'ArithTail')} 匹配")
+            if kind == _TOP:
+                return None
+            if kind == _CALL and self.la == self.comma:
+                self.advance()
+                frame[3] += 1
+                return "Expr"
+            if kind == _CALL and self.la != self.rparen:
+                raise self.error(f"文法错误：无法用 {self.parser.display('NextArg')} 匹配")
+            self.expect(self.rbrack if kind == _INDEX else self.rparen)
+            frames.pop()
+            if kind == _PAREN:
+                tail = open_tail = False
+            else:
+                if out is not None:
+                    out.append("[]" if kind == _INDEX else f"call/{argc}")
+                tail = open_tail = True
+
+
+class SymbolEnv:
+    """分作用域的 typedef 名环境。bindings 为名字 → 绑定栈（各绑定所在作用域的深度 d；块内声明的同名普通标识符
+    记为 ~d，在该作用域里遮住外层的 typedef 名），types 为当前是类型名的名字，分析时直接对它做一次字典查找。
+    push/pop 进出作用域（{ 和 }）只改深度，pop 时按声明日志撤销这一层的绑定，没有声明的作用域进出不做别的事。
+    与 typedef 名同名的形参先记在 params 里，进入函数体的作用域时再遮住外层的 typedef 名"""
+
+    def __init__(self, names=()):
+        self.bindings: Dict[str, List[int]] = {name: [0] for name in names}
+        self.types: Dict[str, None] = dict.fromkeys(self.bindings)
+        self.depth = 0
+        self.params: List[str] = []
+        self._log: List[str] = list(self.bindings)  # 按声明顺序记下名字，各名字所在的深度不减
+
+    def __contains__(self, name) -> bool:
+        return name in self.types
+
+    def __len__(self) -> int:
+        return len(self.bindings)
+
+    def names(self) -> Set[str]:
+        return set(self.bindings)
+
+    def declare(self, name: str) -> None:
+        stack = self.bindings.setdefault(name, [])
+        if stack and stack[-1] == self.depth:
+            return  # 同一作用域里重复的 typedef
+        stack.append(self.depth)
+        self.types[name] = None
+        self._log.append(name)
+
+    def shadow(self, name: str) -> None:
+        """当前作用域里声明了普通标识符 name：同名的 typedef 名到这个作用域结束前不再是类型名。
+        与 typedef 名在同一作用域（包括最外层）的声明不改变绑定"""
+        stack = self.bindings.get(name)
+        if stack is None or stack[-1] < 0 or stack[-1] == self.depth:
+            return  # 不是 typedef 名、已被遮住，或是同一作用域里的重复声明
+        stack.append(~self.depth)
+        self.types.pop(name, None)
+        self._log.append(name)
+
+    def param(self, name: str) -> None:
+        """记下与 typedef 名同名的形参，在随后的函数体里遮住它"""
+        if name in self.bindings:
+            self.params.append(name)
+
+    def end_params(self, _=None) -> None:
+        """只是函数声明，没有函数体：丢掉记下的形参"""
+        self.params.clear()
+
+    def copy(self) -> "SymbolEnv":
+        """当前各作用域绑定的副本，之后对任一方的声明和进出作用域互不影响"""
+        env = SymbolEnv()
+        env.bindings = {name: stack[:] for name, stack in self.bindings.items()}
+        env.types = dict(self.types)
+        env.depth, env.params, env._log = self.depth, self.params[:], self._log[:]
+        return env
+
+    def restore(self, saved: "SymbolEnv") -> None:
+        """回到 copy() 得到的副本 saved 的状态（各字典和列表原地修改，分析中持有的引用仍然有效）"""
+        self.bindings.clear()
+        self.bindings.update((name, stack[:]) for name, stack in saved.bindings.items())
+        self.types.clear()
+        self.types.update(saved.types)
+        self.depth, self.params[:], self._log[:] = saved.depth, saved.params, saved._log
+
+    def push(self) -> None:
+        self.depth += 1
+        if self.params:
+            for name in self.params:
+                self.shadow(name)
+            self.params.clear()
+
+    def pop(self) -> None:
+        """退出当前作用域，撤销其中的声明和遮挡。已在最外层（} 多于 {）时什么也不做"""
+        if not self.depth:
+            return
+        log, bindings, types, depth = self._log, self.bindings, self.types, self.depth
+        while log and bindings[log[-1]][-1] in (depth, ~depth):
+            name = log.pop()
+            stack = bindings[name]
+            stack.pop()
+            if not stack:
+                del bindings[name]
+                types.pop(name, None)
+            elif stack[-1] >= 0:
+                types[name] = None
+            else:
+                types.pop(name, None)
+        self.depth -= 1
+
+
+class ParseSession:
+    """一次分析的可变状态：分作用域的 typedef 名、读到的位置、步数和语法树。
+    LL1Parser 构造后只读，各线程用各自的 ParseSession 共用同一个分析器；
+    要让前一个文件里声明的 typedef 名在下一个文件里可见，就把同一个会话依次传给 analyze"""
+
+    def __init__(self, typedef_names=()):
+        self.env = SymbolEnv(typedef_names)
+        self.pos = 0  # 上一次分析消耗的 token 数（不含预处理指令）
+        self.steps = 0  # 上一次分析的步数，交给 _ExprEngine 的表达式每个 token 算一步
+        self.tree: Optional[ParseTree] = None
+
+
+class IncrementalState:
+    """LL1Parser.reanalyze 在两次分析之间保留的状态：上一次（去掉预处理指令的）输入、记录级别、结果和会话，
+    以及各顶层声明分界处的检查点 (token 位置, 步数, 记录条数, 结点数, 开始符号结点, 已声明的 typedef 名数)。
+    检查点处分析栈只剩 EOF 和开始符号、typedef 名都在最外层，从任一检查点都能接着分析；只记到第一个错误之前"""
+
+    def __init__(self, typedef_names=()):
+        self.typedef_names = tuple(typedef_names)
+        self.tokens = None
+        self.trace: Optional[str] = None
+        self.max_errors: Optional[int] = 1
+        self.result = None  # 上一次 reanalyze 的返回值
+        self.session = ParseSession(typedef_names)
+        self.marks: List[Tuple[int, int, int, int, int, int]] = []
+        self.horizon = 0  # 在第一个错误处停止时，结果只取决于前 horizon 个 token
+        self.reparsed = (0, 0)  # 上一次实际重新分析的 token 范围（新输入中的位置）
+
+
 class LL1Parser:
-    def __init__(self, grammar: Optional[Grammar] = None):
+    def __init__(self, grammar: Optional[Grammar] = None, cache_dir: Optional[str] = CACHE_DIR, pratt: bool = True,
+                 macros: bool = True):
+        """cache_dir 为分析结果缓存目录，按文法哈希命名缓存文件，文法改变后自动失效；None 表示不用缓存。
+        pratt 为 True 且文法的表达式部分与 c_grammar 相同时，不生成记录和语法树的分析把 Expr 交给 _ExprEngine。
+        macros 为 True 时不生成记录的分析按宏产生式（见 CompiledGrammar.expansions）一步压入整段展开。
+        构造之后分析器只读（_prod_texts 和 _expansion_cache 是按需填充的缓存，并发填充结果相同），
+        每次分析的可变状态都在 ParseSession 里，可由多个线程共用，见 shared_parser"""
         self.grammar = grammar or c_grammar()
 
-        self.first = first_sets(self.grammar)
-        self.follow = follow_sets(self.grammar, self.first)
-        self.select = select_sets(self.grammar, self.first, self.follow)
-
-        self.table, self.conflicts = build_parse_table(self.select)
+        key = grammar_hash(self.grammar)
+        path = os.path.join(cache_dir, f"ll1-{key[:16]}.pickle") if cache_dir else None
+        data = _load_cache(path, key) if path else None
+        self.from_cache = data is not None
+        if data is None:
+            first = first_sets(self.grammar)
+            follow = follow_sets(self.grammar, first)
+            select = select_sets(self.grammar, first, follow)
+            table, conflicts = build_parse_table(select)
+            data = {"version": CACHE_VERSION, "hash": key, "first": first, "follow": follow, "select": select,
+                    "table": table, "conflicts": conflicts, "compiled": CompiledGrammar(self.grammar, table)}
+            if path:
+                _save_cache(path, data)
+
+        self.first, self.follow, self.select = data["first"], data["follow"], data["select"]
+        self.table, self.conflicts = data["table"], data["conflicts"]
         self.terminals = self.grammar.terminals
-
-        self.typedef_names: Set[str] = set()
-        self._capture_typedef_alias = False
+        self.compiled = data["compiled"]
+        self.token_terms = self._token_terms()
+        self._prod_texts: Dict[int, Tuple[str, str]] = {}
+
+        # 错误恢复用的同步集：FOLLOW(A) 按分析表的下标摊平成字节数组
+        cg = self.compiled
+        self._follow = bytearray(len(cg.table))
+        for A, fs in self.follow.items():
+            base = (cg.index[A] - cg.n_terms) * cg.n_terms
+            for a in fs:
+                if a in cg.index:
+                    self._follow[base + cg.index[a]] = 1
+        self._anchors = {cg.index[a] for a in SYNC_ANCHORS if a in cg.index}
+
+        ref_grammar = c_grammar()
+        ref = ref_grammar.prods
+        self._toplevel = key == grammar_hash(ref_grammar)  # 能否按 top_level_splits 分段并行分析
+        self._expr = all(self.grammar.prods.get(A) == ref[A] for A in EXPR_NTS)  # 能否交给 _ExprEngine
+        self._expr_prod = next(i for i, (A, _) in enumerate(cg.prods) if A == "Expr") if self._expr else -1
+        self.pratt = pratt and self._expr
+        self.macros = macros
+        self._expansion_cache = {}
 
     def display(self, sym: str) -> str:
         return ALIAS.get(sym, sym)
 
-    def symbolize(self, tok) -> str:
+    def symbolize(self, tok, typedef_names=()) -> str:
+        """token 对应的文法终结符名。分析循环不逐个调用它，而是查由它建成的 token_terms"""
         tname = TYPES.get(tok.type, "UNKNOWN")
         attr = tok.attribute
 
@@ -486,7 +1497,7 @@ class LL1Parser:
                 return attr  # 直接返回符号本身作为文法终结符
             return "OP"
         if tname == "IDENTIFIER":
-            if attr in self.typedef_names:
+            if attr in typedef_names:
                 return "type_id"
             return "id"
         if tname in ["CONST_DECIMAL", "CONST_OCTAL", "CONST_HEX"]:
@@ -500,80 +1511,579 @@ class LL1Parser:
 
         return tname
 
-    def analyze(self, tokens):
-        filtered = [t for t in tokens if TYPES.get(t.type) != "PREPROCESSOR"]
-
-        stack: List[str] = ["EOF", self.grammar.start]
+    def _token_terms(self) -> Dict[int, int]:
+        """token 类型码 → 终结符编号（-1 为文法里没有的符号），分析时每个 token 查一次表，不再调用 symbolize。
+        除标识符外，symbolize 的结果只取决于 token 类型（关键字、运算符、界符各有自己的类型码），
+        用每个类型的规范写法调用一次 symbolize 建表；标识符映射到 id，是 typedef 名时再换成 type_id"""
+        canon = {code: text for table in (KEYWORDS, OP, DL) for text, code in table.items()}
+        index = self.compiled.index
+        return {t: index.get(self.symbolize(TOKEN(t, canon.get(t, ""), 0)), -1)
+                for t in TYPES if t != PREPROCESSOR}
+
+    def _filter(self, tokens):
+        if isinstance(tokens, TokenBuffer):
+            return tokens.exclude(PREPROCESSOR)
+        return [t for t in tokens if t.type != PREPROCESSOR]
+
+    def analyze(self, tokens, trace: str = "full", build_tree: bool = False, max_errors: Optional[int] = 1,
+                session: Optional[ParseSession] = None):
+        """预测分析，返回 (分析记录, 是否成功, 信息)。trace 决定记录的详细程度：
+        none 不记录；errors 只在出错时给出出错那一步；summary 只记录产生式推导的步骤；
+        full 记录每一步。summary/full 的记录是 ParseTrace，读取某一行时才渲染成五列文字。
+        tokens 可以是任意 token 迭代器（如 Lexer.iter_tokens 的生成器）：none/errors 模式逐个拉取，
+        只保留最近的少量 token 作出错上下文，不会物化整个 token 列表；summary/full 要渲染剩余输入，仍需先收集。
+        build_tree=True 时同时把推导建成 ParseTree 放在 session.tree（出错时为已建成的部分）。
+        max_errors 为报告的错误数上限：默认 1 即在第一个错误处停止；大于 1 或为 None（不设上限）时
+        以 FOLLOW 集和语句级锚点同步，一遍报告所有错误，信息每行一个，errors 模式的记录每个错误一条。
+        session 为 None 时新建一个，即每次分析的 typedef 名互不相干；步数、位置和语法树写回 session"""
+        if trace not in TRACES:
+            raise ValueError(f"未知的记录级别: {trace}")
+        records = None
+        if trace in ("summary", "full"):
+            tokens = self._filter(tokens)
+            records = ParseTrace(self, tokens, trace == "summary")
+        if session is None:
+            session = ParseSession()
+        session.tree = ParseTree(self.compiled) if build_tree else None
+        ok, msg, fails = self._parse(tokens, records, session, max_errors)
+        if trace == "errors":
+            return fails, ok, msg
+        return (records if records is not None else []), ok, msg
+
+    def check(self, tokens, session: Optional[ParseSession] = None):
+        """只做语法检查，不生成分析记录，返回 (是否成功, 信息)"""
+        return self.analyze(tokens, trace="none", session=session)[1:]
+
+    def analyze_parallel(self, tokens, trace: str = "none", max_errors: Optional[int] = 1, workers=None,
+                         session: Optional[ParseSession] = None, min_chunk: int = 1 << 16):
+        """按顶层声明把 token 序列切成多段，用进程池各自从开始符号分析，再按源码顺序合并，返回值与 analyze 相同。
+        分段见 top_level_splits，每段开始时已知此前顶层 typedef 声明的名字。某段出错时，
+        从该段开头起在本进程内按顺序接着分析，出错信息、错误恢复和记录都与 analyze 一致。
+        文法不是 c_grammar 或不足两段（每段至少 min_chunk 个 token）时直接调用 analyze"""
+        if trace not in TRACES:
+            raise ValueError(f"未知的记录级别: {trace}")
+        if session is None:
+            session = ParseSession()
+        if isinstance(tokens, TokenBuffer):
+            filtered = tokens.exclude(PREPROCESSOR)
+        else:
+            filtered = TokenBuffer()
+            filtered.extend([t for t in tokens if t.type != PREPROCESSOR])
+        workers = workers or os.cpu_count() or 1
+        parts = min(workers, len(filtered) // min_chunk)
+        cuts, known = [0], [0]
+        if self._toplevel and parts > 1 and not session.env.depth:
+            ends, counts, names = top_level_splits(filtered)
+            # 每段约 len / parts 个 token，在其后的第一个分界处切开
+            for k in range(1, parts):
+                j = bisect_left(ends, max(len(filtered) * k // parts, cuts[-1] + 1))
+                if j < len(ends) and ends[j] < len(filtered):
+                    cuts.append(ends[j])
+                    known.append(counts[j])
+        if len(cuts) < 2:
+            return self.analyze(filtered, trace, max_errors=max_errors, session=session)
+
+        bounds = list(zip(cuts, cuts[1:] + [len(filtered)]))
+        initial = list(session.env.bindings)
+        keep = trace if trace in ("summary", "full") else "none"
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds)), initializer=_init_worker,
+                                 initargs=(self.pratt, self.macros)) as pool:
+            results = list(pool.map(_parse_range, (filtered[a:b].detach() for a, b in bounds),
+                                    (initial + names[:n] for n in known), repeat(keep), repeat(max_errors)))
+
+        records = ParseTrace(self, filtered, trace == "summary") if keep != "none" else None
+        root = records.node(self.compiled.start, records.node(self.compiled.eof, -1)) if records is not None else 1
+        step0 = 0
+        for c, ((a, _), (ok, msg, steps, pos, state)) in enumerate(zip(bounds, results)):
+            if not ok:
+                break
+            last = c == len(bounds) - 1
+            if records is not None:
+                root = records.splice(state, step0, a, root, last)
+            if last:
+                session.steps, session.pos, session.tree = step0 + steps, a + pos, None
+                for name in names:
+                    session.env.declare(name)
+                return [] if records is None else records, True, msg
+            # 段末的开始符号空推导在整体分析中是下一段的第一步
+            step0 += steps - 1
+
+        # 第 c 段出错：之前各段都已完整匹配，分析栈回到 EOF 和开始符号，从第 c 段开头按顺序接着分析
+        env = SymbolEnv(initial + names[:known[c]])
+        return self._parse_rest(filtered, a, env, records, root, step0, trace, max_errors, session)
+
+    def reanalyze(self, tokens, state: IncrementalState, trace: str = "full", max_errors: Optional[int] = 1,
+                  min_chunk: int = 256):
+        """增量分析：返回值与对整个 tokens 调用 analyze 相同，state 换成这一次的状态。
+        与 state 里上一次的输入比较出改动的范围（见 _token_edit），沿用改动之前最近的检查点以前的记录，
+        从那里起按顶层声明分段（每段至少 min_chunk 个 token），各段从开始符号分析后接起来；
+        改动之后某个分界与上一次的检查点对齐、typedef 名也相同时，沿用上一次此后的记录（步骤号、位置、结点号平移）。
+        某段出错时同 analyze_parallel，从该段开头起按顺序分析剩余部分。上一次在第一个错误处停止、
+        改动又在它读到的 token 之后时，直接沿用上一次的结果。
+        首次调用、trace 或 max_errors 与上一次不同时整体分析；文法不是 c_grammar 时每次都整体分析"""
+        if trace not in TRACES:
+            raise ValueError(f"未知的记录级别: {trace}")
+        filtered = self._filter(tokens)
+        keep = trace in ("summary", "full")
+        old = state if state.tokens is not None and (state.trace, state.max_errors) == (trace, max_errors) else None
+        start = old_end = new_end = 0
+        if old is not None:
+            start, old_end, new_end = _token_edit(old.tokens, filtered)
+            records, ok, msg = old.result
+            if start == len(old.tokens) == len(filtered) or not ok and max_errors == 1 and start >= old.horizon:
+                # 输入没有变化，或者改动在上一次出错时读到的 token 之后：结果不变，记录改按新的输入渲染
+                if keep:
+                    records = records.prefix(filtered, len(records), len(records.node_syms))
+                state.tokens, state.result, state.reparsed = filtered, (records, ok, msg), (start, start)
+                return state.result
+
+        session = ParseSession()
+        marks = old.marks[:bisect_right(old.marks, start, key=itemgetter(0))] if old is not None else []
+        if not self._toplevel:
+            session.env = SymbolEnv(state.typedef_names)
+            result = self.analyze(filtered, trace, max_errors=max_errors, session=session)
+            resumed, resync = 0, None
+        else:
+            if marks:
+                p, step0, n_records, n_nodes, root, n_names = marks[-1]
+                records = old.result[0].prefix(filtered, n_records, n_nodes) if keep else None
+                env = SymbolEnv(islice(old.session.env.bindings, n_names))
+            else:
+                records = ParseTrace(self, filtered, trace == "summary") if keep else None
+                root = records.node(self.compiled.start, records.node(self.compiled.eof, -1)) if keep else 1
+                p, step0, env = 0, 0, SymbolEnv(state.typedef_names)
+                marks = [(0, 0, 0, 2 if keep else 0, root, len(env))]
+            # 上一次完全成功时，此后的记录不含出错信息（其中的行列号可能已经变了），才能在对齐处沿用
+            synced = [m[0] for m in old.marks] if old is not None and old.result[1] else []
+            delta = new_end - old_end
+            resumed = p
+            run = ParseSession()
+            run.env = env
+            resync, failed = None, False
+            for q, _ in iter_top_level(filtered, p):
+                j = bisect_left(synced, q - delta) if q >= new_end else len(synced)
+                if j == len(synced) or synced[j] != q - delta:
+                    j = -1
+                    if q - p < min_chunk:
+                        continue
+                chunk = filtered[p:q]
+                part = ParseTrace(self, chunk, trace == "summary") if keep else None
+                if not self._parse(chunk, part, run, max_errors)[0]:
+                    failed = True
+                    break
+                if keep:
+                    root = records.splice(part.state(), step0, p, root, False)
+                step0 += run.steps - 1
+                p = q
+                marks.append((p, step0, len(records) if keep else 0, len(records.node_syms) if keep else 0, root,
+                              len(env)))
+                if j >= 0 and old.marks[j][5] == len(env) and list(env.bindings) == list(
+                        islice(old.session.env.bindings, len(env))):
+                    resync = j
+                    break
+
+            if resync is None:
+                if failed:
+                    # 出错的一段改动了名字环境，回到段首的最外层 typedef 名
+                    env = SymbolEnv(islice(env.bindings, marks[-1][5]))
+                result = self._parse_rest(filtered, p, env, records, root, step0, trace, max_errors, session)
+            else:
+                _, old_step, old_records, old_nodes, _, _ = old.marks[resync]
+                step_off = step0 - old_step
+                record_off = (len(records) - old_records) if keep else 0
+                node_off = (len(records.node_syms) - old_nodes) if keep else 0
+                if keep:
+                    records.extend_from(old.result[0], old_records, old_nodes, root, step_off, delta)
+                marks += [(e + delta, s + step_off, r + record_off, n + node_off, rt + node_off, c)
+                          for e, s, r, n, rt, c in old.marks[resync + 1:]]
+                session.steps, session.pos = old.session.steps + step_off, old.session.pos + delta
+                session.env = old.session.env
+                result = (records if keep else []), True, old.result[2]
+
+        state.tokens, state.trace, state.max_errors, state.result = filtered, trace, max_errors, result
+        state.session, state.marks = session, marks
+        state.horizon = session.pos + ERROR_CONTEXT + 2  # 出错的 token、其后的 ERROR_CONTEXT 个及判断是否还有输入的一个
+        state.reparsed = (resumed, p if resync is not None else len(filtered))
+        return result
+
+    def _parse_rest(self, filtered, a: int, env: SymbolEnv, records, root: int, step0: int, trace: str,
+                    max_errors: Optional[int], session: ParseSession):
+        """从分界 a 起（分析栈只剩 EOF 和开始符号，typedef 名环境为 env）按顺序分析 filtered 的剩余部分，
+        此前的 token 作出错记录的上下文；记录接在 records 后面，步数、位置和名字环境写回 session。返回值同 analyze"""
+        tail = ParseSession()
+        tail.env = env
+        rest = filtered[a:]
+        tail_records = ParseTrace(self, rest, trace == "summary") if records is not None else None
+        ok, msg, fails = self._parse(rest, tail_records, tail, max_errors, filtered[max(0, a - ERROR_CONTEXT):a])
+        if records is not None:
+            records.splice(tail_records.state(), step0, a, root, True)
+        session.steps, session.pos, session.tree, session.env = step0 + tail.steps, a + tail.pos, None, env
+        if trace == "errors":
+            return [(fail[0] + step0,) + fail[1:] for fail in fails], ok, msg
+        return [] if records is None else records, ok, msg
+
+    def expr_postfix(self, tokens):
+        """用 _ExprEngine 分析单个表达式，返回 (是否成功, 信息, 按 C 优先级结合的后缀式)。
+        后缀式里一元 * & 记为 u* u&，后置 ++/-- 记为 post++ post--，调用记为 call/实参数"""
+        if not self._expr:
+            raise ValueError("文法的表达式部分与 c_grammar 不同，不能用 Pratt 分析")
+        it = (t for t in tokens if t.type != PREPROCESSOR)
+        tok = next(it, None)
+        la = self.token_terms.get(tok.type, -1) if tok is not None else self.compiled.eof
+        out: List[str] = []
+        engine = _ExprEngine(self)
+        try:
+            engine.run(tok, la, it, deque(maxlen=ERROR_CONTEXT), out, engine.follow | {self.compiled.eof})
+        except _ExprError as e:
+            return False, str(e), out
+        return True, "表达式分析成功！", out
+
+    def _parse(self, tokens, records, session: ParseSession, max_errors: Optional[int] = 1, history=()):
+        """在 CompiledGrammar 上运行预测分析，每一步把紧凑记录追加到 records，推导建入 session.tree（None 时都不做）。
+        token 从迭代器逐个拉取，跳过预处理指令；最近匹配的 ERROR_CONTEXT 个 token 留在环形缓冲区里。
+        出错后按恐慌模式恢复（见 _skip_on_error），直到报告 max_errors 个错误（None 不设上限）。
+        不记录、不建树也不恢复时，Expr 交给 _ExprEngine 整段分析。
+        history 为此前已匹配的 token（从中途接着分析时给出错记录作上下文）。
+        返回 (是否成功, 信息, 各错误那一步的五列记录)"""
+        cg = self.compiled
+        index, is_term, table, rhs_rev = cg.index, cg.is_term, cg.table, cg.rhs_rev
+        n_terms, eof = cg.n_terms, cg.eof
+        lbrace, rbrace = index.get("{", -1), index.get("}", -1)
+        term_of, type_id = self.token_terms.get, index.get("type_id", -1)
+        env = session.env
+        names = env.types
+        tree = session.tree
+
+        stack: List[int] = [eof, cg.start]
+        if records is not None:
+            # 与 stack 平行的结点编号，结点之间用父指针共享
+            nodes = [records.node(eof, -1)]
+            nodes.append(records.node(cg.start, nodes[0]))
+            full = not records.summary
+        if tree is not None:
+            # 每步记一个编号，分析结束后由 ParseTree.finish 建树
+            tlog: List[int] = []
+            match_base = tree.match_base
+        it = (t for t in tokens if t.type != PREPROCESSOR)
+        recover = max_errors != 1
+        engine = _ExprEngine(self, names) if self.pratt and records is None and tree is None and not recover else None
+        expr_prod = self._expr_prod if engine else -2  # 不与任何表项（含表示无项的 -1）相等
+        # 记录每一步时逐个产生式展开，否则按宏产生式一步压入整段展开结果
+        seqs, chains, actions = self._expansions(self.macros and records is None, engine is not None)
+        # 待匹配的语义动作位置（栈中的下标）和对应的 SymbolEnv 方法名
+        alias_at: List[int] = []
+        alias_do: List[str] = []
+        if recover:
+            it = _Pushback(it)
+        history = deque(history, maxlen=ERROR_CONTEXT)
         ptr = 0
-        records = []
         step = 0
-
-        def rest_input_str(i: int) -> str:
-            if i >= len(filtered):
-                return "#"
-            attrs = [t.attribute for t in filtered[i:]]
-            return " ".join(attrs) + " #"
-
-        while stack:
-            top = stack[-1]
-            stack_str = " ".join(self.display(s) for s in stack).replace("EOF", "#")
-            input_str = rest_input_str(ptr)
-
-            if ptr < len(filtered):
-                curr = filtered[ptr]
-                lookahead = self.symbolize(curr)
-                attr = curr.attribute
-                line = curr.line
-            else:
-                lookahead = "EOF"
-                attr = "EOF"
-                line = -1
-
-            if top in self.terminals or top == "EOF":
-
-                if top == lookahead:
-                    if top == "id" and self._capture_typedef_alias:
-                        self.typedef_names.add(attr)
-                        self._capture_typedef_alias = False
-                    
-                    # --- 核心修改点 ---
-                    # 以前这里是 ""，现在我们填入 "匹配成功" 确保占位，使每一行都有 5 个元素
-                    match_disp = f"匹配 {self.display(top)}"
-                    records.append((step, stack_str, input_str, match_disp, f"“{attr}” 从栈顶弹出"))
-                    # -----------------
-                    
-                    stack.pop()
-                    ptr += 1
-                    if top == "EOF":
+        at = -1  # 已经求出向前看符号的位置
+        errors: List[str] = []
+        fails = []
+        quiet = 0  # 报错后还要匹配的 token 数，之前的连带错误不再报告
+
+        try:
+            while stack:
+                top = stack[-1]
+                if at != ptr:
+                    at = ptr
+                    curr = next(it, None)
+                    if curr is not None:
+                        attr = curr.attribute
+                        if curr.type == ID and attr in names:
+                            lookahead = type_id
+                        else:
+                            lookahead = term_of(curr.type, -1)
+                        line = curr.line
+                        col = curr.col
+                    else:
+                        lookahead = eof
+                        attr = "EOF"
+                        line = col = -1
+
+                if is_term[top]:
+
+                    if top == lookahead:
+                        if alias_at and alias_at[-1] == len(stack) - 1:
+                            getattr(env, alias_do.pop())(attr)
+                            alias_at.pop()
+                        elif top == lbrace:
+                            env.push()
+                        elif top == rbrace:
+                            env.pop()
+
+                        if records is not None:
+                            if full:
+                                records.add(step, -1 - top, len(stack), ptr, nodes[-1])
+                            nodes.pop()
+
+                        if tree is not None:
+                            tlog.append(match_base + top)
+
+                        stack.pop()
+                        history.append(curr)
+                        ptr += 1
+                        if quiet:
+                            quiet -= 1
+                        if top == eof:
+                            break
+                        step += 1
+                        continue
+                    msg = f"匹配失败：期望 {self.display(cg.symbols[top])} 但看到 {attr} (行 {line}, 列 {col})"
+                else:
+                    k = (top - n_terms) * n_terms + lookahead
+                    prod = table[k] if lookahead >= 0 else -1
+                    if prod == expr_prod:
+                        try:
+                            n = engine.run(curr, lookahead, it, history)
+                        except _ExprError as e:
+                            step += engine.n
+                            ptr += engine.n
+                            curr = e.tok
+                            msg = str(e)
+                        else:
+                            # 表达式之后的 token 已由 engine 读出并求好向前看符号
+                            stack.pop()
+                            step += n
+                            ptr += n
+                            at = ptr
+                            curr, lookahead = engine.tok, engine.la
+                            if curr is not None:
+                                attr, line, col = curr.attribute, curr.line, curr.col
+                            else:
+                                attr, line, col = "EOF", -1, -1
+                            continue
+                    elif prod >= 0:
+                        stack.pop()
+                        if k in actions:
+                            for i, action in actions[k]:
+                                alias_at.append(len(stack) + i)
+                                alias_do.append(action)
+                        stack.extend(seqs[k])
+                        if tree is not None:
+                            tlog.extend(chains[k])
+                        if records is not None:
+                            records.add(step, prod, len(stack) - len(rhs_rev[prod]) + 1, ptr, nodes.pop())
+                            for sym in rhs_rev[prod]:
+                                nodes.append(records.node(sym, nodes[-1]))
+                        step += 1
+                        continue
+                    else:
+                        msg = f"文法错误：无法用 {self.display(cg.symbols[top])} 匹配 {attr} (行 {line}, 列 {col})"
+
+                if not quiet:
+                    fails.append(self._fail_record(step, stack, curr, it, history, msg))
+                    if records is not None and recover:
+                        records.error(step, len(stack), ptr, nodes[-1], msg)
+                    errors.append(msg)
+                    if len(errors) == max_errors:
                         break
+                quiet = RECOVER_MATCHES
+                if self._skip_on_error(stack, lookahead):
+                    if tree is not None:
+                        tlog.append(ParseTree.SKIP)
+                    history.append(curr)
+                    ptr += 1
                 else:
-                    # 报错时也建议补齐 5 列，防止 main.py 导出报错的数据记录
-                    return records, False, f"匹配失败：期望 {self.display(top)} 但看到 {attr} (行 {line})"
-            else:
-                key = (top, lookahead)
-                # “*” 既可能是指针/解引用（文法里用"*"），也可能是乘法（文法用 OP）。
-                # 如果按字面"*"查不到表项，尝试把它视作 OP 再查一次。
-                if key not in self.table:
-                    return records, False, f"文法错误：无法用 {self.display(top)} 匹配 {attr} (行 {line})"
-
-                prod = self.table[key]
-                if top == "TypeAlias" and prod == ["id"]:
-                    self._capture_typedef_alias = True
-
-                prod_disp = " ".join(self.display(s) for s in prod)
-                top_disp = self.display(top)
-                prod_str = f"{top_disp} -> {prod_disp}" if prod != [EPS] else f"{top_disp} -> ε"
-                action_str = f"{top_disp} 弹栈, {prod_disp} 逆序压栈" if prod != [EPS] else f"{top_disp} 弹栈 (空推导)"
-                records.append((step, stack_str, input_str, prod_str, action_str))
-
-                stack.pop()
-                if prod != [EPS]:
-                    for s in reversed(prod):
-                        stack.append(s)
-
-            step += 1
-
-        return records, True, "语法分析成功！"
+                    # 当作漏写弹出：漏掉的 } 同样结束作用域，漏掉的名字不再等待
+                    if top == rbrace:
+                        env.pop()
+                    while alias_at and alias_at[-1] >= len(stack) - 1:
+                        alias_at.pop()
+                        alias_do.pop()
+                    stack.pop()
+                    if records is not None:
+                        nodes.pop()
+                    if tree is not None:
+                        tlog.append(tree.missing_base + top)
+                step += 1
+
+            if not errors:
+                return True, "语法分析成功！", fails
+            if len(errors) == max_errors and recover:
+                errors.append(f"错误数达到上限 {max_errors}，停止分析")
+            return False, "\n".join(errors), fails
+        finally:
+            session.steps = step
+            session.pos = ptr
+            if tree is not None:
+                tree.finish(tlog, recovered=recover and bool(errors))
+
+    def _expansions(self, collapse: bool, stop_expr: bool):
+        """CompiledGrammar.expansions 的结果（交给 _ExprEngine 时宏产生式在 Expr 处停下）及语义动作：
+        表项 → 压栈序列中带语义动作的符号（见 ENV_ACTIONS）的 (下标, SymbolEnv 方法名)，按参数缓存"""
+        key = (collapse, stop_expr)
+        if key not in self._expansion_cache:
+            cg = self.compiled
+            stop = {cg.index["Expr"]} if stop_expr else frozenset()
+            seqs, chains = cg.expansions(collapse, stop)
+            sites = {(p, i): ENV_ACTIONS[A, x] for p, (A, rhs) in enumerate(cg.prods)
+                     for i, x in enumerate(rhs) if (A, x) in ENV_ACTIONS}
+            site_prods = {p for p, _ in sites}
+            actions = {}
+            for k, chain in enumerate(chains):
+                if chain and not site_prods.isdisjoint(chain):
+                    # 按产生式链重放展开，记下序列中每个符号来自哪个产生式右部的第几个
+                    origin = []
+                    for j, prod in enumerate(chain):
+                        if j:
+                            origin.pop()
+                        n = len(cg.rhs_rev[prod])
+                        origin.extend((prod, n - 1 - i) for i in range(n))
+                    actions[k] = tuple((j, sites[site]) for j, site in enumerate(origin) if site in sites)
+            self._expansion_cache[key] = seqs, chains, actions
+        return self._expansion_cache[key]
+
+    def _skip_on_error(self, stack, lookahead: int) -> bool:
+        """恐慌模式恢复：出错时跳过当前 token 返回 True，弹出栈顶符号返回 False。
+        栈顶为非终结符 A 时，向前看符号在 FOLLOW(A) 里（或已到输入末尾）就弹出 A，让栈中下面的符号接着分析；
+        是语句级锚点（; { }）且栈中下面有符号能接受它时也弹出；否则跳过该 token，
+        直到它在 SELECT 里（分析表有项）或成为同步符号。栈顶为终结符时当作漏写而弹出，
+        但不认识的 token 跳过，栈底的 EOF 也不弹出。每次恢复都消耗输入或缩短栈，恢复总是线性的"""
+        cg = self.compiled
+        top = stack[-1]
+        if lookahead < 0:
+            return True
+        if cg.is_term[top]:
+            return top == cg.eof
+        if lookahead == cg.eof or self._follow[(top - cg.n_terms) * cg.n_terms + lookahead]:
+            return False
+        if lookahead in self._anchors:
+            n_terms, table = cg.n_terms, cg.table
+            for sym in stack[-2::-1]:
+                if sym == lookahead or not cg.is_term[sym] and table[(sym - n_terms) * n_terms + lookahead] >= 0:
+                    return False
+        return True
+
+    def _fail_record(self, step, stack, curr, it, history, msg):
+        """出错那一步的五列记录（trace="errors" 时返回）。输入一列是“最近匹配的 token | 出错处起的若干 token”，
+        之后还有输入时以 … 结尾，否则以 # 结尾。错误恢复时预读的 token 退回 it 继续分析"""
+        ahead = [] if curr is None else [curr] + list(islice(it, ERROR_CONTEXT))
+        more = next(it, None) if ahead else None
+        if isinstance(it, _Pushback):
+            it.unread(ahead[1:] + ([more] if more is not None else []))
+        tail = " …" if more is not None else " #"
+        after = " ".join(t.attribute for t in ahead) + tail
+        before = " ".join(t.attribute for t in history if t is not None)
+        return (step, self._stack_str(stack), f"{before} | {after}" if before else after, "", msg)
+
+    def _stack_str(self, stack) -> str:
+        symbols = self.compiled.symbols
+        return " ".join(self.display(symbols[s]) for s in stack).replace("EOF", "#")
+
+    def _prod_text(self, prod: int) -> Tuple[str, str]:
+        """产生式编号对应的（产生式, 动作）两列文字"""
+        text = self._prod_texts.get(prod)
+        if text is None:
+            text = self._prod_texts[prod] = self._render_prod(prod)
+        return text
+
+    def _render_prod(self, prod: int) -> Tuple[str, str]:
+        top, rhs = self.compiled.prods[prod]
+        prod_disp = " ".join(self.display(s) for s in rhs)
+        top_disp = self.display(top)
+        if rhs == [EPS]:
+            return f"{top_disp} -> ε", f"{top_disp} 弹栈 (空推导)"
+        return f"{top_disp} -> {prod_disp}", f"{top_disp} 弹栈, {prod_disp} 逆序压栈"
 
     def calc_sets(self):
         return {"first": self.first, "follow": self.follow, "select": self.select}
+
+
+_SHARED: Dict[str, LL1Parser] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_parser(grammar: Optional[Grammar] = None) -> LL1Parser:
+    """进程内共享的 LL1Parser：同一文法（按 grammar_hash）只构造一次分析表，之后只读；
+    线程池或 asyncio 执行器里的各个分析请求共用它，每次 analyze 各自的 ParseSession 互不影响"""
+    grammar = grammar or c_grammar()
+    key = grammar_hash(grammar)
+    parser = _SHARED.get(key)
+    if parser is None:
+        with _SHARED_LOCK:
+            parser = _SHARED.get(key)
+            if parser is None:
+                parser = _SHARED[key] = LL1Parser(grammar)
+    return parser
+
+
+_SPLIT_TYPES = re.compile(b"[%s]" % re.escape(bytes([KEYWORDS["typedef"], DL["{"], DL["}"], DL[";"]])))
+
+
+def iter_top_level(tokens, start: int = 0):
+    """按花括号深度从 start（开头或某个分界）起扫描已去掉预处理指令的 token 序列，依次给出顶层声明之间的分界
+    (位置, 名字)：深度 0 的 ; 之后，以及紧跟 ) 的 { 所开的函数体结束之后；按 c_grammar，这些位置上分析栈只剩
+    EOF 和开始符号。以 ; 结束的顶层 typedef 声明给出结束它的 ; 之前的标识符（声明的名字），其余为 None。
+    TokenBuffer 只看类型码一列，用正则在字节串里跳到相关的 token；其他序列逐个查看 token 类型，按需向后扫描"""
+    typedef, lbrace, rbrace, semi, rparen = KEYWORDS["typedef"], DL["{"], DL["}"], DL[";"], DL[")"]
+    if isinstance(tokens, TokenBuffer):
+        types, attrs, names = tokens.types, tokens.attrs, tokens.table.names
+        hits = (m.start() for m in _SPLIT_TYPES.finditer(types.tobytes(), start))
+        type_at = types.__getitem__
+
+        def name_at(i):
+            return names[attrs[i]]
+    else:
+        kinds = {typedef, lbrace, rbrace, semi}
+        hits = (i for i, t in enumerate(islice(tokens, start, None), start) if t.type in kinds)
+
+        def type_at(i):
+            return tokens[i].type
+
+        def name_at(i):
+            return tokens[i].attribute
+    depth, body, in_typedef = 0, False, False
+    for i in hits:
+        t = type_at(i)
+        if t == lbrace:
+            if not depth:
+                body = i > 0 and type_at(i - 1) == rparen
+            depth += 1
+        elif t == rbrace:
+            if depth:
+                depth -= 1
+            if not depth and body:
+                body = False
+                yield i + 1, None
+        elif not depth:
+            if t == typedef:
+                in_typedef = True
+                continue
+            name = name_at(i - 1) if in_typedef and i and type_at(i - 1) == ID else None
+            in_typedef = False
+            yield i + 1, name
+
+
+def top_level_splits(tokens: TokenBuffer):
+    """iter_top_level 的全部分界，返回 (分界位置, 各分界之前声明的 typedef 名数, 按顺序的 typedef 名)"""
+    ends: List[int] = []
+    counts: List[int] = []
+    names: List[str] = []
+    for end, name in iter_top_level(tokens):
+        if name is not None:
+            names.append(name)
+        ends.append(end)
+        counts.append(len(names))
+    return ends, counts, names
+
+
+_WORKER_PARSER: Optional[LL1Parser] = None
+
+
+def _init_worker(pratt: bool, macros: bool) -> None:
+    """analyze_parallel 工作进程的初始化：每个进程构造一次分析器（分析表读磁盘缓存）"""
+    global _WORKER_PARSER
+    _WORKER_PARSER = LL1Parser(pratt=pratt, macros=macros)
+
+
+def _parse_range(tokens, names, trace: str, max_errors: Optional[int]):
+    """analyze_parallel 的工作函数：已知 typedef 名 names，从开始符号分析一段 token。
+    max_errors 与整体分析相同，是否恢复决定了是否交给 _ExprEngine，步数才能对上。
+    返回 (是否成功, 信息, 步数, 消耗的 token 数, 记录的各列或 None)"""
+    parser = _WORKER_PARSER
+    session = ParseSession(names)
+    records = ParseTrace(parser, tokens, trace == "summary") if trace != "none" else None
+    ok, msg, _ = parser._parse(tokens, records, session, max_errors)
+    return ok, msg, session.steps, session.pos, records.state() if records is not None else None
@@ -0,0 +1,155 @@
+"""
+由 LL(1) 分析表生成专用的递归下降分析模块：python parser_gen.py [输出文件]
+"""
+import sys
+from typing import Dict, List
+
+from constants import ID
+from parser_core import ENV_ACTIONS, LL1Parser, grammar_hash
+
+HEADER = '''# 由 parser_gen.py 根据 LL(1) 分析表生成，不要手工修改
+"""递归下降语法分析器：每个非终结符一个函数，按整数编码的向前看符号分支，
+右递归的产生式改写成循环。parse(tokens) 的结果和出错信息与 LL1Parser.check 相同，
+嵌套深到超出递归上限的输入改由 LL1Parser 分析"""
+from constants import ID, PREPROCESSOR
+from parser_core import Grammar, ParseSession, SymbolEnv, shared_parser
+
+GRAMMAR_HASH = {hash!r}
+# 嵌套过深时交给 LL1Parser 分析的文法
+_GRAMMAR = Grammar({start!r}, {prods!r})
+TERMINALS = {terminals!r}
+# token 类型码 → 终结符编号（-1 为文法里没有的符号），标识符另按 typedef 名区分 id / type_id
+_CODES = {codes!r}
+_ID, _TYPE_ID, _EOF = {id}, {type_id}, {eof}
+'''
+
+PARSE_HEAD = '''
+
+class _SyntaxError(Exception):
+    pass
+
+
+def parse(tokens, env=None):
+    """返回 (是否成功, 信息)。env 为 typedef 名环境（SymbolEnv），分析中声明的 typedef 名记在里面"""
+    env = SymbolEnv() if env is None else env
+    if not hasattr(tokens, "__getitem__"):
+        tokens = list(tokens)  # 嵌套过深时要从头重新分析
+    saved = env.copy()
+    names = env.types
+    it = (t for t in tokens if t.type != PREPROCESSOR)
+    codes = _CODES
+    curr = None
+
+    def advance():
+        nonlocal curr
+        curr = tok = next(it, None)
+        if tok is None:
+            return _EOF
+        if tok.type == ID:
+            return _TYPE_ID if tok.attribute in names else _ID
+        return codes.get(tok.type, -1)
+
+    def error(msg):
+        if curr is None:
+            return _SyntaxError(f"{msg} EOF (行 -1, 列 -1)")
+        return _SyntaxError(f"{msg} {curr.attribute} (行 {curr.line}, 列 {curr.col})")
+'''
+
+PARSE_TAIL = '''
+    try:
+        la = {start}(advance())
+        if la != _EOF:
+            raise error({eof_msg!r})
+    except _SyntaxError as e:
+        return False, str(e)
+    except RecursionError:
+        # 每层嵌套占若干层 Python 调用，极深的括号或语句块嵌套超出解释器的递归上限时，
+        # 环境退回开始时的状态，改由用显式栈的 LL1Parser 从头检查，结果和出错信息相同
+        env.restore(saved)
+        session = ParseSession()
+        session.env = env
+        return shared_parser(_GRAMMAR).check(tokens, session)
+    return True, "语法分析成功！"
+'''
+
+
+def generate(parser: LL1Parser) -> str:
+    """生成分析模块的源码。各非终结符按分析表（冲突时保留的表项）分支，逐步展开时出错的地方同样出错"""
+    cg = parser.compiled
+    n_terms = cg.n_terms
+    symbols = cg.symbols
+    scope = {cg.index.get("{"): "push", cg.index.get("}"): "pop"}
+    sets: List[str] = []
+    funcs: List[str] = []
+
+    def fname(A: str) -> str:
+        return "p_" + "".join(c if c.isalnum() else "_" for c in A)
+
+    for A in parser.grammar.prods:
+        base = (cg.index[A] - n_terms) * n_terms
+        # 各产生式在分析表中选中它的向前看符号
+        select: Dict[int, List[int]] = {}
+        for t in range(n_terms):
+            prod = cg.table[base + t]
+            if prod >= 0:
+                select.setdefault(prod, []).append(t)
+        loop = any(cg.prods[p][1][-1] == A for p in select)
+        ind = " " * (12 if loop else 8)
+        lines = [f"    def {fname(A)}(la):"]
+        if loop:
+            lines.append("        while True:")
+        for k, (prod, las) in enumerate(sorted(select.items())):
+            rhs = [cg.index[x] for x in cg.prods[prod][1] if x in cg.index]
+            if len(las) == 1:
+                cond = f"la == {las[0]}"
+            else:
+                sets.append(f"_{A}_{k} = frozenset({{{', '.join(map(str, las))}}})")
+                cond = f"la in _{A}_{k}"
+            text = " ".join(cg.prods[prod][1])
+            lines.append(f"{ind}if {cond}:  # {A} -> {text}")
+            tail = bool(rhs) and rhs[-1] == cg.index[A]
+            for j, sym in enumerate(rhs[:-1] if tail else rhs):
+                if cg.is_term[sym]:
+                    # 产生式以终结符开头时分支条件已经保证匹配
+                    if j > 0 or las != [sym]:
+                        lines.append(f"{ind}    if la != {sym}:")
+                        lines.append(f"{ind}        raise error({_mismatch(parser, symbols[sym])!r})")
+                    action = ENV_ACTIONS.get((A, symbols[sym]))
+                    if action:
+                        lines.append(f"{ind}    env.{action}(curr.attribute)")
+                    elif sym in scope:
+                        lines.append(f"{ind}    env.{scope[sym]}()")
+                    lines.append(f"{ind}    la = advance()")
+                else:
+                    lines.append(f"{ind}    la = {fname(symbols[sym])}(la)")
+            lines.append(f"{ind}    {'continue' if tail else 'return la'}")
+        lines.append(f"{ind}raise error({_no_entry(parser, A)!r})")
+        funcs.append("\n".join(lines))
+
+    index = cg.index
+    codes = {t: c for t, c in parser.token_terms.items() if t != ID}  # 标识符由生成的 advance 另行区分
+    head = HEADER.format(hash=grammar_hash(parser.grammar), start=parser.grammar.start, prods=parser.grammar.prods,
+                         terminals=tuple(symbols[:n_terms]), codes=codes,
+                         id=index.get("id", -1), type_id=index.get("type_id", -1), eof=cg.eof)
+    tail = PARSE_TAIL.format(start=fname(parser.grammar.start), eof_msg=_mismatch(parser, "EOF"))
+    return head + "\n".join(sets) + "\n" + PARSE_HEAD + "\n" + "\n\n".join(funcs) + "\n" + tail
+
+
+def _mismatch(parser: LL1Parser, term: str) -> str:
+    return f"匹配失败：期望 {parser.display(term)} 但看到"
+
+
+def _no_entry(parser: LL1Parser, A: str) -> str:
+    return f"文法错误：无法用 {parser.display(A)} 匹配"
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'c_parser_gen.py'
+    source = generate(LL1Parser())
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    print(f"已生成 {path}（{source.count(chr(10))} 行）")
+
+
+if __name__ == '__main__':
+    main()
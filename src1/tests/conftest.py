@@ -0,0 +1,59 @@
+import importlib.util
+import os
+import random
+import sys
+
+import pytest
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+# 随机源码的字母表：覆盖各类 token、注释、续行、错误输入和非 ASCII 字符
+ALPHABET = list("abcxyzE_eXf0123456789 \t\n.+-*/=<>!&|^%~?:;,(){}[]\"'\\#") + [
+    '²', 'é', '　', '\x1c', '\r', '/*', '*/', '//', '0x', '1.5e', "'a'", '"s"', 'int ', 'typedef ', '\\\n', '0.', '..']
+
+
+def random_source(rng, n):
+    """由 ALPHABET 随机拼成的长度约 n 的源码片段"""
+    return ''.join(rng.choice(ALPHABET) for _ in range(n))
+
+
+def random_sources(count, size=80, seed=0):
+    rng = random.Random(seed)
+    return [random_source(rng, rng.randint(0, size)) for _ in range(count)]
+
+
+def mutations(tokens, count, seed=0):
+    """随机删掉、重复或交换一个 token 得到的序列"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        out = list(tokens[:-1])
+        i, j = rng.randrange(len(out)), rng.randrange(len(out))
+        op = rng.randrange(3)
+        if op == 0:
+            del out[i]
+        elif op == 1:
+            out.insert(i, out[j])
+        else:
+            out[i], out[j] = out[j], out[i]
+        yield out + tokens[-1:]
+
+
+@pytest.fixture(scope='session')
+def c_source():
+    with open(os.path.join(SRC, 'c-code.c'), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture(scope='session')
+def generated(tmp_path_factory):
+    """parser_gen 为 c_grammar 生成的递归下降模块"""
+    import parser_gen
+    from parser_core import LL1Parser
+    path = tmp_path_factory.mktemp('gen') / 'c_parser_gen.py'
+    path.write_text(parser_gen.generate(LL1Parser()), encoding='utf-8')
+    spec = importlib.util.spec_from_file_location('c_parser_gen', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from lexer_core import ID, Lexer
+from parser_core import EPS, LL1Parser, ParseSession
+
+
+@pytest.fixture(scope='module')
+def parser():
+    return LL1Parser(cache_dir=None, pratt=False, macros=False)
+
+
+def naive_check(parser, tokens, names):
+    """按字典形式的分析表逐步展开的预测分析，只给出是否接受"""
+    stack = ['EOF', parser.grammar.start]
+    terms = [parser.symbolize(t, names) for t in tokens]
+    terms = [a for a in terms if a]
+    i = 0
+    while stack:
+        top = stack.pop()
+        a = terms[i]
+        if top in parser.terminals or top == 'EOF':
+            if top != a:
+                return False
+            i += 1
+            continue
+        rhs = parser.table.get((top, a))
+        if rhs is None:
+            return False
+        stack.extend(x for x in reversed(rhs) if x != EPS)
+    return i == len(terms)
+
+
+def test_compiled_table_matches_dict_table(parser):
+    cg = parser.compiled
+    nts = list(parser.grammar.prods)
+    terms = sorted(parser.grammar.terminals)
+    assert cg.symbols == terms + nts and cg.n_terms == len(terms)
+    for A in nts:
+        for a in terms:
+            prod = cg.table[(cg.index[A] - cg.n_terms) * cg.n_terms + cg.index[a]]
+            rhs = parser.table.get((A, a))
+            if rhs is None:
+                assert prod == -1
+            else:
+                assert cg.prods[prod] == (A, rhs)
+                assert cg.rhs_rev[prod] == tuple(cg.index[x] for x in reversed(rhs) if x != EPS)
+    assert all(cg.is_term[i] == (i < cg.n_terms) for i in range(len(cg.symbols)))
+
+
+def test_compiled_driver_matches_dict_driver(parser, c_source):
+    # 只变动非 typedef 名的 token，typedef 名始终处在原来的位置，两种分析用同一组类型名
+    tokens = Lexer(c_source).tokenize()
+    names = {'Book'}
+    movable = [i for i, t in enumerate(tokens[:-1]) if not (t.type == ID and t.attribute in names)]
+    rng = random.Random(14)
+    assert naive_check(parser, tokens, names) and parser.check(tokens, ParseSession(names))[0]
+    for _ in range(400):
+        out = list(tokens)
+        i, j = rng.choice(movable), rng.choice(movable)
+        op = rng.randrange(3)
+        if op == 0:
+            del out[i]
+        elif op == 1:
+            out.insert(i, out[j])
+        else:
+            out[i], out[j] = out[j], out[i]
+        assert parser.check(out, ParseSession(names))[0] == naive_check(parser, out, names), (i, j, op)
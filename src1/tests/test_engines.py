@@ -0,0 +1,54 @@
+import pytest
+
+from conftest import random_sources
+from lexer_core import ENGINES, Lexer
+
+
+def lex(text, engine):
+    lx = Lexer(text, engine=engine)
+    tokens = lx.tokenize()
+    return tokens, lx
+
+
+def full(tokens):
+    return [(t.type, t.attribute, t.offset, t.error, t.line, t.col) for t in tokens]
+
+
+def table_uses(lx):
+    return {name: lx.table.uses(name) for name in lx.table.names}
+
+
+@pytest.mark.parametrize('engine', [e for e in ENGINES if e != 'char'])
+def test_engine_matches_char(engine, c_source):
+    for text in random_sources(500, size=120, seed=1) + [c_source, c_source * 3]:
+        expected, ref = lex(text, 'char')
+        tokens, lx = lex(text, engine)
+        assert full(tokens) == full(expected), text
+        assert lx.errors == ref.errors
+        assert table_uses(lx) == table_uses(ref)
+
+
+def test_regex_long_source_matches_char():
+    # 较长的源码：跨越匹配批次的 token、注释和回退位置都要与逐字符引擎一致
+    text = ''.join(random_sources(400, size=200, seed=2)) + '/* ' + 'x' * 5000 + ' */ "' + 'y' * 3000 + '"\n'
+    expected, ref = lex(text, 'char')
+    tokens, lx = lex(text, 'regex')
+    assert full(tokens) == full(expected)
+    assert lx.errors == ref.errors
+
+
+def test_mmap_matches_tuple_tokens(tmp_path, c_source):
+    # 超过一个字节的长度（长字符串、长标识符）另记，出错的 token 只记下标
+    extra = '\nchar *s = "' + 'é' * 300 + '";\nint ' + 'v' * 400 + ' = 0x;\n'
+    for k, text in enumerate(random_sources(200, size=120, seed=3) + [c_source + extra]):
+        path = tmp_path / f'{k}.c'
+        path.write_text(text, encoding='utf-8')
+        lx = Lexer.map_file(str(path))
+        spans = lx.tokenize()
+        expected, ref = lex(text, 'regex')
+        assert [(t.type, t.attribute, t.error, t.line, t.col) for t in spans] == \
+               [(t.type, t.attribute, t.error, t.line, t.col) for t in expected], text
+        assert [(t.type, t.attribute, t.error) for t in map(spans.__getitem__, range(len(spans)))] == \
+               [(t.type, t.attribute, t.error) for t in expected]
+        assert lx.errors == ref.errors
+        assert table_uses(lx) == table_uses(ref)
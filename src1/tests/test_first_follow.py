@@ -0,0 +1,68 @@
+import random
+
+from parser_core import EPS, Grammar, c_grammar, first_sets, follow_sets
+
+
+def naive_first(g):
+    first = {A: set() for A in g.prods}
+    changed = True
+    while changed:
+        changed = False
+        for A, alts in g.prods.items():
+            for rhs in alts:
+                add = naive_seq(rhs, first)
+                if not add <= first[A]:
+                    first[A] |= add
+                    changed = True
+    return first
+
+
+def naive_seq(rhs, first):
+    out = set()
+    for x in rhs:
+        if x == EPS:
+            continue
+        fs = first.get(x, {x})
+        out |= fs - {EPS}
+        if EPS not in fs:
+            return out
+    return out | {EPS}
+
+
+def naive_follow(g, first):
+    follow = {A: set() for A in g.prods}
+    follow[g.start].add('EOF')
+    changed = True
+    while changed:
+        changed = False
+        for A, alts in g.prods.items():
+            for rhs in alts:
+                for i, x in enumerate(rhs):
+                    if x not in g.prods:
+                        continue
+                    rest = naive_seq(rhs[i + 1:], first)
+                    add = rest - {EPS} | (follow[A] if EPS in rest else set())
+                    if not add <= follow[x]:
+                        follow[x] |= add
+                        changed = True
+    return follow
+
+
+def random_grammar(rng):
+    nts = ['N%d' % i for i in range(rng.randint(1, 7))]
+    terms = ['a', 'b', 'c', 'd']
+    prods = {}
+    for A in nts:
+        prods[A] = [[EPS]] if rng.random() < 0.3 else []
+        for _ in range(rng.randint(1, 3)):
+            prods[A].append([rng.choice(nts + terms) for _ in range(rng.randint(1, 4))])
+    return Grammar(nts[0], prods)
+
+
+def test_bitset_sets_match_fixpoint():
+    rng = random.Random(16)
+    for g in [c_grammar()] + [random_grammar(rng) for _ in range(500)]:
+        expected = naive_first(g)
+        first = first_sets(g)
+        assert first == expected, g.prods
+        assert follow_sets(g, first) == naive_follow(g, expected), g.prods
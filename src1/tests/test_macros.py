@@ -0,0 +1,39 @@
+from conftest import mutations
+from lexer_core import Lexer
+from parser_core import LL1Parser, ParseSession
+
+
+def test_macro_chains_replay_single_steps():
+    cg = LL1Parser().compiled
+    plain, _ = cg.expansions(collapse=False)
+    seqs, chains = cg.expansions()
+    for k, prod in enumerate(cg.table):
+        if prod < 0:
+            assert seqs[k] is chains[k] is plain[k] is None
+            continue
+        assert plain[k] == cg.rhs_rev[prod]
+        # 按产生式链逐步展开，每一步都是同一向前看符号下的表项，结果就是宏产生式的压栈序列
+        a = k % cg.n_terms
+        stack = list(cg.rhs_rev[chains[k][0]])
+        assert chains[k][0] == prod
+        for p in chains[k][1:]:
+            top = stack.pop()
+            assert cg.table[(top - cg.n_terms) * cg.n_terms + a] == p
+            stack.extend(cg.rhs_rev[p])
+        assert tuple(stack) == seqs[k]
+
+
+def test_macros_match_single_steps(c_source):
+    tokens = Lexer(c_source).tokenize()
+    for pratt in (False, True):
+        single, macro = LL1Parser(pratt=pratt, macros=False), LL1Parser(pratt=pratt)
+        for mutated in mutations(tokens, 200, seed=22):
+            for max_errors in (1, None):
+                expected = single.analyze(mutated, trace='errors', max_errors=max_errors)
+                got = macro.analyze(mutated, trace='errors', max_errors=max_errors)
+                assert got[1:] == expected[1:]
+                # 出错时的分析栈和剩余输入也相同，只有步骤号不同
+                assert [row[1:] for row in got[0]] == [row[1:] for row in expected[0]]
+            a, b = ParseSession(), ParseSession()
+            assert single.check(mutated, a) == macro.check(mutated, b)
+            assert a.pos == b.pos and a.env.bindings == b.env.bindings
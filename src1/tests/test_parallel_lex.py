@@ -0,0 +1,36 @@
+from conftest import random_sources
+from lexer_core import EOF, Lexer, split_points
+
+
+def full(tokens):
+    return [(t.type, t.attribute, t.offset, t.error, t.line, t.col) for t in tokens]
+
+
+def test_split_points_are_token_boundaries(c_source):
+    # 在切分点处分段各自分析，拼起来要与整段分析一致
+    for text in random_sources(300, size=400, seed=10) + [c_source * 2]:
+        ref = Lexer(text)
+        expected = [(t.type, t.attribute, t.offset, t.error) for t in ref.tokenize()]
+        for parts in (2, 3, 7):
+            points = split_points(text, parts)
+            assert points[0] == 0 and points == sorted(set(points))
+            assert all(text[p - 1] == '\n' for p in points[1:])
+            got, errors = [], []
+            for a, b in zip(points, points[1:] + [len(text)]):
+                lx = Lexer(text[a:b])
+                lx.line = text.count('\n', 0, a) + 1
+                got += [(t.type, t.attribute, t.offset + a, t.error) for t in lx.tokenize() if t.type != EOF]
+                errors += lx.errors
+            assert got == expected[:-1], (text, points)
+            assert errors == ref.errors
+
+
+def test_parallel_matches_tokenize(c_source):
+    text = ''.join(random_sources(200, size=200, seed=11)) + c_source * 3
+    for compact in (False, True):
+        ref, lx = Lexer(text), Lexer(text)
+        expected = ref.tokenize()
+        tokens = lx.tokenize_parallel(workers=3, compact=compact, min_chunk=len(text) // 5)
+        assert full(tokens) == full(expected)
+        assert lx.errors == ref.errors and lx.table.names == ref.table.names
+        assert all(lx.table.uses(name) == ref.table.uses(name) for name in ref.table.names)
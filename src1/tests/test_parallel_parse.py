@@ -0,0 +1,73 @@
+import random
+from itertools import product
+
+from lexer_core import PREPROCESSOR, Lexer
+from parser_core import TRACES, LL1Parser, ParseSession, top_level_splits
+
+EXTRA = ['typedef struct N { int v; } T;\n', 'T *gp;\n', 'int g(int a) { T x; { typedef int U; U y; } return a; }\n',
+         'struct S { int a; } s;\n', 'int arr[3] = {1, 2, 3};\n', 'typedef int T;\n']
+
+
+def program(rng, c_source):
+    text = ''.join(rng.choice([c_source, c_source, *EXTRA]) for _ in range(rng.randint(5, 30)))
+    if rng.random() < 0.5:
+        words = text.split(' ')
+        for _ in range(rng.randint(1, 3)):
+            i = rng.randrange(len(words))
+            op = rng.random()
+            if op < 0.4:
+                del words[i]
+            elif op < 0.7:
+                words.insert(i, rng.choice(['}', '{', ';', 'typedef', ')', 'x', '=']))
+            else:
+                words[i] = rng.choice(['}', '{', ';'])
+        text = ' '.join(words)
+    return text
+
+
+def test_parallel_matches_analyze(c_source):
+    parser = LL1Parser()
+    rng = random.Random(25)
+    splits = 0
+    for _ in range(8):
+        tokens = Lexer(program(rng, c_source)).tokenize(compact=True)
+        splits += len(top_level_splits(tokens.exclude(PREPROCESSOR))[0]) > 4
+        for trace, max_errors in product(TRACES, (1, 3, None)):
+            a, b = ParseSession(), ParseSession()
+            expected = parser.analyze(tokens, trace=trace, max_errors=max_errors, session=a)
+            got = parser.analyze_parallel(tokens, trace=trace, max_errors=max_errors, session=b, workers=3,
+                                          min_chunk=20)
+            assert got[1:] == expected[1:]
+            if trace in ('summary', 'full'):
+                # 比较记录的各列，渲染只抽查（每行都要渲染剩余输入）
+                assert got[0].state() == expected[0].state()
+                assert got[0][::97] == expected[0][::97]
+            else:
+                assert got[0] == expected[0]
+            assert (b.steps, b.pos, b.env.bindings) == (a.steps, a.pos, a.env.bindings)
+    assert splits >= 3
+
+
+def test_parallel_accepts_token_lists(c_source):
+    tokens = Lexer('typedef int T;\n' + c_source * 6).tokenize()
+    parser = LL1Parser()
+    assert parser.analyze_parallel(tokens, workers=2, min_chunk=20) == parser.analyze(tokens, trace='none')
+
+
+def test_parallel_concatenated_buffer(c_source):
+    # 两段源码拼成一个序列，偏移在拼接处回到 0，工作进程里的行号换算仍与整体分析一致
+    first = Lexer(c_source * 8).tokenize(compact=True)
+    second = Lexer('int x;\n' * 40 + 'int f() { x = ; }\n' + c_source * 4).tokenize(compact=True)
+    tokens = first[:-1]
+    tokens.extend_buffer(second)
+    part = tokens[len(first) - 20:len(first) + 20].detach()
+    assert [(t.line, t.col) for t in part] == [(t.line, t.col) for t in tokens[len(first) - 20:len(first) + 20]]
+    parser = LL1Parser()
+    for trace, max_errors in (('none', 1), ('errors', None), ('full', None)):
+        expected = parser.analyze(tokens, trace=trace, max_errors=max_errors)
+        got = parser.analyze_parallel(tokens, trace=trace, max_errors=max_errors, workers=3, min_chunk=20)
+        assert got[1:] == expected[1:] and not got[1]
+        if trace == 'full':
+            assert got[0].state() == expected[0].state()
+        else:
+            assert got[0] == expected[0]
@@ -0,0 +1,70 @@
+import parser_core
+from conftest import mutations
+from lexer_core import EOF, PREPROCESSOR, Lexer
+from parser_core import EPS, LL1Parser, ParseSession
+
+
+def build(parser, tokens, max_errors=1):
+    session = ParseSession()
+    records, ok, msg = parser.analyze(tokens, trace='summary', build_tree=True, max_errors=max_errors, session=session)
+    return session.tree, records, ok, msg
+
+
+def columns(tree):
+    return list(tree.syms), list(tree.first_child), list(tree.next_sibling), list(tree.tokens)
+
+
+def test_tree_follows_derivation(c_source):
+    parser = LL1Parser()
+    tokens = Lexer(c_source).tokenize()
+    tree, records, ok, _ = build(parser, tokens)
+    assert ok
+    cg = parser.compiled
+    # 先序的非终结符结点依次对应推导用到的产生式，子结点就是产生式右部
+    prods = [p for p in records.prods if p >= 0]
+    inner = [v for v in tree.preorder() if tree.syms[v] >= cg.n_terms]
+    assert len(inner) == len(prods)
+    for v, p in zip(inner, prods):
+        A, rhs = cg.prods[p]
+        assert tree.symbol(v) == A
+        assert [tree.symbol(c) for c in tree.children(v)] == [x for x in rhs if x != EPS]
+    # 叶结点依次匹配过滤掉预处理指令后的每个 token
+    filtered = [t for t in tokens if t.type not in (PREPROCESSOR, EOF)]
+    leaves = list(tree.leaves())
+    assert [tree.tokens[v] for v in leaves] == list(range(len(filtered)))
+    # Book 在 typedef 声明处还是 id，之后才是类型名
+    first = next(i for i, t in enumerate(filtered) if t.attribute == 'Book')
+    expected = [parser.symbolize(t, {'Book'} if i > first else ()) for i, t in enumerate(filtered)]
+    assert [tree.symbol(v) for v in leaves] == expected
+
+
+def test_tree_does_not_change_result(c_source, monkeypatch):
+    parser = LL1Parser()
+    tokens = Lexer(c_source).tokenize()
+    trees = []
+    for mutated in mutations(tokens, 150, seed=18):
+        for max_errors in (1, None):
+            tree, _, ok, msg = build(parser, mutated, max_errors)
+            assert (ok, msg) == parser.analyze(mutated, trace='none', max_errors=max_errors)[1:]
+            trees.append(columns(tree))
+    # 没有 numpy 时逐个结点建树，结果相同
+    monkeypatch.setattr(parser_core, 'np', None)
+    again = [columns(build(parser, mutated, max_errors)[0])
+             for mutated in mutations(tokens, 150, seed=18) for max_errors in (1, None)]
+    assert again == trees
+
+
+def test_cursor_walks_preorder(c_source):
+    tree = build(LL1Parser(), Lexer(c_source).tokenize())[0]
+    cursor, seen = tree.cursor(), []
+    while True:
+        seen.append(cursor.node)
+        if cursor.goto_first_child():
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                break
+        else:
+            continue
+        break
+    assert seen == list(tree.preorder()) and cursor.depth == 0
@@ -0,0 +1,36 @@
+import pytest
+
+from conftest import mutations
+from lexer_core import Lexer
+from parser_core import LL1Parser, ParseSession, SymbolEnv
+
+
+def both(generated, tokens, names=()):
+    env, session = SymbolEnv(names), ParseSession(names)
+    got = generated.parse(tokens, env)
+    assert got == LL1Parser().check(tokens, session)
+    assert env.bindings == session.env.bindings and env.depth == session.env.depth
+    return got
+
+
+def test_generated_matches_interpreter(generated, c_source):
+    tokens = Lexer(c_source).tokenize()
+    assert both(generated, tokens) == (True, "语法分析成功！")
+    for mutated in mutations(tokens, 300):
+        both(generated, mutated)
+
+
+@pytest.mark.parametrize('depth', [300, 3000])
+def test_deep_nesting_falls_back(generated, depth):
+    sources = [
+        'int main(){ int a; a = %s1%s; }' % ('(' * depth, ')' * depth),
+        'int main(){ %s a = 1; %s }' % ('{' * depth, '}' * depth),
+        'typedef int T; int main(){ T b; b = %s1%s }' % ('(' * depth, ')' * depth),
+    ]
+    for text in sources:
+        tokens = Lexer(text).tokenize()
+        expected = LL1Parser().check(tokens)
+        assert both(generated, tokens) == expected
+        # 迭代器输入同样可以从头交给 LL1Parser
+        assert generated.parse(iter(tokens)) == expected
+    assert both(generated, Lexer(sources[0]).tokenize())[0]
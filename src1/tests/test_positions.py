@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+from conftest import random_sources
+from lexer_core import ENGINES, EOF, ID, LineIndex, Lexer, TOKEN
+from parser_core import LL1Parser
+
+
+def naive_position(text, offset):
+    line = text.count('\n', 0, offset) + 1
+    return line, offset - (text.rfind('\n', 0, offset) + 1) + 1
+
+
+def positions(tokens):
+    return [(t.offset, t.line, t.col) for t in tokens]
+
+
+def expected(text, tokens):
+    return [(t.offset, *naive_position(text, t.offset)) for t in tokens]
+
+
+def test_line_index_matches_naive():
+    text = 'ab\n\ncd\nefg'
+    index = LineIndex(text)
+    for offset in range(len(text) + 1):
+        assert index.locate(offset) == naive_position(text, offset)
+        assert index.line(offset) == naive_position(text, offset)[0]
+
+
+def test_line_index_feed_and_edit():
+    text = 'int a;\nint b;\n\nint c;\n'
+    fed = LineIndex()
+    for i in range(0, len(text), 5):
+        fed.feed(text[i:i + 5], i)
+    assert list(fed.starts) == list(LineIndex(text).starts)
+
+    new = text[:3] + '\n\n' + text[9:]
+    edited = LineIndex(text).edited(new, 3, 9, '\n\n')
+    assert list(edited.starts) == list(LineIndex(new).starts)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_token_positions(engine, c_source):
+    for text in random_sources(300) + [c_source]:
+        tokens = Lexer(text, engine=engine).tokenize()
+        assert positions(tokens) == expected(text, tokens)
+        assert tokens[-1].type == EOF and tokens[-1].offset == len(text)
+
+
+def test_tokens_store_offsets_only(c_source):
+    tokens = Lexer(c_source, engine='regex').tokenize()
+    assert all(isinstance(t, TOKEN) and t.lines is tokens[0].lines for t in tokens)
+    for t in tokens:
+        if t.type == ID:
+            assert c_source.startswith(t.attribute, t.offset)
+
+
+def test_stream_and_compact_positions(c_source):
+    for text in random_sources(200) + [c_source]:
+        streamed = list(Lexer().iter_tokens(io.StringIO(text), chunk_size=7))
+        assert positions(streamed) == expected(text, streamed)
+        compact = Lexer(text, engine='regex').tokenize(compact=True)
+        assert positions(compact) == expected(text, list(compact))
+
+
+def test_mmap_positions(tmp_path, c_source):
+    text = c_source + '\nint é = 1;\n'
+    path = tmp_path / 'a.c'
+    path.write_text(text, encoding='utf-8')
+    spans = Lexer.map_file(str(path)).tokenize()
+    assert [(t.line, t.col) for t in spans] == [(t.line, t.col) for t in Lexer(text).tokenize()]
+
+
+def test_error_positions():
+    lx = Lexer('int a;\n\n  int 0x;\n', engine='regex')
+    tokens = lx.tokenize()
+    assert lx.errors == ['错误: 无效的十六进制数, 内容: "0x" at line 3']
+    bad = next(t for t in tokens if t.error)
+    assert (bad.line, bad.col) == (3, 7)
+
+
+def test_parser_error_reports_column():
+    tokens = Lexer('int main() {\n  int a = ;\n}\n').tokenize()
+    _, ok, msg = LL1Parser().analyze(tokens, trace='none')
+    assert not ok
+    assert '行 2' in msg and '列 11' in msg
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from lexer_core import Lexer
+from parser_core import BINARY_PRECEDENCE, RIGHT_ASSOC, LL1Parser
+
+ALPHA = ['a', 'b', 'f', 'x', '1', '2.5', '"s"', "'c'", '(', ')', '[', ']', ',', '.', '*', '&', '+', '-', '/', '%', '<<',
+         '^', '&&', '||', '|', '~', '!', '==', '!=', '<', '>=', '++', '--', '->', '+=', '?', '=', ';', '{', '}', 'T', '@']
+CONTEXTS = ['int main() { x = %s; }', 'int main() { return %s; }', 'int main() { if (%s) x = 1; }',
+            'int main() { f(%s, 1); }', 'int v = %s;', 'int main() { while (%s) { } }', 'int a[2] = { %s, 1 };']
+
+
+@pytest.fixture(scope='module')
+def parsers():
+    return LL1Parser(pratt=False), LL1Parser()
+
+
+def expression(rng, depth=0):
+    k = rng.random()
+    if depth > 3 or k < 0.3:
+        return rng.choice(['a', 'b', '1', '"s"', "'c'", 'x.y', 'a[1]', 'p++', '*p', '&q', 'T'])
+    if k < 0.5:
+        return '(' + expression(rng, depth + 1) + ')'
+    if k < 0.6:
+        return 'f(' + ', '.join(expression(rng, depth + 1) for _ in range(rng.randint(0, 3))) + ')'
+    op = rng.choice(['+', '-', '*', '/', '&&', '||', '==', '<', '&', '|', '!', '~', '^', '<<', '+=', '?'])
+    return expression(rng, depth + 1) + ' ' + op + ' ' + expression(rng, depth + 1)
+
+
+def test_pratt_matches_ll1(parsers):
+    plain, pratt = parsers
+    assert pratt.pratt and not plain.pratt
+    rng = random.Random(20)
+    for _ in range(1500):
+        parts = expression(rng).split(' ')
+        for _ in range(rng.choice([0, 0, 1, 2, 3])):
+            i = rng.randrange(len(parts) + 1)
+            if rng.random() < 0.4 and parts:
+                del parts[min(i, len(parts) - 1)]
+            else:
+                parts.insert(i, rng.choice(ALPHA))
+        src = ('typedef int T;\n' if rng.random() < 0.3 else '') + rng.choice(CONTEXTS) % ' '.join(parts)
+        tokens = Lexer(src).tokenize()
+        expected = plain.analyze(tokens, trace='errors')
+        got = pratt.analyze(tokens, trace='errors')
+        assert got[1:] == expected[1:], src
+        assert [row[2:] for row in got[0]] == [row[2:] for row in expected[0]], src
+        assert pratt.check(iter(tokens)) == expected[1:]
+
+
+def naive_postfix(tokens):
+    """按 BINARY_PRECEDENCE 和 RIGHT_ASSOC 的调度场算法；同一级的运算符按栈里（左边）那个的结合性结合"""
+    out, ops = [], []
+    for i, t in enumerate(tokens):
+        if i % 2 == 0:
+            out.append(t)
+            continue
+        while ops and (BINARY_PRECEDENCE[ops[-1]] > BINARY_PRECEDENCE[t] or
+                       BINARY_PRECEDENCE[ops[-1]] == BINARY_PRECEDENCE[t] and ops[-1] not in RIGHT_ASSOC):
+            out.append(ops.pop())
+        ops.append(t)
+    return out + ops[::-1]
+
+
+def test_postfix_follows_c_precedence(parsers):
+    parser = parsers[1]
+    binary = [op for op in BINARY_PRECEDENCE if op != '->']
+    rng = random.Random(21)
+    for _ in range(1000):
+        tokens = ['a']
+        for _ in range(rng.randint(0, 6)):
+            tokens += [rng.choice(binary), rng.choice('bcde')]
+        ok, msg, out = parser.expr_postfix(Lexer(' '.join(tokens)).tokenize())
+        assert ok, msg
+        assert out == naive_postfix(tokens), tokens
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from conftest import random_sources
+from lexer_core import C_DIGIT, C_IDENT, C_NEWLINE, C_OTHER, C_SPACE, CharClasses, Lexer
+
+
+def naive_runs(text, pred):
+    runs, start = [], None
+    for i, ch in enumerate(text + '\0'):
+        if pred(ch) and i < len(text):
+            start = i if start is None else start
+        elif start is not None:
+            runs.append((start, i))
+            start = None
+    return runs
+
+
+def is_ascii_word(ch):
+    return ch.isascii() and (ch.isalnum() or ch == '_')
+
+
+def test_runs_match_naive_scan():
+    rng = random.Random(8)
+    alphabet = 'ab_Z09 \t\n.\'"+é中  x'
+    for _ in range(500):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randrange(1, 60)))
+        pre = CharClasses(text)
+        assert len(pre.classes) == len(text) + 1
+        for ch, k in zip(text, pre.classes):
+            if not ch.isascii():
+                assert k == C_OTHER
+            elif ch == '\n':
+                assert k == C_NEWLINE
+            elif ch.isspace():
+                assert k == C_SPACE
+            elif ch.isdigit():
+                assert k == C_DIGIT
+            elif ch.isalpha() or ch == '_':
+                assert k == C_IDENT
+        for runs, pred in ((pre.words, is_ascii_word),
+                           (pre.digits, lambda ch: ch.isascii() and ch.isdigit()),
+                           (pre.spaces, lambda ch: ch.isascii() and ch.isspace())):
+            expected = naive_runs(text, pred)
+            assert list(zip(*map(list, runs))) == expected, text
+            for pos in range(len(text) + 1):
+                end = next((e for s, e in expected if s <= pos < e), pos)
+                assert CharClasses.run_end(runs, pos) == end
+
+
+def test_numpy_engine_handles_unicode():
+    # 非 ASCII 的字母和空白在预扫描中都是 C_OTHER，要与逐字符引擎给出同样的 token 和错误
+    extra = ['int é1 = 2;\n', 'x = 3;', 'a中b = 0x1g;', '"é\\n" \'ü\'', 'β γ 12é']
+    for text in random_sources(100, size=60, seed=9) + extra:
+        text = text + ''.join(extra)
+        ref, lx = Lexer(text), Lexer(text, engine='numpy')
+        assert [(t.type, t.attribute, t.offset, t.error) for t in lx.tokenize()] == \
+               [(t.type, t.attribute, t.offset, t.error) for t in ref.tokenize()], text
+        assert lx.errors == ref.errors
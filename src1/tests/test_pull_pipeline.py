@@ -0,0 +1,36 @@
+import io
+
+from conftest import mutations
+from lexer_core import Lexer
+from parser_core import LL1Parser
+
+
+def counted(tokens, pulled):
+    for tok in tokens:
+        pulled.append(tok)
+        yield tok
+
+
+def test_iterator_input_matches_list(c_source):
+    parser = LL1Parser()
+    tokens = Lexer(c_source).tokenize()
+    for mutated in mutations(tokens, 150, seed=17):
+        for trace in ('none', 'errors'):
+            for max_errors in (1, None):
+                expected = parser.analyze(mutated, trace=trace, max_errors=max_errors)
+                assert parser.analyze(iter(mutated), trace=trace, max_errors=max_errors) == expected
+
+
+def test_lexer_stream_feeds_parser(c_source):
+    parser = LL1Parser()
+    expected = parser.analyze(Lexer(c_source * 3).tokenize(), trace='errors', max_errors=None)
+    stream = Lexer().iter_tokens(io.StringIO(c_source * 3), chunk_size=64)
+    assert parser.analyze(stream, trace='errors', max_errors=None) == expected
+
+
+def test_stops_pulling_after_first_error():
+    pulled = []
+    stream = Lexer().iter_tokens(io.StringIO('int a; ) ' + 'int b;\n' * 10000), chunk_size=256)
+    ok, msg = LL1Parser().check(counted(stream, pulled))
+    assert not ok and '(行 1, 列 8)' in msg
+    assert len(pulled) < 20
@@ -0,0 +1,77 @@
+import random
+
+from lexer_core import Lexer
+from parser_core import TRACES, IncrementalState, LL1Parser, ParseSession
+
+EXTRA = ['typedef struct N { int v; } T;\n', 'T *gp;\n', 'int g(int a) { T x; { typedef int U; U y; } return a; }\n',
+         'struct S { int a; } s;\n', 'int arr[3] = {1, 2, 3};\n', 'typedef int T;\n', '#define X 1\n',
+         'typedef int V;\nV v1;\n', 'int h(int z) { V q = 1; return q; }\n']
+
+
+def edit(rng, text):
+    """随机插入、删除一行或几个字符，或者改掉一个 typedef 名"""
+    i = rng.randrange(len(text) + 1)
+    line = text.rfind('\n', 0, i) + 1
+    op = rng.randrange(6)
+    if op == 0:
+        return text[:i] + rng.choice([' } ', ' { ', ' ; ', ' typedef ', ' ) ', ' x ', ' = ', ' T ', ' V ']) + text[i:]
+    if op == 1:
+        return text[:i] + text[min(len(text), i + rng.randint(1, 6)):]
+    if op == 2:
+        return text[:line] + rng.choice(EXTRA) + text[line:]
+    if op == 3:
+        end = text.find('\n', i)
+        return text[:line] + (text[end + 1:] if end >= 0 else '')
+    if op == 4:
+        old, new = ('typedef int V;', 'typedef int W;')[::rng.choice([1, -1])]
+        return text.replace(old, new, 1)
+    return text[:i] + '/* c */' + text[i:]
+
+
+def same(got, expected, trace):
+    assert got[1:] == expected[1:]
+    if trace in ('summary', 'full'):
+        assert got[0].state() == expected[0].state()
+        assert got[0][::53] == expected[0][::53]
+    else:
+        assert got[0] == expected[0]
+
+
+def test_reanalyze_matches_analyze(c_source):
+    parser = LL1Parser()
+    rng = random.Random(26)
+    partial = 0
+    for _ in range(30):
+        text = 'typedef int T;\ntypedef int V;\n' * (rng.random() < 0.7) + ''.join(
+            rng.choice([c_source, *EXTRA, *EXTRA]) for _ in range(rng.randint(2, 12)))
+        state = IncrementalState(('T',) if rng.random() < 0.2 else ())
+        trace, max_errors = rng.choice(TRACES), rng.choice([1, 1, 3, None])
+        min_chunk = rng.choice([1, 8, 64, 256])
+        for k in range(rng.randint(3, 10)):
+            if k:
+                text = edit(rng, text)
+            if k and rng.random() < 0.1:
+                trace, max_errors = rng.choice(TRACES), rng.choice([1, 3, None])
+            tokens = Lexer(text).tokenize(compact=rng.random() < 0.3)
+            session = ParseSession(state.typedef_names)
+            expected = parser.analyze(tokens, trace=trace, max_errors=max_errors, session=session)
+            same(parser.reanalyze(tokens, state, trace=trace, max_errors=max_errors, min_chunk=min_chunk),
+                 expected, trace)
+            s = state.session
+            assert (s.steps, s.pos, s.env.bindings) == (session.steps, session.pos, session.env.bindings)
+            partial += state.reparsed[1] - state.reparsed[0] < len(state.tokens)
+    assert partial > 50
+
+
+def test_local_edit_reparses_one_declaration(c_source):
+    parser = LL1Parser()
+    state = IncrementalState()
+    units = ['int f%d(int a) { return a + %d; }\n' % (i, i) for i in range(200)]
+    text = ''.join(units)
+    parser.reanalyze(Lexer(text).tokenize(), state, trace='summary', min_chunk=1)
+    edited = text.replace('return a + 100;', 'return a * 2 + 100;')
+    tokens = Lexer(edited).tokenize()
+    same(parser.reanalyze(tokens, state, trace='summary', min_chunk=1), parser.analyze(tokens, trace='summary'),
+         'summary')
+    first, last = state.reparsed
+    assert 0 < last - first < 3 * len(Lexer(units[100]).tokenize())
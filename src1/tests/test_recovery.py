@@ -0,0 +1,41 @@
+from conftest import mutations
+from lexer_core import Lexer
+from parser_core import LL1Parser, ParseSession
+
+
+def errors(parser, tokens, max_errors):
+    ok, msg = parser.analyze(tokens, trace='none', max_errors=max_errors)[1:]
+    return ok, msg.splitlines()
+
+
+def test_reports_each_statement_error():
+    src = 'int main(){ int a;\n a = 1 +;\n a = 2;\n x = ;\n}\nint g(){ return (; }\n'
+    ok, lines = errors(LL1Parser(), Lexer(src).tokenize(), None)
+    assert not ok and lines == ['文法错误：无法用 Primary 匹配 ; (行 2, 列 9)',
+                                '文法错误：无法用 表达式 匹配 ; (行 4, 列 6)',
+                                '文法错误：无法用 表达式 匹配 ; (行 6, 列 18)']
+    ok, capped = errors(LL1Parser(), Lexer(src).tokenize(), 2)
+    assert capped == lines[:2] + ['错误数达到上限 2，停止分析']
+
+
+def test_limited_runs_are_prefixes(c_source):
+    parser = LL1Parser()
+    tokens = Lexer(c_source).tokenize()
+    for mutated in mutations(tokens, 200, seed=19):
+        ok, lines = errors(parser, mutated, None)
+        assert (ok, lines[:1]) == errors(parser, mutated, 1)
+        for k in (2, 3):
+            ok_k, got = errors(parser, mutated, k)
+            assert ok_k == ok and got[:k] == lines[:k]
+
+
+def test_recovery_is_linear():
+    parser = LL1Parser()
+    bad = 'int f(){ int a; a = 1 +; b = ; c(; }\n'
+    steps = []
+    for n in (100, 200, 400):
+        session = ParseSession()
+        ok, msg = parser.analyze(Lexer(bad * n).tokenize(), trace='none', max_errors=None, session=session)[1:]
+        assert len(msg.splitlines()) == 3 * n
+        steps.append(session.steps)
+    assert steps[1] < 2.1 * steps[0] and steps[2] < 2.1 * steps[1]
@@ -0,0 +1,56 @@
+import random
+
+from conftest import random_source, random_sources
+from lexer_core import Lexer, edit_range
+
+
+def full(tokens):
+    return [(t.type, t.attribute, t.offset, t.error, t.line, t.col) for t in tokens]
+
+
+def naive_edit_range(old, new):
+    start = 0
+    while start < min(len(old), len(new)) and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < min(len(old), len(new)) - start and old[-1 - end] == new[-1 - end]:
+        end += 1
+    return start, len(old) - end, len(new) - end
+
+
+def test_edit_range_matches_naive():
+    rng = random.Random(12)
+    for old in random_sources(500, size=40, seed=12):
+        a = rng.randrange(len(old) + 1)
+        b = rng.randrange(a, len(old) + 1)
+        new = old[:a] + random_source(rng, rng.randrange(4)) + old[b:]
+        assert edit_range(old, new) == naive_edit_range(old, new), (old, new)
+
+
+def test_relex_matches_full_tokenize(c_source):
+    rng = random.Random(13)
+    for text in random_sources(150, size=200, seed=13) + [c_source]:
+        tokens = Lexer(text).tokenize()
+        # 连续编辑：每次都在上一次 relex 的结果上继续
+        for _ in range(8):
+            a = rng.randrange(len(text) + 1)
+            b = min(len(text), a + rng.randrange(6))
+            new_text = random_source(rng, rng.randrange(5))
+            if rng.random() < 0.2:
+                new_text = rng.choice(['/*', '*/', '"', "'", '\n', '//', '\\\n'])
+            new, (first, old_end, new_end) = Lexer().relex(tokens, text, a, b, new_text)
+            edited = text[:a] + new_text + text[b:]
+            expected = Lexer(edited).tokenize()
+            assert full(new) == full(expected), (text, a, b, new_text)
+            assert new[:first] == tokens[:first]
+            assert len(new) - new_end == len(tokens) - old_end
+            text, tokens = edited, new
+
+
+def test_relex_reports_only_rescanned_range():
+    text = 'int a;\n' * 50
+    tokens = Lexer(text).tokenize()
+    lx = Lexer()
+    new, (first, old_end, new_end) = lx.relex(tokens, text, 70, 70, ' b = 0x; ')
+    assert new_end - first < 12 and lx.errors == ['错误: 无效的十六进制数, 内容: "0x" at line 11']
+    assert lx.table.names == ['a', 'b'] and len(lx.table.uses('a')) < 3
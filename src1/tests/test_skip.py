@@ -0,0 +1,51 @@
+import random
+
+from lexer_core import Lexer
+
+PIECES = [' ', '\t', '\n', '  \n ', '//', '// x */\n', '/*', '*/', '/* a\n b */', '/', '*', 'x', '"/*"', '\r\n', '/**/']
+
+
+def naive_skip(lx):
+    """逐字符跳过空白和注释，未闭合的块注释在注释开头报错"""
+    while lx.char is not None:
+        if lx.char.isspace():
+            lx.next()
+        elif lx.char == '/' and lx.get_next() == '/':
+            while lx.char is not None and lx.char != '\n':
+                lx.next()
+        elif lx.char == '/' and lx.get_next() == '*':
+            start = lx.pos
+            lx.next()
+            lx.next()
+            while lx.char is not None and not (lx.char == '*' and lx.get_next() == '/'):
+                lx.next()
+            if lx.char is None:
+                lx.error('UNTERMINATED_COMMENT', '', at=start)
+                break
+            lx.next()
+            lx.next()
+        else:
+            break
+
+
+def state(text, pos, skip):
+    lx = Lexer(text)
+    lx.pos, lx.char = pos, text[pos] if pos < len(text) else None
+    skip(lx)
+    return lx.pos, lx.char, lx.errors
+
+
+def test_skip_matches_char_by_char():
+    rng = random.Random(7)
+    for _ in range(3000):
+        text = ''.join(rng.choice(PIECES) for _ in range(rng.randrange(12)))
+        for pos in {0, rng.randrange(len(text) + 1)}:
+            assert state(text, pos, Lexer.skip) == state(text, pos, naive_skip), (text, pos)
+
+
+def test_unterminated_comment_reports_its_line():
+    lx = Lexer('a\n  /* never\n closed')
+    lx.pos, lx.char = 1, '\n'
+    lx.skip()
+    assert lx.char is None and lx.pos == len(lx.text)
+    assert lx.errors == ['错误: 未闭合的块注释 at line 2']
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from conftest import random_sources
+from lexer_core import Lexer
+
+
+def snapshot(lx, tokens):
+    tokens = list(tokens)
+    return ([(t.type, t.attribute, t.offset, t.error, t.line, t.col) for t in tokens], lx.errors,
+            {name: lx.table.uses(name) for name in lx.table.names})
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 16, 1 << 16])
+def test_iter_tokens_matches_tokenize(chunk_size, c_source):
+    for text in random_sources(150, size=150, seed=5) + [c_source]:
+        ref = Lexer(text)
+        expected = snapshot(ref, ref.tokenize())
+        lx = Lexer()
+        assert snapshot(lx, lx.iter_tokens(io.StringIO(text), chunk_size=chunk_size)) == expected, text
+
+
+def test_iter_tokens_reads_bytes(c_source):
+    text = c_source + '\n/* é\n */ char *s = "ü";\n'
+    ref = Lexer(text)
+    expected = snapshot(ref, ref.tokenize())
+    lx = Lexer()
+    assert snapshot(lx, lx.iter_tokens(io.BytesIO(text.encode('utf-8')), chunk_size=5)) == expected
+
+
+def test_iter_tokens_is_lazy():
+    # 只读到足以产生第一个 token 的数据
+    class Source(io.StringIO):
+        reads = 0
+
+        def read(self, size=-1):
+            Source.reads += 1
+            return super().read(size)
+
+    src = Source('int a;\n' * 10000)
+    first = next(Lexer().iter_tokens(src, chunk_size=64))
+    assert first.attribute == 'int' and Source.reads <= 3
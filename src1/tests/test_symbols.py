@@ -0,0 +1,68 @@
+import pickle
+
+from conftest import random_sources
+from lexer_core import ID, PREPROCESSOR, Lexer, SymbolTable, TokenBuffer
+
+
+def naive_uses(tokens, name):
+    return [(i, t.line) for i, t in enumerate(tokens) if t.type == ID and t.attribute == name]
+
+
+def test_pool_ids_and_uses(c_source):
+    for text in random_sources(200, seed=4) + [c_source]:
+        lx = Lexer(text)
+        tokens = lx.tokenize()
+        table = lx.table
+        assert list(table.ids.values()) == list(range(len(table)))
+        for i, name in enumerate(table.names):
+            assert table.id(name) == i and table.name(i) is name
+            assert table.uses(name) == table.uses(i) == naive_uses(tokens, name)
+            assert table.count(name) == len(table.uses(name))
+        assert all(t.attribute is table.names[table.id(t.attribute)] for t in tokens if t.type == ID)
+
+
+def test_buffer_references_pool_ids(c_source):
+    lx = Lexer(c_source * 2)
+    expected = Lexer(c_source * 2).tokenize()
+    buf = lx.tokenize(compact=True)
+    assert buf.table is lx.table
+    for i, t in enumerate(expected):
+        if t.type == ID:
+            assert buf.attrs[i] == lx.table.id(t.attribute)
+    # 标识符只在名字池中出现一次，不再进入字符串表
+    assert not set(buf.strings) & set(lx.table.names) - {t.attribute for t in expected if t.type != ID}
+    assert list(buf) == expected
+    assert [buf[i] for i in range(len(buf))] == expected
+
+
+def test_buffer_views_keep_names(c_source):
+    buf = Lexer(c_source).tokenize(compact=True)
+    expected = list(buf)
+    assert list(buf[3:40]) == expected[3:40]
+    assert list(buf.exclude(PREPROCESSOR)) == [t for t in expected if t.type != PREPROCESSOR]
+    part = buf[10:60].detach()
+    assert list(part) == expected[10:60]
+    assert set(part.table.names) == {t.attribute for t in expected[10:60] if t.type == ID}
+    assert list(pickle.loads(pickle.dumps(part))) == expected[10:60]
+
+
+def test_extend_buffer_remaps_ids():
+    a = Lexer('int x; y = x;').tokenize(compact=True)
+    b = Lexer('int y; z = y;').tokenize(compact=True)
+    out = TokenBuffer(table=SymbolTable())
+    out.extend_buffer(a[:-1])
+    out.extend_buffer(b, 100)
+    assert [t.attribute for t in out] == [t.attribute for t in list(a)[:-1] + list(b)]
+    assert out.table.names == ['x', 'y', 'z']
+    assert [t.offset for t in out][-1] == 100 + len('int y; z = y;')
+
+
+def test_parallel_compact_matches_tokenize(c_source):
+    text = c_source * 4
+    lx = Lexer(text)
+    buf = lx.tokenize_parallel(workers=3, compact=True, min_chunk=len(text) // 4)
+    ref = Lexer(text)
+    expected = ref.tokenize()
+    assert list(buf) == expected
+    assert buf.table is lx.table and lx.table.names == ref.table.names
+    assert all(lx.table.uses(name) == ref.table.uses(name) for name in ref.table.names)
@@ -0,0 +1,39 @@
+import os
+import pickle
+
+from lexer_core import Lexer
+from parser_core import CACHE_VERSION, LL1Parser, c_grammar, grammar_hash
+
+
+def tables(parser):
+    cg = parser.compiled
+    return (parser.first, parser.follow, parser.select, parser.table, parser.conflicts,
+            cg.symbols, list(cg.table), cg.prods, cg.rhs_rev)
+
+
+def test_cache_reuse_matches_fresh(tmp_path, c_source):
+    fresh = LL1Parser(cache_dir=None)
+    first = LL1Parser(cache_dir=str(tmp_path))
+    again = LL1Parser(cache_dir=str(tmp_path))
+    assert not first.from_cache and again.from_cache
+    assert tables(again) == tables(first) == tables(fresh)
+    tokens = Lexer(c_source).tokenize()
+    assert again.check(tokens) == fresh.check(tokens) == (True, "语法分析成功！")
+
+
+def test_cache_invalidated_by_grammar_and_damage(tmp_path):
+    LL1Parser(cache_dir=str(tmp_path))
+    g = c_grammar()
+    g.prods['Pointer'] = list(reversed(g.prods['Pointer']))
+    changed = LL1Parser(g, cache_dir=str(tmp_path))
+    assert not changed.from_cache and grammar_hash(g) != grammar_hash(c_grammar())
+    assert len(os.listdir(tmp_path)) == 2
+    # 损坏或版本不符的缓存文件被忽略并重建
+    path = tmp_path / f'll1-{grammar_hash(c_grammar())[:16]}.pickle'
+    path.write_bytes(b'not a pickle')
+    assert not LL1Parser(cache_dir=str(tmp_path)).from_cache
+    assert LL1Parser(cache_dir=str(tmp_path)).from_cache
+    data = pickle.loads(path.read_bytes())
+    data['version'] = CACHE_VERSION + 1
+    path.write_bytes(pickle.dumps(data))
+    assert not LL1Parser(cache_dir=str(tmp_path)).from_cache
@@ -0,0 +1,46 @@
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from lexer_core import Lexer
+from parser_core import LL1Parser, ParseSession, c_grammar, shared_parser
+
+
+def run(parser, tokens, names, trace):
+    session = ParseSession(names)
+    records, ok, msg = parser.analyze(tokens, trace=trace, build_tree=trace == 'summary', max_errors=None,
+                                      session=session)
+    tree = session.tree
+    return (list(records), ok, msg, session.pos, session.steps, sorted(session.env.names()),
+            list(tree.syms) if tree is not None else None)
+
+
+def test_shared_parser_matches_sequential(c_source):
+    # x = T; 只有 T 是类型名时才出错，各线程的 typedef 名互不影响
+    body = 'int f() { int x; x = T; return 0; }\n' + c_source
+    rng = random.Random(23)
+    jobs = []
+    for i in range(120):
+        text = body.replace(';', '', rng.randrange(3)) if rng.random() < 0.4 else body
+        jobs.append((Lexer(text).tokenize(), {'T'} if i % 2 else (), ('none', 'errors', 'summary')[i % 3]))
+    parser = shared_parser()
+    assert parser is shared_parser(c_grammar())
+    expected = [run(LL1Parser(), *job) for job in jobs]
+    assert len({r[1] for r in expected}) == 2
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            got = list(pool.map(lambda job: run(parser, *job), jobs))
+    finally:
+        sys.setswitchinterval(interval)
+    assert got == expected
+
+
+def test_session_carries_typedef_names():
+    parser = LL1Parser()
+    session = ParseSession()
+    assert parser.check(Lexer('typedef int T;').tokenize(), session)[0]
+    use = Lexer('int f() { x = T; }').tokenize()
+    assert not parser.check(use, session)[0]
+    assert parser.check(use)[0]
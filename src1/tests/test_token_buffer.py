@@ -0,0 +1,44 @@
+import pickle
+
+from conftest import random_sources
+from lexer_core import ID, PREPROCESSOR, STRING_, Lexer, TokenBuffer
+
+
+def full(tokens):
+    return [(t.type, t.attribute, t.offset, t.error, t.line, t.col) for t in tokens]
+
+
+def test_compact_matches_list(c_source):
+    for text in random_sources(300, size=120, seed=6) + [c_source]:
+        ref = Lexer(text)
+        expected = ref.tokenize()
+        lx = Lexer(text)
+        buf = lx.tokenize(compact=True)
+        assert isinstance(buf, TokenBuffer) and len(buf) == len(expected)
+        assert full(buf) == full(expected), text
+        assert full(map(buf.__getitem__, range(-len(buf), 0))) == full(expected)
+        assert [buf.attribute(i) for i in range(len(buf))] == [t.attribute for t in expected]
+        assert lx.errors == ref.errors
+
+
+def test_slices_exclude_and_pickle(c_source):
+    expected = Lexer(c_source).tokenize()
+    buf = Lexer(c_source).tokenize(compact=True)
+    for s in (slice(0, 0), slice(5, 50), slice(None, None, 3), slice(-20, None), slice(40, 10, -2)):
+        assert full(buf[s]) == full(expected[s])
+    for type_ in (PREPROCESSOR, ID, STRING_):
+        assert full(buf.exclude(type_)) == full(t for t in expected if t.type != type_)
+    again = pickle.loads(pickle.dumps(buf))
+    assert full(again) == full(expected)
+    # 反序列化后还能继续追加，字符串表的下标接着编号
+    again.extend(expected[:10])
+    assert full(again) == full(expected + expected[:10])
+
+
+def test_append_tuples_share_strings():
+    tokens = Lexer('a = "s"; b = "s"; a = a + 1;').tokenize()
+    buf = TokenBuffer()
+    for t in tokens:
+        buf.append(t)
+    assert list(buf) == tokens
+    assert buf.strings.count('s') == 1 and buf.table.names == ['a', 'b']
@@ -0,0 +1,23 @@
+from conftest import random_sources
+from constants import DL, KEYWORDS, OP, TYPES
+from lexer_core import EOF, ID, PREPROCESSOR, TOKEN, Lexer
+from parser_core import LL1Parser
+
+
+def test_token_terms_match_symbolize(c_source):
+    parser = LL1Parser()
+    index = parser.compiled.index
+    type_id = index['type_id']
+    names = {'a', 'x', 'Book'}
+    tokens = [t for text in random_sources(300, seed=24) + [c_source] for t in Lexer(text).tokenize()]
+    tokens += [TOKEN(code, text, 0) for table in (KEYWORDS, OP, DL) for text, code in table.items()]
+    for tok in tokens:
+        if tok.type == PREPROCESSOR:
+            assert tok.type not in parser.token_terms and parser.symbolize(tok) == ''
+            continue
+        term = parser.token_terms[tok.type]
+        assert term == index.get(parser.symbolize(tok), -1), tok
+        if tok.type == ID and tok.attribute in names:
+            assert index[parser.symbolize(tok, names)] == type_id
+    assert set(parser.token_terms) == set(TYPES) - {PREPROCESSOR}
+    assert parser.compiled.symbols[parser.token_terms[EOF]] == 'EOF'
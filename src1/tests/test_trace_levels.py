@@ -0,0 +1,35 @@
+from conftest import mutations
+from lexer_core import Lexer
+from parser_core import TRACES, LL1Parser
+
+
+def levels(parser, tokens, max_errors):
+    return {trace: parser.analyze(tokens, trace=trace, max_errors=max_errors) for trace in TRACES}
+
+
+def test_trace_levels_agree(c_source):
+    parser = LL1Parser()
+    tokens = Lexer(c_source).tokenize()
+    for k, mutated in enumerate(mutations(tokens, 120, seed=15)):
+        for max_errors in (1, None):
+            out = levels(parser, mutated, max_errors)
+            assert len({(ok, msg) for _, ok, msg in out.values()}) == 1
+            assert out['none'][0] == []
+            full = list(out['full'][0])
+            summary = out['summary'][0]
+            # summary 只是 full 去掉匹配终结符的那些行，步骤号不变
+            assert list(summary) == [row for row in full if not row[3].startswith('匹配')]
+            fails = out['errors'][0]
+            ok, msg = out['none'][1:]
+            assert len(fails) == (0 if ok else len(msg.splitlines()) if max_errors is None else 1)
+            assert [row[4] for row in fails] == msg.splitlines()[:len(fails)]
+            if max_errors is None:
+                assert [row[1] for row in fails] == [row[1] for row in full if row[3] == '']
+
+
+def test_records_render_on_demand(c_source):
+    records, ok, _ = LL1Parser().analyze(Lexer(c_source).tokenize(), trace='full')
+    rows = list(records)
+    assert ok and len(records) == len(rows)
+    assert records[-1] == rows[-1] and records[5:9] == rows[5:9] and records[::50] == rows[::50]
+    assert rows[0][0] == 0 and [row[0] for row in rows] == list(range(len(rows)))
@@ -0,0 +1,102 @@
+import pytest
+
+from lexer_core import Lexer
+from parser_core import LL1Parser, ParseSession, SymbolEnv
+
+# 与 typedef 名同名的成员、形参、块内变量，以及给这样的名字赋值
+SHADOWING = [
+    'typedef int len; struct S { int len; };',
+    'typedef int T; int f(int T){return T;}',
+    'typedef int T; int g(){ int T; T = 2; }',
+    'typedef int T; int main(){ T = 1; }',
+    'typedef int T; int f(int a, char *T){ T = 0; return a; }',
+    'typedef int T; struct S { int T; T y; };',
+]
+
+# 遮挡只在所在的作用域里有效，之后 T 仍是类型名（T x; 之后的 x = 1; 要求 x 被当作变量声明）
+SCOPED = [
+    'typedef int T; int g(){ int T; T = 2; } int h(){ T x; x = 1; }',
+    'typedef int T; int g(){ { int T; T = 2; } T x; x = 1; }',
+    'typedef int T; int f(int T); int h(){ T x; x = 1; }',
+    'typedef int T; int f(int T){ return T; } int h(){ T x; x = 1; }',
+    'typedef int T; int g(){ int T; { typedef char T; T c; c = 1; } T = 3; }',
+]
+
+
+def check_all(tokens, generated):
+    results = {LL1Parser().check(tokens), LL1Parser(pratt=False, macros=False).check(tokens), generated.parse(tokens)}
+    for trace in ('full', 'summary', 'errors'):
+        results.add(LL1Parser().analyze(tokens, trace=trace)[1:])
+    results.add(LL1Parser().analyze(tokens, trace='none', max_errors=None)[1:])
+    assert len(results) == 1, results
+    return results.pop()
+
+
+@pytest.mark.parametrize('text', SHADOWING + SCOPED)
+def test_shadowing_accepted(text, generated):
+    assert check_all(Lexer(text).tokenize(), generated) == (True, "语法分析成功！")
+
+
+@pytest.mark.parametrize('text', SHADOWING + SCOPED)
+def test_typedef_visible_after_scope(text):
+    session = ParseSession()
+    LL1Parser().check(Lexer(text).tokenize(), session)
+    env = session.env
+    assert env.depth == 0 and not env.params
+    assert set(env.types) == env.names() == {'len'} if 'len' in text else {'T'}
+    assert all(stack == [0] for stack in env.bindings.values())
+
+
+def test_type_name_still_required():
+    # 表达式里只能出现普通标识符：T 被遮住时可以，遮挡的作用域结束后又不行
+    ok = ['typedef int T; int g(){ int T; int x; x = T; }', 'typedef int T; int f(int T){ int x; x = T + 1; }']
+    bad = ['typedef int T; int g(){ int x; x = T; }', 'typedef int T; int g(){ { int T; } int x; x = T; }',
+           'typedef int T; int f(int T); int g(){ int x; x = T; }']
+    for text in ok:
+        assert LL1Parser().check(Lexer(text).tokenize())[0], text
+    for text in bad:
+        assert not LL1Parser().check(Lexer(text).tokenize())[0], text
+
+
+def test_symbol_env_scopes():
+    env = SymbolEnv(['T'])
+    env.shadow('T')  # 最外层的同名声明不改变绑定
+    assert 'T' in env
+    env.push()
+    env.shadow('T')
+    env.shadow('x')  # 不是 typedef 名
+    assert 'T' not in env and len(env) == 1
+    env.push()
+    env.declare('T')
+    assert 'T' in env
+    saved = env.copy()
+    env.pop()
+    assert 'T' not in env
+    env.restore(saved)
+    assert 'T' in env and env.depth == 2
+    env.pop()
+    env.pop()
+    assert 'T' in env and env.bindings == {'T': [0]}
+
+    env.param('T')
+    env.param('y')
+    assert env.params == ['T']
+    env.end_params()
+    env.push()
+    assert 'T' in env
+    env.pop()
+    env.param('T')
+    env.push()
+    assert 'T' not in env and not env.params
+    env.pop()
+    assert 'T' in env
+
+
+def test_shadowing_parallel_and_incremental(c_source):
+    block = 'typedef int T; int g(){ int T; T = 2; } int h(int T){ return T; } T v;\n'
+    text = c_source + block * 40
+    tokens = Lexer(text).tokenize(compact=True)
+    parser = LL1Parser()
+    expected = parser.analyze(tokens, trace='none')
+    assert expected[1:] == (True, "语法分析成功！")
+    assert parser.analyze_parallel(tokens, workers=2, min_chunk=64)[1:] == expected[1:]